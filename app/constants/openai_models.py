@@ -17,3 +17,16 @@ class EmbeddingOpenAIModels(str, Enum):
     TEXT_EMBEDDING_3_LARGE = "text-embedding-3-large"
     TEXT_EMBEDDING_3_SMALL = "text-embedding-3-small"
     TEXT_EMBEDDING_ADA_002 = "text-embedding-ada-002"
+
+
+# Native output dimensions. text-embedding-3 models can return fewer
+# (Matryoshka truncation) through the `dimensions` parameter.
+EMBEDDING_MODEL_DIMENSIONS = {
+    EmbeddingOpenAIModels.TEXT_EMBEDDING_3_LARGE: 3072,
+    EmbeddingOpenAIModels.TEXT_EMBEDDING_3_SMALL: 1536,
+    EmbeddingOpenAIModels.TEXT_EMBEDDING_ADA_002: 1536,
+}
+MATRYOSHKA_EMBEDDING_MODELS = (
+    EmbeddingOpenAIModels.TEXT_EMBEDDING_3_LARGE,
+    EmbeddingOpenAIModels.TEXT_EMBEDDING_3_SMALL,
+)
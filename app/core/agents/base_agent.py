@@ -1,28 +1,29 @@
 # app/core/agents/base_agent.py
-import os
+from typing import AsyncIterator
 
-from dotenv import load_dotenv
+from asgi_correlation_id import correlation_id as request_correlation_id
 from langchain.prompts import ChatPromptTemplate
-from langchain_openai import ChatOpenAI
-from langfuse.callback import CallbackHandler
 
 from app.constants.openai_models import OpenAIModels
+from app.core.agents.llm_registry import llm_registry
 from app.utils.logger import logger
 
-load_dotenv(override=True)
-
 
 class BaseAgent:
     """
     Base agent class for managing LLM interactions.
 
+    Agents are cheap to create: the chat model client and the Langfuse
+    client are shared through the `llm_registry`. Per-request state is
+    passed to every call; the Langfuse session defaults to the request's
+    correlation id.
+
     Attributes:
-        correlation_id (str): A unique identifier for the request.
+        correlation_id (str): Default Langfuse session of the agent's calls.
         model_openai (OpenAIModels): The OpenAI model to use.
         temperature_openai (float): Temperature parameter for model responses.
         run_name (str): A label for the running process.
-        langfuse_handler (CallbackHandler): Handler for Langfuse logging.
-        llm (ChatOpenAI): The OpenAI chat model instance.
+        llm (ChatOpenAI): The shared OpenAI chat model client.
     """
 
     def __init__(
@@ -39,16 +40,8 @@ class BaseAgent:
 
         self.run_name = run_name
 
-        self.langfuse_handler = CallbackHandler(
-            public_key=os.getenv("LANGFUSE_PUBLIC_KEY"),
-            secret_key=os.getenv("LANGFUSE_SECRET_KEY"),
-            host=os.getenv("LANGFUSE_HOST"),
-            session_id=self.correlation_id,
-        )
-
-        self.llm = ChatOpenAI(
-            model=self.model_openai,
-            temperature=self.temperature_openai,
+        self.llm = llm_registry.get_llm(
+            self.model_openai, self.temperature_openai
         )
 
     def run(
@@ -57,6 +50,7 @@ class BaseAgent:
         input_data: dict,
         tags: list[str] = None,
         metadata: dict = None,
+        session_id: str = None,
     ) -> str:
         """
         Execute the LLM chain with a given prompt and input data.
@@ -66,6 +60,8 @@ class BaseAgent:
             input_data (dict): The data to fill into the prompt.
             tags (list[str], optional): Tags for logging. Defaults to None.
             metadata (dict, optional): Additional metadata for logging. Defaults to None.
+            session_id (str, optional): Langfuse session. Defaults to the
+                agent's correlation id, then the request's.
 
         Returns:
             str: The response from the model.
@@ -73,22 +69,117 @@ class BaseAgent:
         Raises:
             Exception: If an error occurs during execution.
         """
-        tags = tags or []
-        metadata = metadata or {}
+        try:
+            llm_chain = prompt | self.llm
+            response = llm_chain.invoke(
+                input_data, config=self._config(tags, metadata, session_id)
+            )
+            return response
+        except Exception as e:
+            logger.error(f"An error occurred with {self.model_openai}: {e}")
+            raise Exception(
+                f"An error occurred with {self.model_openai}: {e}"
+            ) from e
 
-        config = {
-            "run_name": self.run_name,
-            "callbacks": [self.langfuse_handler],
-            "tags": tags,
-            "metadata": metadata,
-        }
+    async def arun(
+        self,
+        prompt: ChatPromptTemplate,
+        input_data: dict,
+        tags: list[str] = None,
+        metadata: dict = None,
+        session_id: str = None,
+    ) -> str:
+        """
+        Async version of `run`, using `ainvoke`.
+
+        The event loop keeps serving other requests while the model answers.
+        Calls in flight are bounded by the `llm_registry` semaphore.
+
+        Args:
+            prompt (ChatPromptTemplate): The prompt template.
+            input_data (dict): The data to fill into the prompt.
+            tags (list[str], optional): Tags for logging. Defaults to None.
+            metadata (dict, optional): Additional metadata for logging. Defaults to None.
+            session_id (str, optional): Langfuse session. Defaults to the
+                agent's correlation id, then the request's.
+
+        Returns:
+            str: The response from the model.
+
+        Raises:
+            Exception: If an error occurs during execution.
+        """
+        try:
+            llm_chain = prompt | self.llm
+            async with llm_registry.semaphore:
+                return await llm_chain.ainvoke(
+                    input_data, config=self._config(tags, metadata, session_id)
+                )
+        except Exception as e:
+            logger.error(f"An error occurred with {self.model_openai}: {e}")
+            raise Exception(
+                f"An error occurred with {self.model_openai}: {e}"
+            ) from e
+
+    async def astream(
+        self,
+        prompt: ChatPromptTemplate,
+        input_data: dict,
+        tags: list[str] = None,
+        metadata: dict = None,
+        session_id: str = None,
+    ) -> AsyncIterator[str]:
+        """
+        Execute the LLM chain and yield the response as it is generated.
+
+        The run is traced by Langfuse like `run`, and holds a slot of the
+        `llm_registry` semaphore until the response is complete.
+
+        Args:
+            prompt (ChatPromptTemplate): The prompt template.
+            input_data (dict): The data to fill into the prompt.
+            tags (list[str], optional): Tags for logging. Defaults to None.
+            metadata (dict, optional): Additional metadata for logging. Defaults to None.
+            session_id (str, optional): Langfuse session. Defaults to the
+                agent's correlation id, then the request's.
 
+        Yields:
+            str: The next piece of the response.
+
+        Raises:
+            Exception: If an error occurs during execution.
+        """
         try:
             llm_chain = prompt | self.llm
-            response = llm_chain.invoke(input_data, config=config)
-            return response
+            async with llm_registry.semaphore:
+                async for chunk in llm_chain.astream(
+                    input_data, config=self._config(tags, metadata, session_id)
+                ):
+                    if chunk.content:
+                        yield chunk.content
         except Exception as e:
             logger.error(f"An error occurred with {self.model_openai}: {e}")
             raise Exception(
                 f"An error occurred with {self.model_openai}: {e}"
             ) from e
+
+    def _config(
+        self,
+        tags: list[str] = None,
+        metadata: dict = None,
+        session_id: str = None,
+    ) -> dict:
+        handler = llm_registry.callback_handler(
+            run_name=self.run_name,
+            session_id=session_id
+            or self.correlation_id
+            or request_correlation_id.get(),
+            tags=tags,
+            metadata=metadata,
+        )
+        return {
+            "run_name": self.run_name,
+            "callbacks": [handler],
+            "tags": tags or [],
+            "metadata": metadata or {},
+        }
@@ -0,0 +1,156 @@
+# app/core/agents/llm_registry.py
+import asyncio
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+from dotenv import load_dotenv
+from langchain_openai import ChatOpenAI
+from langfuse import Langfuse
+from langfuse.callback import CallbackHandler
+from openai import DefaultAsyncHttpxClient, DefaultHttpxClient
+from starlette.concurrency import run_in_threadpool
+
+from app.constants.openai_models import OpenAIModels
+
+load_dotenv(override=True)
+
+
+class LLMRegistry:
+    """Process-wide LLM clients and Langfuse client shared by every agent.
+
+    Chat models are created once per model and temperature on top of one
+    pair of pooled HTTP clients, so requests reuse keep-alive connections
+    instead of opening a connection pool (and TLS session) each. A single
+    Langfuse client sends the traces of every request; per-request state
+    (session id, tags, metadata) goes to a lightweight callback handler
+    bound to a new trace on every call.
+
+    Async calls of all agents share a semaphore, which bounds the LLM
+    calls in flight per worker.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 30,
+        max_concurrency: int = 32,
+    ):
+        """Initialize the registry. Clients are created on first use.
+
+        Args:
+            max_connections (int, optional): Maximum open connections to the API.
+            max_keepalive_connections (int, optional): Idle connections kept open.
+            keepalive_expiry (float, optional): Seconds an idle connection is kept.
+            max_concurrency (int, optional): Async LLM calls in flight.
+        """
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._http_client: Optional[DefaultHttpxClient] = None
+        self._http_async_client: Optional[DefaultAsyncHttpxClient] = None
+        self._langfuse: Optional[Langfuse] = None
+        self._llms: Dict[Tuple[OpenAIModels, float], ChatOpenAI] = {}
+
+    def get_llm(
+        self,
+        model: OpenAIModels = OpenAIModels.GPT_4O_MINI,
+        temperature: float = 0,
+    ) -> ChatOpenAI:
+        """Return the shared chat model client.
+
+        Args:
+            model (OpenAIModels, optional): The OpenAI model.
+            temperature (float, optional): Temperature of the responses.
+
+        Returns:
+            ChatOpenAI: The client, using the pooled HTTP clients.
+        """
+        key = (model, temperature)
+        with self._lock:
+            llm = self._llms.get(key)
+            if llm is None:
+                if self._http_client is None:
+                    self._http_client = DefaultHttpxClient(limits=self.limits)
+                    self._http_async_client = DefaultAsyncHttpxClient(
+                        limits=self.limits
+                    )
+                llm = ChatOpenAI(
+                    model=model,
+                    temperature=temperature,
+                    http_client=self._http_client,
+                    http_async_client=self._http_async_client,
+                )
+                self._llms[key] = llm
+            return llm
+
+    @property
+    def langfuse(self) -> Langfuse:
+        """The shared Langfuse client."""
+        with self._lock:
+            if self._langfuse is None:
+                self._langfuse = Langfuse(
+                    public_key=os.getenv("LANGFUSE_PUBLIC_KEY"),
+                    secret_key=os.getenv("LANGFUSE_SECRET_KEY"),
+                    host=os.getenv("LANGFUSE_HOST"),
+                )
+            return self._langfuse
+
+    def callback_handler(
+        self,
+        run_name: str = "",
+        session_id: Optional[str] = None,
+        tags: List[str] = None,
+        metadata: Dict[str, Any] = None,
+    ) -> CallbackHandler:
+        """Return a Langfuse handler tracing one call in a new trace.
+
+        Args:
+            run_name (str, optional): Name of the trace.
+            session_id (Optional[str], optional): Langfuse session of the trace.
+            tags (List[str], optional): Tags of the trace.
+            metadata (Dict[str, Any], optional): Metadata of the trace.
+
+        Returns:
+            CallbackHandler: A handler sharing the Langfuse client.
+        """
+        trace = self.langfuse.trace(
+            name=run_name or None,
+            session_id=session_id or None,
+            tags=tags or None,
+            metadata=metadata or None,
+        )
+        return trace.get_langchain_handler(update_parent=True)
+
+    async def aclose(self) -> None:
+        """Close the HTTP connections and flush the pending traces."""
+        with self._lock:
+            http_client, self._http_client = self._http_client, None
+            http_async_client, self._http_async_client = (
+                self._http_async_client,
+                None,
+            )
+            langfuse, self._langfuse = self._langfuse, None
+            self._llms.clear()
+        if http_client is not None:
+            http_client.close()
+        if http_async_client is not None:
+            await http_async_client.aclose()
+        if langfuse is not None:
+            await run_in_threadpool(langfuse.shutdown)
+
+
+llm_registry = LLMRegistry(
+    max_connections=int(os.getenv("LLM_MAX_CONNECTIONS", 100)),
+    max_keepalive_connections=int(
+        os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", 20)
+    ),
+    keepalive_expiry=float(os.getenv("LLM_KEEPALIVE_EXPIRY_SECONDS", 30)),
+    max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", 32)),
+)
@@ -1,43 +1,61 @@
 # app/core/agents/retrieval_agent.py
-from typing import Dict, List
+import os
+from typing import Any, AsyncIterator, Dict, List, Tuple
 
+from dotenv import load_dotenv
 from langchain.prompts import ChatPromptTemplate
 from langchain_core.documents import Document
 
 from app.constants.openai_models import OpenAIModels
 from app.core.agents.base_agent import BaseAgent
+from app.utils.context_packer import pack_context
 from app.utils.logger import logger
 
+load_dotenv(override=True)
+
+# Maximum tokens of the retrieved documents in the prompt (0: no limit).
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", 3000))
+
 
 class RetrievalAgent(BaseAgent):
     """
     Agent for handling document retrieval and generating query responses.
 
     This agent uses provided documents to generate a contextual answer and includes source attribution.
+    Overlapping chunks are merged and the documents are packed into
+    `CONTEXT_TOKEN_BUDGET` tokens; the tokens saved are logged and sent to
+    Langfuse as trace metadata.
     """
 
+    # Bump when the prompt changes, so cached answers are not reused.
+    PROMPT_VERSION = 2
+
+    # Built once and shared by every instance.
+    PROMPT_TEMPLATE = ChatPromptTemplate(
+        [
+            (
+                "system",
+                "You are a retrieval agent that generates responses to queries based on the provided documents. "
+                "Extract the source information from the documents and cite it in your response.",
+            ),
+            ("assistant", "Documents: {documents}"),
+            ("user", "Query: {query}"),
+        ]
+    )
+
     def __init__(self, correlation_id: str = ""):
         super().__init__(
             model_openai=OpenAIModels.GPT_4O_MINI,
             run_name="Retrieval Agent",
             correlation_id=correlation_id,
         )
-        self.prompt_template = ChatPromptTemplate(
-            [
-                (
-                    "system",
-                    "You are a retrieval agent that generates responses to queries based on the provided documents. "
-                    "Extract the source information from the documents and cite it in your response.",
-                ),
-                ("assistant", "Documents: {documents}"),
-                ("user", "Query: {query}"),
-            ]
-        )
+        self.prompt_template = self.PROMPT_TEMPLATE
 
     def generate_response(
         self,
         query: str,
         documents: List[Document],
+        session_id: str = None,
     ) -> Dict[str, str]:
         """
         Generate a response based on the query and provided documents.
@@ -45,6 +63,7 @@ class RetrievalAgent(BaseAgent):
         Args:
             query (str): The user's query.
             documents (List[Document]): Relevant documents for the query.
+            session_id (str, optional): Langfuse session of the call.
 
         Returns:
             Dict[str, str]: A response containing the AI's answer under the key 'ai_response'.
@@ -53,14 +72,12 @@ class RetrievalAgent(BaseAgent):
             Exception: If response generation fails.
         """
         try:
-            documents_str = self._format_documents(documents)
-            input_data = {
-                "query": query,
-                "documents": documents_str,
-            }
+            input_data, metadata = self._input_data(query, documents)
             response = self.run(
                 self.prompt_template,
                 input_data,
+                metadata=metadata,
+                session_id=session_id,
             )
 
             if hasattr(response, "content"):
@@ -71,19 +88,122 @@ class RetrievalAgent(BaseAgent):
             logger.error("Error generating response: %s", e)
             raise Exception(f"Failed to generate response: {str(e)}") from e
 
-    def _format_documents(self, documents: List[Document]) -> str:
+    async def agenerate_response(
+        self,
+        query: str,
+        documents: List[Document],
+        session_id: str = None,
+    ) -> Dict[str, str]:
+        """
+        Async version of `generate_response`.
+
+        Args:
+            query (str): The user's query.
+            documents (List[Document]): Relevant documents for the query.
+            session_id (str, optional): Langfuse session of the call.
+
+        Returns:
+            Dict[str, str]: A response containing the AI's answer under the key 'ai_response'.
+
+        Raises:
+            Exception: If response generation fails.
+        """
+        try:
+            input_data, metadata = self._input_data(query, documents)
+            response = await self.arun(
+                self.prompt_template,
+                input_data,
+                metadata=metadata,
+                session_id=session_id,
+            )
+            if hasattr(response, "content"):
+                return {"ai_response": response.content}
+            return {"ai_response": response}
+        except Exception as e:
+            logger.error("Error generating response: %s", e)
+            raise Exception(f"Failed to generate response: {str(e)}") from e
+
+    async def astream_response(
+        self,
+        query: str,
+        documents: List[Document],
+        session_id: str = None,
+    ) -> AsyncIterator[str]:
+        """
+        Stream the response to the query as the model generates it.
+
+        Args:
+            query (str): The user's query.
+            documents (List[Document]): Relevant documents for the query.
+            session_id (str, optional): Langfuse session of the call.
+
+        Yields:
+            str: The next piece of the answer.
+
+        Raises:
+            Exception: If response generation fails.
+        """
+        try:
+            input_data, metadata = self._input_data(query, documents)
+            async for token in self.astream(
+                self.prompt_template,
+                input_data,
+                metadata=metadata,
+                session_id=session_id,
+            ):
+                yield token
+        except Exception as e:
+            logger.error("Error streaming response: %s", e)
+            raise Exception(f"Failed to generate response: {str(e)}") from e
+
+    def _input_data(
+        self, query: str, documents: List[Document]
+    ) -> Tuple[dict, Dict[str, Any]]:
+        """Build the prompt input and the packing stats traced with it."""
+        context = self._format_documents(documents)
+        metadata = {
+            key: context[key]
+            for key in (
+                "tokens",
+                "original_tokens",
+                "merged_tokens",
+                "tokens_saved",
+                "tokens_truncated",
+                "chunks",
+                "blocks",
+            )
+        }
+        logger.info(
+            f"Packed {context['chunks']} documents into {context['blocks']} "
+            f"blocks of {context['tokens']} tokens, "
+            f"{context['tokens_saved']} tokens saved by merging, "
+            f"{context['tokens_truncated']} truncated by the budget"
+        )
+        return {"query": query, "documents": context["text"]}, {
+            f"context_{key}": value for key, value in metadata.items()
+        }
+
+    def _format_documents(self, documents: List[Document]) -> Dict[str, Any]:
         """
         Format the documents for prompt input.
 
+        Overlapping chunks of a page are merged, near-duplicates removed and
+        the result packed into `CONTEXT_TOKEN_BUDGET` tokens.
+
         Args:
-            documents (List[Document]): Documents to format.
+            documents (List[Document]): Documents to format, best first.
 
         Returns:
-            str: A single formatted string containing all documents.
+            Dict[str, Any]: The formatted `text` and the packing stats of
+                `pack_context`.
         """
-        return "\n".join(
-            [
-                f"Page: {doc.metadata['page']}\nSource: {doc.metadata['file_name']}\n{doc.page_content}\n-----------\n"
-                for doc in documents
-            ]
+        return pack_context(
+            documents,
+            self._format_document,
+            CONTEXT_TOKEN_BUDGET,
+            self.model_openai,
         )
+
+    @staticmethod
+    def _format_document(doc: Document) -> str:
+        return f"Page: {doc.metadata['page']}\nSource: {doc.metadata['file_name']}\n{doc.page_content}\n-----------\n"
@@ -1,10 +1,13 @@
 # app/main.py
 import os
+from contextlib import asynccontextmanager
 
 from asgi_correlation_id import CorrelationIdMiddleware
 from dotenv import load_dotenv
 from fastapi import FastAPI
+from starlette.concurrency import run_in_threadpool
 
+from app.core.agents.llm_registry import llm_registry
 from app.routers import get_swagger_router
 from app.routers.v1 import (
     index_router,
@@ -12,7 +15,10 @@ from app.routers.v1 import (
     root_router,
     vector_router,
 )
+from app.services.vector_service import VECTOR_BACKEND
+from app.services.vector_store_registry import vector_store_registry
 from app.utils.logger import logger
+from app.utils.process_pool import process_pool
 
 load_dotenv(override=True)
 
@@ -22,6 +28,20 @@ else:
     logger.info("Running in non-local mode, swagger has auth")
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    process_pool.start()
+    if VECTOR_BACKEND == "pgvector":
+        try:
+            await run_in_threadpool(vector_store_registry.setup)
+        except Exception as e:
+            logger.error(f"Error setting up the vector store: {e}")
+    yield
+    process_pool.shutdown()
+    await vector_store_registry.adispose()
+    await llm_registry.aclose()
+
+
 app = FastAPI(
     title="Stori RAG Challenge",
     version="1.0.0",
@@ -30,6 +50,7 @@ app = FastAPI(
     openapi_url=(
         None if os.getenv("ENVIRONMENT") != "local" else "/openapi.json"
     ),
+    lifespan=lifespan,
 )
 app.add_middleware(CorrelationIdMiddleware)
 
@@ -10,9 +10,17 @@ from fastapi import (
     Query,
     UploadFile,
 )
+from pydantic import BaseModel, Field
 from starlette import status
+from starlette.concurrency import run_in_threadpool
 
 from app.services import IndexService, PDFLoaderService
+from app.services.answer_cache import answer_cache, tfidf_namespace
+from app.services.index_registry import index_registry
+from app.services.ingestion_tasks import (
+    append_tfidf_documents,
+    build_tfidf_index,
+)
 from app.utils.logger import logger
 
 router = APIRouter(
@@ -20,6 +28,13 @@ router = APIRouter(
     tags=["Index - TF-IDF"],
 )
 
+MAX_BATCH_QUERIES = 256
+
+
+class BatchSearchRequest(BaseModel):
+    queries: List[str] = Field(..., min_length=1, max_length=MAX_BATCH_QUERIES)
+    k: int = Field(10, gt=0, description="Number of results per query")
+
 
 @router.post(
     "/",
@@ -38,22 +53,24 @@ async def index_documents(
         files (List[UploadFile]): List of PDF files to process and index.
 
     Returns:
-        dict: A status message including the index name.
+        dict: A status message including the index name and extraction throughput.
 
     Raises:
         HTTPException: If an error occurs while processing files or creating the index.
     """
     try:
         pdf_loader_service = PDFLoaderService(files)
-        docs = pdf_loader_service.load_pdfs()
-
-        index_service = IndexService(docs)
-        index_service.save_index(index_name)
+        await pdf_loader_service.run_in_process_pool(
+            build_tfidf_index, index_name
+        )
+        # The worker only invalidated its own copy of the answer caches.
+        answer_cache.invalidate(tfidf_namespace(index_name))
 
         return {
             "status": "success",
             "message": "Index created successfully",
             "index_name": index_name,
+            "extraction": pdf_loader_service.extraction_stats,
         }
     except HTTPException as e:
         logger.error(f"Error indexing documents: {str(e)}")
@@ -66,6 +83,21 @@ async def index_documents(
         )
 
 
+@router.get(
+    "/registry/stats",
+    description="Get index registry cache statistics",
+    status_code=status.HTTP_200_OK,
+)
+async def index_registry_stats():
+    """
+    Get the hit, miss and eviction counters of the in-process index registry.
+
+    Returns:
+        dict: Cache counters and memory usage of the index registry.
+    """
+    return index_registry.stats()
+
+
 @router.get(
     "/{index_name}/search",
     description="Search for documents in an index",
@@ -74,7 +106,7 @@ async def index_documents(
 async def search_index(
     index_name: str = Path(..., description="Index name"),
     query: str = Query(..., description="Search query"),
-    k: int = Query(10, description="Number of results to return"),
+    k: int = Query(10, gt=0, description="Number of results to return"),
 ):
     """
     Search for documents in an existing index.
@@ -102,6 +134,177 @@ async def search_index(
         raise e
 
 
+@router.post(
+    "/{index_name}/search/batch",
+    description="Search for several queries in an index at once",
+    status_code=status.HTTP_200_OK,
+)
+async def batch_search_index(
+    search_request: BatchSearchRequest,
+    index_name: str = Path(..., description="Index name"),
+):
+    """
+    Search for several queries in an existing index with a single request.
+
+    The index is loaded once and all queries are scored together.
+
+    Args:
+        search_request (BatchSearchRequest): The queries and results per query.
+        index_name (str): The index name to search in.
+
+    Returns:
+        List[List[Document]]: Relevant documents for each query, in the same
+            order as the queries.
+
+    Raises:
+        HTTPException: If the index is not found or an error occurs during search.
+    """
+    try:
+        index_service = IndexService()
+        index_service.load_index(index_name)
+        return await run_in_threadpool(
+            index_service.batch_search,
+            search_request.queries,
+            search_request.k,
+        )
+    except HTTPException as e:
+        logger.error(f"Error searching index: {e}")
+        raise e
+    except Exception as e:
+        logger.error(f"Error searching index: {e}")
+        raise e
+
+
+@router.post(
+    "/{index_name}/documents",
+    description="Append documents to an existing index",
+    status_code=status.HTTP_201_CREATED,
+)
+async def append_documents(
+    index_name: str = Path(..., description="Index name"),
+    files: List[UploadFile] = File(...),
+):
+    """
+    Append uploaded PDF files to an existing index without rebuilding it.
+
+    Args:
+        index_name (str): The name of the index to update.
+        files (List[UploadFile]): List of PDF files to process and append.
+
+    Returns:
+        dict: A status message including the index name and the number of chunks added.
+
+    Raises:
+        HTTPException: If the index is not found or an error occurs while updating it.
+    """
+    try:
+        pdf_loader_service = PDFLoaderService(files)
+        chunks_added = await pdf_loader_service.run_in_process_pool(
+            append_tfidf_documents, index_name
+        )
+        answer_cache.invalidate(tfidf_namespace(index_name))
+
+        return {
+            "status": "success",
+            "message": "Documents appended successfully",
+            "index_name": index_name,
+            "chunks_added": chunks_added,
+            "extraction": pdf_loader_service.extraction_stats,
+        }
+    except HTTPException as e:
+        logger.error(f"Error appending documents: {str(e)}")
+        raise e
+    except Exception as e:
+        logger.error(f"Unexpected error appending documents: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Internal server error: {str(e)}",
+        )
+
+
+@router.delete(
+    "/{index_name}/documents",
+    description="Remove documents from an index by file name",
+    status_code=status.HTTP_200_OK,
+)
+async def remove_documents(
+    index_name: str = Path(..., description="Index name"),
+    file_name: List[str] = Query(..., description="File names to remove"),
+):
+    """
+    Remove every chunk of the given files from an existing index.
+
+    The update waits for the index lock and may compact the index, so it
+    runs in the thread pool.
+
+    Args:
+        index_name (str): The name of the index to update.
+        file_name (List[str]): Names of the files whose chunks are removed.
+
+    Returns:
+        dict: A status message including the number of chunks removed.
+
+    Raises:
+        HTTPException: If the index is not found or an error occurs while updating it.
+    """
+    try:
+        index_service = IndexService()
+        removed = await run_in_threadpool(
+            index_service.remove_documents, index_name, file_name
+        )
+        return {
+            "status": "success",
+            "message": "Documents removed successfully",
+            "index_name": index_name,
+            "chunks_removed": removed,
+        }
+    except HTTPException as e:
+        logger.error(f"Error removing documents: {e}")
+        raise e
+    except Exception as e:
+        logger.error(f"Error removing documents: {e}")
+        raise e
+
+
+@router.post(
+    "/{index_name}/compact",
+    description="Compact an index",
+    status_code=status.HTTP_200_OK,
+)
+async def compact_index(
+    index_name: str = Path(..., description="Index name"),
+):
+    """
+    Merge the segments of an index and drop removed documents.
+
+    Compaction is CPU-bound and waits for the index lock, so it runs in the
+    thread pool.
+
+    Args:
+        index_name (str): The name of the index to compact.
+
+    Returns:
+        dict: A status message including the index name.
+
+    Raises:
+        HTTPException: If the index is not found or compaction fails.
+    """
+    try:
+        index_service = IndexService()
+        await run_in_threadpool(index_service.compact_index, index_name)
+        return {
+            "status": "success",
+            "message": "Index compacted successfully",
+            "index_name": index_name,
+        }
+    except HTTPException as e:
+        logger.error(f"Error compacting index: {e}")
+        raise e
+    except Exception as e:
+        logger.error(f"Error compacting index: {e}")
+        raise e
+
+
 @router.delete(
     "/{index_name}",
     description="Delete an index",
@@ -122,7 +325,7 @@ async def delete_index(index_name: str):
     """
     try:
         index_service = IndexService()
-        index_service.remove_index(index_name)
+        await run_in_threadpool(index_service.remove_index, index_name)
         return {
             "status": "success",
             "message": "Index deleted successfully",
@@ -1,21 +1,99 @@
 # app/routers/v1/retrieval_router.py
-from typing import Dict
+import json
+from typing import Any, AsyncIterator, Dict, List
 
 from fastapi import APIRouter, HTTPException, Path, Query
+from fastapi.responses import StreamingResponse
+from langchain_core.documents import Document
+from starlette.concurrency import run_in_threadpool
 
 from app.services import RetrievalService
+from app.services.answer_cache import answer_cache
+from app.services.semantic_cache import semantic_cache
 
 router = APIRouter(
     prefix="/retrieve",
     tags=["Retrieval - LLM"],
 )
 
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def _sse(event: str, data: Any) -> str:
+    """Format one server-sent event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+async def _stream_answer(
+    retrieval_service: RetrievalService,
+    query: str,
+    documents: List[Document],
+    lookup: Dict[str, Any],
+) -> AsyncIterator[str]:
+    """Yield the sources, then the answer tokens, then a final event.
+
+    Errors raised once the stream started are sent as an `error` event,
+    since the status code was already sent.
+    """
+    yield _sse(
+        "sources",
+        [
+            {"page_content": doc.page_content, "metadata": doc.metadata}
+            for doc in documents
+        ],
+    )
+    try:
+        async for token in retrieval_service.astream_response(
+            query, documents, lookup
+        ):
+            yield _sse("token", token)
+    except Exception as e:
+        yield _sse("error", {"detail": str(e)})
+        return
+    yield _sse("done", {})
+
+
+async def _stream_retrieval(
+    query: str,
+    retrieval_type: str,
+    k: int,
+    index_name: str = None,
+    collection: str = None,
+) -> StreamingResponse:
+    """Retrieve the documents, then stream the answer as server-sent events.
+
+    Retrieval happens before the response starts, so its errors keep their
+    HTTP status code. It is skipped on a semantic cache hit, whose sources
+    are sent instead.
+    """
+    try:
+        retrieval_service = await run_in_threadpool(
+            RetrievalService, index_name, collection
+        )
+        lookup = await retrieval_service.asemantic_lookup(
+            query, retrieval_type, k
+        )
+        documents = lookup["documents"]
+        if documents is None:
+            documents = await retrieval_service.aretrieve_documents(
+                query, retrieval_type, k
+            )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return StreamingResponse(
+        _stream_answer(retrieval_service, query, documents, lookup),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
+
 
 @router.get("/tfidf/{index_name}")
 async def retrieve_information_tfidf(
     index_name: str = Path(..., description="Index name"),
     query: str = Query(..., description="Search query"),
-    k: int = Query(5, description="Number of results to return"),
+    k: int = Query(5, gt=0, description="Number of results to return"),
 ) -> Dict[str, str]:
     """
     Retrieve information based on a query from a specific index.
@@ -32,9 +110,12 @@ async def retrieve_information_tfidf(
         HTTPException: If retrieval fails
     """
     try:
-        return RetrievalService(index_name=index_name).retrieve_information(
-            query, "tfidf", k
+        retrieval_service = await run_in_threadpool(
+            RetrievalService, index_name
         )
+        return await retrieval_service.aretrieve_information(query, "tfidf", k)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -43,7 +124,7 @@ async def retrieve_information_tfidf(
 async def retrieve_information_vector(
     collection: str = Path(..., description="Collection (namespace) name"),
     query: str = Query(..., description="Search query"),
-    k: int = Query(5, description="Number of results to return"),
+    k: int = Query(5, gt=0, description="Number of results to return"),
 ) -> Dict[str, str]:
     """
     Retrieve information based on a query from a vector store collection.
@@ -59,6 +140,148 @@ async def retrieve_information_vector(
     Raises:
         HTTPException: If retrieval fails.
     """
-    return RetrievalService(collection=collection).retrieve_information(
-        query, "vector", k
+    retrieval_service = await run_in_threadpool(
+        RetrievalService, collection=collection
+    )
+    return await retrieval_service.aretrieve_information(query, "vector", k)
+
+
+@router.get("/hybrid/{index_name}/{collection}")
+async def retrieve_information_hybrid(
+    index_name: str = Path(..., description="TF-IDF index name"),
+    collection: str = Path(..., description="Collection (namespace) name"),
+    query: str = Query(..., description="Search query"),
+    k: int = Query(5, gt=0, description="Number of results to return"),
+) -> Dict[str, str]:
+    """
+    Retrieve information from a TF-IDF index and a vector collection at once.
+
+    Both are searched concurrently and their results merged with reciprocal
+    rank fusion before the response is generated.
+
+    Args:
+        index_name (str): Name of the TF-IDF index to search.
+        collection (str): The name of the vector store collection.
+        query (str): The search query.
+        k (int, optional): The number of fused documents. Defaults to 5.
+
+    Returns:
+        Dict[str, str]: The response containing the retrieved information.
+
+    Raises:
+        HTTPException: If retrieval fails.
+    """
+    try:
+        retrieval_service = await run_in_threadpool(
+            RetrievalService, index_name, collection
+        )
+        return await retrieval_service.aretrieve_information(
+            query, "hybrid", k
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/tfidf/{index_name}/stream")
+async def stream_information_tfidf(
+    index_name: str = Path(..., description="Index name"),
+    query: str = Query(..., description="Search query"),
+    k: int = Query(5, gt=0, description="Number of results to return"),
+) -> StreamingResponse:
+    """
+    Stream the answer to a query over a TF-IDF index as server-sent events.
+
+    A `sources` event with the retrieved documents comes first, then one
+    `token` event per piece of the answer, and a final `done` event, or an
+    `error` event if generation fails.
+
+    Args:
+        index_name (str): Name of the index to search.
+        query (str): Search query.
+        k (int, optional): Number of documents to retrieve. Defaults to 5.
+
+    Returns:
+        StreamingResponse: The `text/event-stream` response.
+
+    Raises:
+        HTTPException: If retrieval fails.
+    """
+    return await _stream_retrieval(query, "tfidf", k, index_name=index_name)
+
+
+@router.get("/retrieve/vector/{collection}/stream")
+async def stream_information_vector(
+    collection: str = Path(..., description="Collection (namespace) name"),
+    query: str = Query(..., description="Search query"),
+    k: int = Query(5, gt=0, description="Number of results to return"),
+) -> StreamingResponse:
+    """
+    Stream the answer to a query over a vector collection as server-sent events.
+
+    Events are the same as for `/tfidf/{index_name}/stream`.
+
+    Args:
+        collection (str): The name of the vector store collection.
+        query (str): The search query.
+        k (int, optional): The number of documents to retrieve. Defaults to 5.
+
+    Returns:
+        StreamingResponse: The `text/event-stream` response.
+
+    Raises:
+        HTTPException: If retrieval fails.
+    """
+    return await _stream_retrieval(query, "vector", k, collection=collection)
+
+
+@router.get("/hybrid/{index_name}/{collection}/stream")
+async def stream_information_hybrid(
+    index_name: str = Path(..., description="TF-IDF index name"),
+    collection: str = Path(..., description="Collection (namespace) name"),
+    query: str = Query(..., description="Search query"),
+    k: int = Query(5, gt=0, description="Number of results to return"),
+) -> StreamingResponse:
+    """
+    Stream the answer to a hybrid query as server-sent events.
+
+    Events are the same as for `/tfidf/{index_name}/stream`.
+
+    Args:
+        index_name (str): Name of the TF-IDF index to search.
+        collection (str): The name of the vector store collection.
+        query (str): The search query.
+        k (int, optional): The number of fused documents. Defaults to 5.
+
+    Returns:
+        StreamingResponse: The `text/event-stream` response.
+
+    Raises:
+        HTTPException: If retrieval fails.
+    """
+    return await _stream_retrieval(
+        query, "hybrid", k, index_name=index_name, collection=collection
     )
+
+
+@router.get("/cache/stats")
+async def answer_cache_stats() -> Dict[str, Any]:
+    """
+    Get the hit ratio of the answer cache.
+
+    Returns:
+        Dict[str, Any]: Cache hits, misses, hit ratio and number of stored answers.
+    """
+    return await run_in_threadpool(answer_cache.stats)
+
+
+@router.get("/cache/semantic/stats")
+async def semantic_cache_stats() -> Dict[str, Any]:
+    """
+    Get the hit ratio of the semantic answer cache.
+
+    Returns:
+        Dict[str, Any]: Cache hits, misses, hit ratio and number of scopes and stored answers.
+    """
+    return semantic_cache.stats()
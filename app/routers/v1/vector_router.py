@@ -1,4 +1,5 @@
-from typing import List
+import json
+from typing import Any, Dict, List, Literal, Optional
 
 from fastapi import (
     APIRouter,
@@ -9,11 +10,16 @@ from fastapi import (
     Query,
     UploadFile,
 )
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from starlette import status
+from starlette.concurrency import run_in_threadpool
 
 from app.constants.openai_models import EmbeddingOpenAIModels
-from app.services import PDFLoaderService, VectorService
+from app.services import PDFLoaderService
+from app.services.ann_index_service import ann_index_service
+from app.services.embedding_cache import embedding_cache
+from app.services.vector_service import VECTOR_BACKEND, acreate_vector_service
+from app.services.vector_store_registry import vector_store_registry
 
 router = APIRouter(
     prefix="/vector",
@@ -21,10 +27,119 @@ router = APIRouter(
 )
 
 
+def _require_pgvector() -> None:
+    if VECTOR_BACKEND != "pgvector":
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="ANN index management requires the pgvector backend",
+        )
+
+
+def _filter_params(
+    filter: Optional[Any] = None,
+    file_name: Optional[str] = None,
+    page: Optional[int] = None,
+) -> Optional[dict]:
+    """Combine a metadata filter with the `file_name` and `page` shortcuts.
+
+    Args:
+        filter (Optional[Any]): A PGVector-style filter, as a dict or a JSON string.
+        file_name (Optional[str]): Only match chunks of this file.
+        page (Optional[int]): Only match chunks of this page.
+
+    Returns:
+        Optional[dict]: The filter passed to the vector service, if any.
+
+    Raises:
+        HTTPException: If the filter is not a JSON object.
+    """
+    if isinstance(filter, str):
+        try:
+            filter = json.loads(filter)
+        except json.JSONDecodeError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"filter is not valid JSON: {e}",
+            )
+    if filter is not None and not isinstance(filter, dict):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="filter must be a JSON object",
+        )
+    conditions = [filter] if filter else []
+    if file_name is not None:
+        conditions.append({"file_name": file_name})
+    if page is not None:
+        conditions.append({"page": page})
+    if not conditions:
+        return None
+    return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+
+FILTER_DESCRIPTION = (
+    'Metadata filter as JSON, e.g. {"page": {"$between": [2, 5]}}. '
+    "Supports $eq, $ne, $lt, $lte, $gt, $gte, $in, $nin, $between, "
+    "$exists, $like, $ilike, $and and $or"
+)
+
+
 class DeleteDocumentsRequest(BaseModel):
     ids: List[int]
 
 
+MAX_BATCH_QUERIES = 256
+
+
+class BatchSearchRequest(BaseModel):
+    queries: List[str] = Field(..., min_length=1, max_length=MAX_BATCH_QUERIES)
+    k: int = Field(10, gt=0, description="Number of results per query")
+    ef_search: Optional[int] = Field(
+        None, ge=1, le=1000, description="HNSW candidate list size"
+    )
+    probes: Optional[int] = Field(
+        None, ge=1, description="IVFFlat lists to scan"
+    )
+    filter: Optional[Dict[str, Any]] = Field(
+        None, description=FILTER_DESCRIPTION
+    )
+    file_name: Optional[str] = Field(
+        None, description="Only search chunks of this file"
+    )
+    page: Optional[int] = Field(
+        None, ge=0, description="Only search chunks of this page"
+    )
+
+
+class ANNIndexRequest(BaseModel):
+    method: Literal["hnsw", "ivfflat"] = "hnsw"
+    m: int = Field(16, ge=2, le=100, description="HNSW connections per node")
+    ef_construction: int = Field(
+        64, ge=4, le=1000, description="HNSW candidate list size at build"
+    )
+    lists: Optional[int] = Field(
+        None,
+        ge=1,
+        le=32768,
+        description="IVFFlat lists. Defaults to rows / 1000",
+    )
+
+
+class RecallReportRequest(BaseModel):
+    k: int = Field(10, gt=0, le=100, description="Results per query")
+    queries: int = Field(
+        50,
+        ge=1,
+        le=1000,
+        description="Query vectors sampled from the collection",
+    )
+    ef_search: Optional[List[int]] = Field(
+        None, description="HNSW ef_search values to compare"
+    )
+    probes: Optional[List[int]] = Field(
+        None, description="IVFFlat probes values to compare"
+    )
+
+
 @router.post(
     "/",
     status_code=status.HTTP_201_CREATED,
@@ -33,13 +148,32 @@ class DeleteDocumentsRequest(BaseModel):
 async def index_documents_vector(
     collection_name: str = Form(...),
     files: List[UploadFile] = File(...),
+    dimensions: Optional[int] = Form(
+        None, description="Reduced embedding dimensions (text-embedding-3)"
+    ),
+    quantization: Optional[str] = Form(
+        None,
+        description=(
+            "Compact vectors scanned before rescoring: halfvec or binary "
+            "(pgvector, applied by the ANN index), halfvec or int8 (local)"
+        ),
+    ),
+    rescore_factor: Optional[int] = Form(
+        None, description="Candidates rescored at full precision per result"
+    ),
 ):
     """
     Index documents using the vector service for a specified collection.
 
+    The embedding settings are recorded on the collection the first time,
+    and can only change while the collection is empty.
+
     Args:
         collection_name (str): The name of the collection (namespace) for documents.
         files (List[UploadFile]): List of PDF files to process and index.
+        dimensions (Optional[int]): Reduced embedding dimensions.
+        quantization (Optional[str]): Quantization of the stored vectors.
+        rescore_factor (Optional[int]): Candidates rescored per result.
 
     Returns:
         dict: A status message indicating the result of indexing.
@@ -49,26 +183,69 @@ async def index_documents_vector(
     """
     try:
         pdf_loader_service = PDFLoaderService(files)
-        docs = pdf_loader_service.load_pdfs()
+        docs = await pdf_loader_service.aload_pdfs()
 
         # Instantiate embeddings (adjust the model as needed)
-        vector_service = VectorService(
+        vector_service = await acreate_vector_service(
             embedding_model=EmbeddingOpenAIModels.TEXT_EMBEDDING_3_LARGE,
             collection_name=collection_name,
         )
-        vector_service.index_documents(docs)
+        embedding_config = None
+        if any(
+            value is not None
+            for value in (dimensions, quantization, rescore_factor)
+        ):
+            embedding_config = await vector_service.aconfigure(
+                dimensions, quantization, rescore_factor
+            )
+        embedding_stats = await vector_service.aindex_documents(docs)
 
         return {
             "status": "success",
             "message": "Documents indexed successfully",
             "collection_name": collection_name,
+            "extraction": pdf_loader_service.extraction_stats,
+            "embedding": embedding_stats,
+            "embedding_config": embedding_config,
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
         )
 
 
+@router.get(
+    "/embeddings/cache/stats",
+    status_code=status.HTTP_200_OK,
+    description="Get embedding cache statistics",
+)
+async def embedding_cache_stats():
+    """
+    Get the hit ratio of the embedding cache.
+
+    Returns:
+        dict: Cache hits, misses, hit ratio and number of stored vectors.
+    """
+    return await run_in_threadpool(embedding_cache.stats)
+
+
+@router.get(
+    "/registry/stats",
+    status_code=status.HTTP_200_OK,
+    description="Get vector store registry statistics",
+)
+async def vector_store_registry_stats():
+    """
+    Get the cached vector stores and the database connection pool status.
+
+    Returns:
+        dict: Cached stores and connection pool usage.
+    """
+    return vector_store_registry.stats()
+
+
 @router.get(
     "/{collection}/search",
     status_code=status.HTTP_200_OK,
@@ -77,7 +254,20 @@ async def index_documents_vector(
 async def search_vector(
     collection: str = Path(..., description="Collection (namespace) name"),
     query: str = Query(..., description="Search query"),
-    k: int = Query(10, description="Number of results to return"),
+    k: int = Query(10, gt=0, description="Number of results to return"),
+    ef_search: Optional[int] = Query(
+        None, ge=1, le=1000, description="HNSW candidate list size"
+    ),
+    probes: Optional[int] = Query(
+        None, ge=1, description="IVFFlat lists to scan"
+    ),
+    filter: Optional[str] = Query(None, description=FILTER_DESCRIPTION),
+    file_name: Optional[str] = Query(
+        None, description="Only search chunks of this file"
+    ),
+    page: Optional[int] = Query(
+        None, ge=0, description="Only search chunks of this page"
+    ),
 ):
     """
     Search for documents in the specified collection using a similarity search.
@@ -86,6 +276,11 @@ async def search_vector(
         collection (str): The collection (namespace) name.
         query (str): The search query.
         k (int, optional): The number of results to return. Defaults to 10.
+        ef_search (int, optional): HNSW candidate list size, if the collection has an HNSW index.
+        probes (int, optional): IVFFlat lists to scan, if the collection has an IVFFlat index.
+        filter (str, optional): A JSON metadata filter, applied in the database.
+        file_name (str, optional): Only search chunks of this file.
+        page (int, optional): Only search chunks of this page.
 
     Returns:
         dict: A dictionary containing the status and search results.
@@ -93,12 +288,15 @@ async def search_vector(
     Raises:
         HTTPException: If an error occurs during the search.
     """
+    filter_params = _filter_params(filter, file_name, page)
     try:
-        vector_service = VectorService(
+        vector_service = await acreate_vector_service(
             embedding_model=EmbeddingOpenAIModels.TEXT_EMBEDDING_3_LARGE,
             collection_name=collection,
         )
-        documents = vector_service.search(query, k)
+        documents = await vector_service.asearch(
+            query, k, filter_params, ef_search=ef_search, probes=probes
+        )
         results = [
             {"page_content": doc.page_content, "metadata": doc.metadata}
             for doc in documents
@@ -118,7 +316,20 @@ async def search_vector(
 async def search_vector_with_score(
     collection: str = Path(..., description="Collection (namespace) name"),
     query: str = Query(..., description="Search query"),
-    k: int = Query(10, description="Number of results to return"),
+    k: int = Query(10, gt=0, description="Number of results to return"),
+    ef_search: Optional[int] = Query(
+        None, ge=1, le=1000, description="HNSW candidate list size"
+    ),
+    probes: Optional[int] = Query(
+        None, ge=1, description="IVFFlat lists to scan"
+    ),
+    filter: Optional[str] = Query(None, description=FILTER_DESCRIPTION),
+    file_name: Optional[str] = Query(
+        None, description="Only search chunks of this file"
+    ),
+    page: Optional[int] = Query(
+        None, ge=0, description="Only search chunks of this page"
+    ),
 ):
     """
     Search for documents in the specified collection with their similarity scores.
@@ -127,6 +338,11 @@ async def search_vector_with_score(
         collection (str): The collection (namespace) name.
         query (str): The search query.
         k (int, optional): The number of results to return. Defaults to 10.
+        ef_search (int, optional): HNSW candidate list size, if the collection has an HNSW index.
+        probes (int, optional): IVFFlat lists to scan, if the collection has an IVFFlat index.
+        filter (str, optional): A JSON metadata filter, applied in the database.
+        file_name (str, optional): Only search chunks of this file.
+        page (int, optional): Only search chunks of this page.
 
     Returns:
         list: A list of documents with their corresponding similarity scores.
@@ -134,12 +350,245 @@ async def search_vector_with_score(
     Raises:
         HTTPException: If an error occurs during the search.
     """
+    filter_params = _filter_params(filter, file_name, page)
+    try:
+        vector_service = await acreate_vector_service(
+            embedding_model=EmbeddingOpenAIModels.TEXT_EMBEDDING_3_LARGE,
+            collection_name=collection,
+        )
+        return await vector_service.asearch_with_score(
+            query, k, filter_params, ef_search=ef_search, probes=probes
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
+        )
+
+
+@router.post(
+    "/{collection}/search/batch",
+    status_code=status.HTTP_200_OK,
+    description="Search for several queries in a vector store at once",
+)
+async def batch_search_vector(
+    search_request: BatchSearchRequest,
+    collection: str = Path(..., description="Collection (namespace) name"),
+):
+    """
+    Search for several queries in the specified collection with a single request.
+
+    All queries are embedded with one embeddings call and searched over one
+    database session.
+
+    Args:
+        search_request (BatchSearchRequest): The queries and results per query.
+        collection (str): The collection (namespace) name.
+
+    Returns:
+        dict: A dictionary containing the status and the search results of
+            each query, in the same order as the queries.
+
+    Raises:
+        HTTPException: If an error occurs during the search.
+    """
+    filter_params = _filter_params(
+        search_request.filter, search_request.file_name, search_request.page
+    )
     try:
-        vector_service = VectorService(
+        vector_service = await acreate_vector_service(
             embedding_model=EmbeddingOpenAIModels.TEXT_EMBEDDING_3_LARGE,
             collection_name=collection,
         )
-        return vector_service.search_with_score(query, k)
+        batches = await vector_service.abatch_search(
+            search_request.queries,
+            search_request.k,
+            filter_params,
+            ef_search=search_request.ef_search,
+            probes=search_request.probes,
+        )
+        results = [
+            [
+                {"page_content": doc.page_content, "metadata": doc.metadata}
+                for doc in documents
+            ]
+            for documents in batches
+        ]
+        return {"status": "success", "results": results}
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
+        )
+
+
+@router.post(
+    "/{collection}/ann-index",
+    status_code=status.HTTP_201_CREATED,
+    description="Build or replace the ANN index of a collection",
+)
+async def build_ann_index(
+    index_request: ANNIndexRequest,
+    collection: str = Path(..., description="Collection (namespace) name"),
+):
+    """
+    Build an HNSW or IVFFlat index over the embeddings of a collection.
+
+    An existing index of the collection is replaced. Searches of the
+    collection use the index once it is built.
+
+    Args:
+        index_request (ANNIndexRequest): The index method and build settings.
+        collection (str): The collection (namespace) name.
+
+    Returns:
+        dict: The index settings and build time.
+
+    Raises:
+        HTTPException: If the collection is missing, empty or cannot be indexed.
+    """
+    _require_pgvector()
+    try:
+        return await run_in_threadpool(
+            ann_index_service.build,
+            collection,
+            index_request.method,
+            index_request.m,
+            index_request.ef_construction,
+            index_request.lists,
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
+        )
+
+
+@router.get(
+    "/{collection}/ann-index",
+    status_code=status.HTTP_200_OK,
+    description="Get the ANN index of a collection",
+)
+async def describe_ann_index(
+    collection: str = Path(..., description="Collection (namespace) name"),
+):
+    """
+    Get the settings, size and validity of the ANN index of a collection.
+
+    Args:
+        collection (str): The collection (namespace) name.
+
+    Returns:
+        dict: The index settings and state.
+
+    Raises:
+        HTTPException: If the collection has no ANN index.
+    """
+    _require_pgvector()
+    try:
+        return await run_in_threadpool(ann_index_service.describe, collection)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
+        )
+
+
+@router.post(
+    "/{collection}/ann-index/rebuild",
+    status_code=status.HTTP_200_OK,
+    description="Rebuild the ANN index of a collection",
+)
+async def rebuild_ann_index(
+    collection: str = Path(..., description="Collection (namespace) name"),
+):
+    """
+    Rebuild the ANN index of a collection with its current settings.
+
+    Useful after large inserts or deletes, e.g. to retrain IVFFlat lists.
+
+    Args:
+        collection (str): The collection (namespace) name.
+
+    Returns:
+        dict: The index settings and rebuild time.
+
+    Raises:
+        HTTPException: If the collection has no ANN index.
+    """
+    _require_pgvector()
+    try:
+        return await run_in_threadpool(ann_index_service.rebuild, collection)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
+        )
+
+
+@router.delete(
+    "/{collection}/ann-index",
+    status_code=status.HTTP_204_NO_CONTENT,
+    description="Drop the ANN index of a collection",
+)
+async def drop_ann_index(
+    collection: str = Path(..., description="Collection (namespace) name"),
+):
+    """
+    Drop the ANN index of a collection. Its searches become exact again.
+
+    Args:
+        collection (str): The collection (namespace) name.
+
+    Raises:
+        HTTPException: If the collection is missing or the index cannot be dropped.
+    """
+    _require_pgvector()
+    try:
+        await run_in_threadpool(ann_index_service.drop, collection)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
+        )
+
+
+@router.post(
+    "/{collection}/ann-index/recall",
+    status_code=status.HTTP_200_OK,
+    description="Compare recall and latency of the ANN index with exact search",
+)
+async def ann_recall_report(
+    report_request: RecallReportRequest,
+    collection: str = Path(..., description="Collection (namespace) name"),
+):
+    """
+    Measure recall@k and latency of the ANN index against exact search.
+
+    Args:
+        report_request (RecallReportRequest): The sample size and settings to compare.
+        collection (str): The collection (namespace) name.
+
+    Returns:
+        dict: Exact search latency, and recall and latency per setting.
+
+    Raises:
+        HTTPException: If the collection has no ANN index.
+    """
+    _require_pgvector()
+    try:
+        return await run_in_threadpool(
+            ann_index_service.recall_report,
+            collection,
+            report_request.k,
+            report_request.queries,
+            report_request.ef_search,
+            report_request.probes,
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
@@ -171,11 +620,11 @@ async def delete_documents_vector(
             detail="Document IDs are required",
         )
     try:
-        vector_service = VectorService(
+        vector_service = await acreate_vector_service(
             embedding_model=EmbeddingOpenAIModels.TEXT_EMBEDDING_3_LARGE,
             collection_name=collection,
         )
-        vector_service.delete_documents(deletion_request.ids)
+        await vector_service.adelete_documents(deletion_request.ids)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e)
@@ -1,12 +1,32 @@
 # app/services/__init__.py
+from .ann_index_service import ANNIndexService
+from .answer_cache import AnswerCache
+from .chunk_cache import ChunkCache
+from .embedding_cache import CachedEmbeddings
+from .embedding_scheduler import EmbeddingScheduler
+from .index_registry import IndexRegistry
 from .index_service import IndexService
+from .local_vector_index import LocalVectorIndex
+from .local_vector_service import LocalVectorService
 from .pdf_loader_service import PDFLoaderService
 from .retrieval_service import RetrievalService
+from .semantic_cache import SemanticAnswerCache
 from .vector_service import VectorService
+from .vector_store_registry import VectorStoreRegistry
 
 __all__ = [
+    "ANNIndexService",
+    "AnswerCache",
+    "CachedEmbeddings",
+    "ChunkCache",
+    "EmbeddingScheduler",
+    "IndexRegistry",
     "IndexService",
+    "LocalVectorIndex",
+    "LocalVectorService",
     "PDFLoaderService",
     "RetrievalService",
+    "SemanticAnswerCache",
     "VectorService",
+    "VectorStoreRegistry",
 ]
@@ -0,0 +1,489 @@
+# app/services/ann_index_service.py
+import math
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from fastapi import HTTPException, status
+from langchain_postgres.vectorstores import (
+    DistanceStrategy,
+    _get_embedding_collection_store,
+)
+from pgvector.sqlalchemy import BIT, HALFVEC, Vector
+from sqlalchemy import asc, cast, func, select, text
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.elements import ColumnElement, TextClause
+
+from app.constants.openai_models import EmbeddingOpenAIModels
+from app.services.embedding_config import embedding_config
+from app.services.vector_store_registry import (
+    PooledPGVector,
+    VectorStoreRegistry,
+    vector_store_registry,
+)
+from app.utils.logger import logger
+
+ANN_METHODS = ("hnsw", "ivfflat")
+ANN_METADATA_KEY = "ann_index"
+# pgvector can index up to 2000 dimensions as vector and 4000 as halfvec.
+MAX_VECTOR_INDEX_DIMENSIONS = 2000
+MAX_HALFVEC_INDEX_DIMENSIONS = 4000
+OPERATOR_CLASSES = {
+    DistanceStrategy.COSINE: "cosine_ops",
+    DistanceStrategy.EUCLIDEAN: "l2_ops",
+    DistanceStrategy.MAX_INNER_PRODUCT: "ip_ops",
+}
+DISTANCE_FUNCTIONS = {
+    DistanceStrategy.COSINE: "cosine_distance",
+    DistanceStrategy.EUCLIDEAN: "l2_distance",
+    DistanceStrategy.MAX_INNER_PRODUCT: "max_inner_product",
+}
+CAST_TYPES = {"vector": Vector, "halfvec": HALFVEC, "bit": BIT}
+# Casts losing precision: their candidates are rescored on the full vectors.
+LOSSY_CASTS = ("halfvec", "bit")
+
+
+def index_name(collection_uuid: Any) -> str:
+    """Name of the ANN index of a collection."""
+    return f"ix_embedding_ann_{collection_uuid.hex}"
+
+
+def ann_config(collection: Any) -> Optional[Dict[str, Any]]:
+    """Return the ANN index settings recorded on a collection row, if any."""
+    return (collection.cmetadata or {}).get(ANN_METADATA_KEY)
+
+
+def _first_stage_cast(collection: Any) -> Optional[Tuple[str, Optional[int]]]:
+    """Cast type and dimensions scanned for a collection, None for the raw column.
+
+    The stored column always holds full precision vectors, so quantization
+    only applies through the ANN index built on the quantized expression.
+    Without an index, casting every row would be slower than exact search.
+    """
+    config = ann_config(collection)
+    if config is not None:
+        return config["cast"], config["dimensions"]
+    return None
+
+
+def needs_rescoring(collection: Any) -> bool:
+    """Whether the candidates of a collection must be rescored at full precision."""
+    first_stage = _first_stage_cast(collection)
+    return first_stage is not None and first_stage[0] in LOSSY_CASTS
+
+
+def distance_expression(
+    store: PooledPGVector, collection: Any, embedding: List[float]
+) -> ColumnElement:
+    """Build the distance to `embedding` the way the collection is indexed.
+
+    Without an ANN index this is PGVector's own distance, whatever the
+    collection's quantization. Otherwise the column is cast exactly like in
+    the index expression, so the planner can use the partial index of the
+    collection. Binary quantized indexes are compared by hamming distance.
+
+    Args:
+        store (PooledPGVector): The collection's store.
+        collection (Any): The collection row.
+        embedding (List[float]): The query vector.
+
+    Returns:
+        ColumnElement: The distance expression.
+    """
+    first_stage = _first_stage_cast(collection)
+    if first_stage is None:
+        return store.distance_strategy(embedding)
+    cast_type, dimensions = first_stage
+    dimensions = dimensions or len(embedding)
+    if cast_type == "bit":
+        return cast(
+            func.binary_quantize(store.EmbeddingStore.embedding),
+            BIT(dimensions),
+        ).hamming_distance(
+            func.binary_quantize(cast(embedding, Vector(dimensions)))
+        )
+    column = cast(
+        store.EmbeddingStore.embedding, CAST_TYPES[cast_type](dimensions)
+    )
+    return getattr(column, DISTANCE_FUNCTIONS[store._distance_strategy])(
+        embedding
+    )
+
+
+def search_settings(
+    ef_search: Optional[int] = None, probes: Optional[int] = None
+) -> List[TextClause]:
+    """Build the `SET LOCAL` statements tuning one ANN query.
+
+    Args:
+        ef_search (Optional[int], optional): HNSW candidate list size.
+        probes (Optional[int], optional): IVFFlat lists to scan.
+
+    Returns:
+        List[TextClause]: Statements to run in the query's transaction.
+    """
+    settings = []
+    if ef_search is not None:
+        settings.append(text(f"SET LOCAL hnsw.ef_search = {int(ef_search)}"))
+    if probes is not None:
+        settings.append(text(f"SET LOCAL ivfflat.probes = {int(probes)}"))
+    return settings
+
+
+class ANNIndexService:
+    """Builds and drops HNSW or IVFFlat indexes per PGVector collection.
+
+    Every collection shares the `langchain_pg_embedding` table, so each index
+    is a partial expression index restricted to one collection. The column
+    is cast to a fixed-size `vector`, to `halfvec` above 2000 dimensions or
+    for halfvec collections, or binary quantized to `bit` for binary
+    collections, and the settings are recorded in the collection metadata so searches use
+    the matching expression.
+    """
+
+    def __init__(self, registry: VectorStoreRegistry):
+        """Initialize the service.
+
+        Args:
+            registry (VectorStoreRegistry): The registry providing the engine and stores.
+        """
+        self.registry = registry
+
+    def _store(self, collection_name: str) -> PooledPGVector:
+        return self.registry.get_store(
+            collection_name, EmbeddingOpenAIModels.TEXT_EMBEDDING_3_LARGE
+        )
+
+    def _collection(self, session: Session, collection_name: str) -> Any:
+        """Look up a collection row without creating it like PGVector does."""
+        _, collection_store = _get_embedding_collection_store()
+        collection = session.execute(
+            select(collection_store).filter(
+                collection_store.name == collection_name
+            )
+        ).scalar_one_or_none()
+        if collection is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Collection {collection_name} not found",
+            )
+        return collection
+
+    def build(
+        self,
+        collection_name: str,
+        method: str = "hnsw",
+        m: int = 16,
+        ef_construction: int = 64,
+        lists: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """Build, or rebuild with new settings, the ANN index of a collection.
+
+        The index is created concurrently, so the collection stays writable.
+
+        Args:
+            collection_name (str): The collection name.
+            method (str, optional): `hnsw` or `ivfflat`.
+            m (int, optional): HNSW connections per node.
+            ef_construction (int, optional): HNSW candidate list size at build time.
+            lists (Optional[int], optional): IVFFlat lists. Defaults to rows / 1000,
+                or the square root of the rows above one million rows.
+
+        Returns:
+            Dict[str, Any]: The recorded index settings.
+
+        Raises:
+            HTTPException: If the collection is empty or cannot be indexed.
+        """
+        if method not in ANN_METHODS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"method must be one of {', '.join(ANN_METHODS)}",
+            )
+        with Session(self.registry.engine) as session:
+            collection = self._collection(session, collection_name)
+            rows, dimensions = session.execute(
+                text(
+                    "SELECT count(*), coalesce(max(vector_dims(embedding)), 0) "
+                    "FROM langchain_pg_embedding WHERE collection_id = :uuid"
+                ),
+                {"uuid": collection.uuid},
+            ).one()
+        if not rows:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Collection {collection_name} has no embeddings",
+            )
+        quantization = embedding_config(collection.cmetadata)["quantization"]
+        if quantization == "binary":
+            cast_type = "bit"
+        elif (
+            quantization == "none"
+            and dimensions <= MAX_VECTOR_INDEX_DIMENSIONS
+        ):
+            cast_type = "vector"
+        elif dimensions <= MAX_HALFVEC_INDEX_DIMENSIONS:
+            cast_type = "halfvec"
+        else:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Cannot index {dimensions} dimensions",
+            )
+
+        if method == "hnsw":
+            options = {"m": m, "ef_construction": ef_construction}
+        else:
+            if lists is None:
+                lists = (
+                    max(1, rows // 1000)
+                    if rows <= 1_000_000
+                    else int(math.sqrt(rows))
+                )
+            options = {"lists": lists}
+        store = self._store(collection_name)
+        if cast_type == "bit":
+            operator_class = "bit_hamming_ops"
+            expression = f"binary_quantize(embedding)::bit({dimensions})"
+        else:
+            operator_class = (
+                f"{cast_type}_{OPERATOR_CLASSES[store._distance_strategy]}"
+            )
+            expression = f"embedding::{cast_type}({dimensions})"
+        name = index_name(collection.uuid)
+        with_options = ", ".join(f"{k} = {int(v)}" for k, v in options.items())
+        started = time.perf_counter()
+        with self.registry.engine.connect().execution_options(
+            isolation_level="AUTOCOMMIT"
+        ) as conn:
+            conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+            conn.execute(
+                text(
+                    f"CREATE INDEX CONCURRENTLY {name} "
+                    f"ON {store.EmbeddingStore.__tablename__} USING {method} "
+                    f"(({expression}) {operator_class}) "
+                    f"WITH ({with_options}) "
+                    f"WHERE collection_id = '{collection.uuid}'"
+                )
+            )
+        seconds = time.perf_counter() - started
+
+        config = {
+            "name": name,
+            "method": method,
+            "cast": cast_type,
+            "dimensions": dimensions,
+            **options,
+        }
+        self._record(collection_name, config)
+        logger.info(
+            f"Built {method} index of {collection_name} over {rows} rows "
+            f"in {seconds:.2f}s"
+        )
+        return {**config, "rows": rows, "seconds": round(seconds, 3)}
+
+    def rebuild(self, collection_name: str) -> Dict[str, Any]:
+        """Rebuild the ANN index of a collection with its current settings.
+
+        Args:
+            collection_name (str): The collection name.
+
+        Returns:
+            Dict[str, Any]: The index settings.
+
+        Raises:
+            HTTPException: If the collection has no ANN index.
+        """
+        config = self.describe(collection_name)
+        started = time.perf_counter()
+        with self.registry.engine.connect().execution_options(
+            isolation_level="AUTOCOMMIT"
+        ) as conn:
+            conn.execute(text(f"REINDEX INDEX CONCURRENTLY {config['name']}"))
+        seconds = time.perf_counter() - started
+        logger.info(f"Rebuilt {config['name']} in {seconds:.2f}s")
+        return {**config, "seconds": round(seconds, 3)}
+
+    def drop(self, collection_name: str) -> None:
+        """Drop the ANN index of a collection. Searches become exact again.
+
+        Args:
+            collection_name (str): The collection name.
+        """
+        with Session(self.registry.engine) as session:
+            collection = self._collection(session, collection_name)
+        with self.registry.engine.connect().execution_options(
+            isolation_level="AUTOCOMMIT"
+        ) as conn:
+            conn.execute(
+                text(
+                    "DROP INDEX CONCURRENTLY IF EXISTS "
+                    f"{index_name(collection.uuid)}"
+                )
+            )
+        self._record(collection_name, None)
+
+    def describe(self, collection_name: str) -> Dict[str, Any]:
+        """Return the ANN index settings, size and validity of a collection.
+
+        Args:
+            collection_name (str): The collection name.
+
+        Returns:
+            Dict[str, Any]: The index settings and state.
+
+        Raises:
+            HTTPException: If the collection has no ANN index.
+        """
+        with Session(self.registry.engine) as session:
+            collection = self._collection(session, collection_name)
+            config = ann_config(collection)
+            if config is None:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=f"Collection {collection_name} has no ANN index",
+                )
+            state = session.execute(
+                text(
+                    "SELECT pg_relation_size(i.indexrelid), i.indisvalid "
+                    "FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+                    "WHERE c.relname = :name"
+                ),
+                {"name": config["name"]},
+            ).one_or_none()
+        return {
+            **config,
+            "size_bytes": state[0] if state else 0,
+            "valid": bool(state and state[1]),
+        }
+
+    def _record(
+        self, collection_name: str, config: Optional[Dict[str, Any]]
+    ) -> None:
+        """Store the index settings in the collection metadata."""
+        try:
+            self.registry.set_collection_metadata(
+                collection_name, ANN_METADATA_KEY, config
+            )
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail=str(e)
+            )
+
+    def recall_report(
+        self,
+        collection_name: str,
+        k: int = 10,
+        n_queries: int = 50,
+        ef_search_values: Optional[List[int]] = None,
+        probes_values: Optional[List[int]] = None,
+    ) -> Dict[str, Any]:
+        """Measure recall and latency of the ANN index against exact search.
+
+        Query vectors are sampled from the collection. Exact results come
+        from a sequential scan of the uncast column; ANN queries are forced
+        onto the index for every `ef_search` or `probes` value.
+
+        Args:
+            collection_name (str): The collection name.
+            k (int, optional): Results per query.
+            n_queries (int, optional): Number of sampled query vectors.
+            ef_search_values (Optional[List[int]], optional): HNSW values to try.
+            probes_values (Optional[List[int]], optional): IVFFlat values to try.
+
+        Returns:
+            Dict[str, Any]: Exact latency, and recall@k and latency per setting.
+
+        Raises:
+            HTTPException: If the collection has no ANN index.
+        """
+        config = self.describe(collection_name)
+        store = self._store(collection_name)
+        if config["method"] == "hnsw":
+            parameter = "ef_search"
+            values = ef_search_values or [20, 40, 80, 160]
+        else:
+            parameter = "probes"
+            values = probes_values or sorted(
+                {p for p in (1, 5, 10, 20, 50) if p < config["lists"]}
+                | {min(50, config["lists"])}
+            )
+
+        with Session(self.registry.engine) as session:
+            collection = store.get_collection(session)
+            samples = session.execute(
+                select(store.EmbeddingStore.embedding)
+                .filter(store.EmbeddingStore.collection_id == collection.uuid)
+                .order_by(text("random()"))
+                .limit(n_queries)
+            ).scalars()
+            queries = [
+                np.asarray(v, dtype=np.float32).tolist() for v in samples
+            ]
+
+            def run(distance, settings):
+                for statement in settings:
+                    session.execute(statement)
+                started = time.perf_counter()
+                ids = session.execute(
+                    select(store.EmbeddingStore.id)
+                    .filter(
+                        store.EmbeddingStore.collection_id == collection.uuid
+                    )
+                    .order_by(asc(distance))
+                    .limit(k)
+                ).scalars()
+                ids = set(ids)
+                elapsed = time.perf_counter() - started
+                session.rollback()
+                return ids, elapsed
+
+            exact, exact_latency = [], []
+            for embedding in queries:
+                ids, elapsed = run(
+                    store.distance_strategy(embedding),
+                    [text("SET LOCAL enable_indexscan = off")],
+                )
+                exact.append(ids)
+                exact_latency.append(elapsed)
+
+            results = []
+            for value in values:
+                recalls, latency = [], []
+                for embedding, expected in zip(queries, exact):
+                    ids, elapsed = run(
+                        distance_expression(store, collection, embedding),
+                        [
+                            text("SET LOCAL enable_seqscan = off"),
+                            *search_settings(**{parameter: value}),
+                        ],
+                    )
+                    recalls.append(
+                        len(ids & expected) / len(expected) if expected else 1
+                    )
+                    latency.append(elapsed)
+                results.append(
+                    {
+                        parameter: value,
+                        "recall": round(float(np.mean(recalls)), 4),
+                        **_latency_percentiles(latency),
+                    }
+                )
+
+        return {
+            "index": config,
+            "k": k,
+            "queries": len(queries),
+            "exact": _latency_percentiles(exact_latency),
+            "ann": results,
+        }
+
+
+def _latency_percentiles(timings: List[float]) -> Dict[str, float]:
+    timings = np.asarray(timings) * 1000 if timings else np.zeros(1)
+    return {
+        "p50_ms": round(float(np.percentile(timings, 50)), 3),
+        "p95_ms": round(float(np.percentile(timings, 95)), 3),
+    }
+
+
+ann_index_service = ANNIndexService(vector_store_registry)
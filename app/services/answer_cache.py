@@ -0,0 +1,379 @@
+# app/services/answer_cache.py
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from dotenv import load_dotenv
+from langchain_core.documents import Document
+
+from app.utils.logger import logger
+
+load_dotenv(override=True)
+
+ANSWER_CACHE_BACKENDS = ("memory", "sqlite", "none")
+ANSWER_CACHE_PATH = "./app/cache/answers.sqlite3"
+
+
+def tfidf_namespace(index_name: str) -> str:
+    """Namespace of the answers retrieved from a TF-IDF index."""
+    return f"tfidf:{index_name}"
+
+
+def vector_namespace(collection_name: str) -> str:
+    """Namespace of the answers retrieved from a vector collection."""
+    return f"vector:{collection_name}"
+
+
+class MemoryAnswerStore:
+    """Process-local LRU store of answers with per-entry expiry."""
+
+    def __init__(self, max_entries: int):
+        """Initialize an empty store.
+
+        Args:
+            max_entries (int): Entries kept before the least recently used are evicted.
+        """
+        self.max_entries = max_entries
+        self._entries: (
+            "OrderedDict[str, Tuple[Dict[str, Any], float, Tuple[str, ...]]]"
+        ) = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(
+        self,
+        key: str,
+        value: Dict[str, Any],
+        namespaces: Sequence[str],
+        expires_at: float,
+    ) -> None:
+        with self._lock:
+            self._entries[key] = (value, expires_at, tuple(namespaces))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, namespace: str) -> int:
+        with self._lock:
+            keys = [
+                key
+                for key, (_, _, namespaces) in self._entries.items()
+                if namespace in namespaces
+            ]
+            for key in keys:
+                del self._entries[key]
+            return len(keys)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+class SQLiteAnswerStore:
+    """On-disk LRU store of answers, shared by the server processes.
+
+    Uses WAL mode like the embedding cache. The last access time of every
+    entry is tracked, so the least recently used entries are evicted beyond
+    `max_entries`.
+    """
+
+    def __init__(self, path: str, max_entries: int):
+        """Initialize the store. The database is opened on first use.
+
+        Args:
+            path (str): Path of the SQLite database.
+            max_entries (int): Entries kept before the least recently used are evicted.
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self._connection: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(
+                self.path, timeout=30, check_same_thread=False
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS answers (key TEXT PRIMARY KEY, "
+                "value TEXT NOT NULL, namespaces TEXT NOT NULL, "
+                "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS ix_answers_accessed_at "
+                "ON answers (accessed_at)"
+            )
+            self._connection = connection
+        return self._connection
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            row = connection.execute(
+                "SELECT value, expires_at FROM answers WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            with connection:
+                if row[1] <= now:
+                    connection.execute(
+                        "DELETE FROM answers WHERE key = ?", (key,)
+                    )
+                    return None
+                connection.execute(
+                    "UPDATE answers SET accessed_at = ? WHERE key = ?",
+                    (now, key),
+                )
+            return json.loads(row[0])
+
+    def put(
+        self,
+        key: str,
+        value: Dict[str, Any],
+        namespaces: Sequence[str],
+        expires_at: float,
+    ) -> None:
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?, ?)",
+                    (
+                        key,
+                        json.dumps(value, ensure_ascii=False),
+                        "".join(f"|{namespace}|" for namespace in namespaces),
+                        expires_at,
+                        now,
+                    ),
+                )
+                connection.execute(
+                    "DELETE FROM answers WHERE expires_at <= ?", (now,)
+                )
+                connection.execute(
+                    "DELETE FROM answers WHERE key IN (SELECT key FROM answers "
+                    "ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+
+    def invalidate(self, namespace: str) -> int:
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                return connection.execute(
+                    "DELETE FROM answers WHERE instr(namespaces, ?) > 0",
+                    (f"|{namespace}|",),
+                ).rowcount
+
+    def __len__(self) -> int:
+        with self._lock:
+            return (
+                self._connect()
+                .execute("SELECT COUNT(*) FROM answers")
+                .fetchone()[0]
+            )
+
+
+class AnswerCache:
+    """Exact-match cache of generated answers.
+
+    An answer is keyed by the model, the prompt version, the query and a
+    digest of the retrieved documents, so it is only reused when the same
+    question is answered from the same context. Entries expire after
+    `ttl` seconds and are tagged with the indexes and collections they were
+    retrieved from, which are invalidated whenever those change.
+
+    Invalidation only reaches the process that calls it (and, for the
+    SQLite backend, every process sharing the database). With the memory
+    backend and several uvicorn workers, the other workers keep serving
+    their entries until they expire; use the SQLite backend or a short TTL
+    there. Indexes written in the process pool are invalidated by the
+    server process once the task returns.
+    """
+
+    def __init__(self, store: Optional[Any], ttl: float):
+        """Initialize the cache.
+
+        Args:
+            store (Optional[Any]): A `MemoryAnswerStore` or `SQLiteAnswerStore`.
+                None disables the cache.
+            ttl (float): Seconds an answer stays valid.
+        """
+        self.store = store
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._listeners: List[Callable[[str], None]] = []
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        """Whether the cache stores and serves answers."""
+        return self.store is not None
+
+    @staticmethod
+    def key(
+        model: str,
+        prompt_version: Any,
+        query: str,
+        documents: List[Document],
+    ) -> str:
+        """Build the cache key of an answer.
+
+        Args:
+            model (str): The chat model.
+            prompt_version (Any): The version of the prompt template.
+            query (str): The user's query.
+            documents (List[Document]): The retrieved documents, in prompt order.
+
+        Returns:
+            str: The cache key.
+        """
+        digest = hashlib.sha256()
+        for part in (str(model), str(prompt_version), query):
+            digest.update(part.encode("utf-8") + b"\0")
+        for document in documents:
+            digest.update(
+                json.dumps(
+                    [document.id, document.page_content, document.metadata],
+                    ensure_ascii=False,
+                    sort_keys=True,
+                    default=str,
+                ).encode("utf-8")
+                + b"\0"
+            )
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached answer of a key, if any and not expired."""
+        if not self.enabled:
+            return None
+        try:
+            value = self.store.get(key)
+        except sqlite3.Error as e:
+            logger.error(f"Error reading the answer cache: {e}")
+            value = None
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def put(
+        self, key: str, value: Dict[str, Any], namespaces: Sequence[str]
+    ) -> None:
+        """Store an answer.
+
+        Args:
+            key (str): Key built with `key`.
+            value (Dict[str, Any]): The answer.
+            namespaces (Sequence[str]): Indexes and collections it depends on.
+        """
+        if not self.enabled:
+            return
+        try:
+            self.store.put(key, value, namespaces, time.time() + self.ttl)
+        except sqlite3.Error as e:
+            logger.error(f"Error writing the answer cache: {e}")
+
+    def on_invalidate(self, listener: Callable[[str], None]) -> None:
+        """Register a callback run with every invalidated namespace.
+
+        Args:
+            listener (Callable[[str], None]): Receives the namespace.
+        """
+        self._listeners.append(listener)
+
+    def invalidate(self, namespace: str) -> None:
+        """Drop the answers retrieved from an index or collection.
+
+        Args:
+            namespace (str): `tfidf:<index name>` or `vector:<collection name>`.
+        """
+        for listener in self._listeners:
+            listener(namespace)
+        if not self.enabled:
+            return
+        try:
+            removed = self.store.invalidate(namespace)
+            if removed:
+                logger.info(
+                    f"Invalidated {removed} cached answers of {namespace}"
+                )
+        except sqlite3.Error as e:
+            logger.error(f"Error invalidating the answer cache: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Return cache counters.
+
+        Returns:
+            Dict[str, Any]: Hits, misses, the hit ratio and the number of stored answers.
+        """
+        entries = 0
+        if self.enabled:
+            try:
+                entries = len(self.store)
+            except sqlite3.Error as e:
+                logger.error(f"Error reading the answer cache: {e}")
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "entries": entries,
+            }
+
+
+def create_answer_cache() -> AnswerCache:
+    """Create the answer cache configured by the environment.
+
+    Returns:
+        AnswerCache: The cache, disabled when `ANSWER_CACHE_BACKEND` is `none`.
+
+    Raises:
+        ValueError: If `ANSWER_CACHE_BACKEND` is not supported.
+    """
+    backend = os.getenv("ANSWER_CACHE_BACKEND", "memory")
+    max_entries = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", 10_000))
+    if backend == "memory":
+        store = MemoryAnswerStore(max_entries)
+    elif backend == "sqlite":
+        store = SQLiteAnswerStore(
+            os.getenv("ANSWER_CACHE_PATH", ANSWER_CACHE_PATH), max_entries
+        )
+    elif backend == "none":
+        store = None
+    else:
+        raise ValueError(
+            "ANSWER_CACHE_BACKEND must be one of "
+            f"{', '.join(ANSWER_CACHE_BACKENDS)}, got {backend}"
+        )
+    return AnswerCache(
+        store, ttl=float(os.getenv("ANSWER_CACHE_TTL_SECONDS", 86_400))
+    )
+
+
+answer_cache = create_answer_cache()
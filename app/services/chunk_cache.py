@@ -0,0 +1,169 @@
+# app/services/chunk_cache.py
+import gzip
+import hashlib
+import os
+import tempfile
+import threading
+from typing import Any, BinaryIO, Dict, List, Optional
+
+from dotenv import load_dotenv
+from langchain_core.documents import Document
+
+from app.utils.document_store import decode_document, encode_document
+from app.utils.logger import logger
+
+load_dotenv(override=True)
+
+CHUNK_CACHE_PATH = "./app/cache/chunks"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+FORMAT_VERSION = 2
+HASH_BLOCK_SIZE = 1024 * 1024
+ENTRY_SUFFIX = ".jsonl.gz"
+
+
+def hash_stream(stream: BinaryIO) -> str:
+    """Compute the SHA-256 of a binary stream, reading it in blocks.
+
+    Args:
+        stream (BinaryIO): A seekable binary stream, read from the start.
+
+    Returns:
+        str: The hex digest.
+    """
+    digest = hashlib.sha256()
+    stream.seek(0)
+    for block in iter(lambda: stream.read(HASH_BLOCK_SIZE), b""):
+        digest.update(block)
+    stream.seek(0)
+    return digest.hexdigest()
+
+
+class ChunkCache:
+    """Content-addressed on-disk cache of parsed and split PDFs.
+
+    Entries are keyed by the SHA-256 of the file and the splitter settings, so
+    identical uploads skip extraction and splitting regardless of their name.
+    Each entry is a gzip-compressed JSON lines file. The cache is bounded by
+    total size on disk; the least recently used entries are evicted first.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int,
+        chunk_size: int,
+        chunk_overlap: int,
+    ):
+        """Initialize the cache.
+
+        Args:
+            path (str): The folder where entries are stored.
+            max_bytes (int): Size budget on disk. 0 disables the cache.
+            chunk_size (int): The splitter chunk size the entries are built with.
+            chunk_overlap (int): The splitter chunk overlap the entries are built with.
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.settings = f"v{FORMAT_VERSION}-{chunk_size}-{chunk_overlap}"
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        """Whether the cache stores and serves entries."""
+        return self.max_bytes > 0
+
+    def _entry_path(self, file_hash: str) -> str:
+        return os.path.join(
+            self.path, f"{file_hash}-{self.settings}{ENTRY_SUFFIX}"
+        )
+
+    def get(self, file_hash: str) -> Optional[List[Document]]:
+        """Return the cached chunks of a file.
+
+        Args:
+            file_hash (str): The SHA-256 of the file.
+
+        Returns:
+            Optional[List[Document]]: The chunks, or None if not cached.
+        """
+        if not self.enabled:
+            return None
+        path = self._entry_path(file_hash)
+        try:
+            with open(path, "rb") as f:
+                raw = gzip.decompress(f.read())
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        except Exception as e:
+            logger.error(f"Error reading chunk cache entry {path}: {e}")
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return [decode_document(line) for line in raw.splitlines()]
+
+    def put(self, file_hash: str, documents: List[Document]) -> None:
+        """Store the chunks of a file, evicting old entries if needed.
+
+        Args:
+            file_hash (str): The SHA-256 of the file.
+            documents (List[Document]): The chunks of the file.
+        """
+        if not self.enabled:
+            return
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            data = gzip.compress(
+                b"".join(encode_document(doc) for doc in documents)
+            )
+            fd, tmp_path = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, self._entry_path(file_hash))
+            self._evict()
+        except Exception as e:
+            logger.error(f"Error writing chunk cache entry {file_hash}: {e}")
+
+    def _evict(self) -> None:
+        """Remove the least recently used entries until within budget."""
+        entries = []
+        with os.scandir(self.path) as scan:
+            for entry in scan:
+                if entry.name.endswith(ENTRY_SUFFIX):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime_ns, stat.st_size, entry))
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries, key=lambda e: e[0]):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            with self._lock:
+                self.evictions += 1
+            logger.info(f"Evicted {entry.name} from the chunk cache")
+
+    def stats(self) -> Dict[str, Any]:
+        """Return cache counters.
+
+        Returns:
+            Dict[str, Any]: Hits, misses, evictions and the hit ratio.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "max_bytes": self.max_bytes,
+            }
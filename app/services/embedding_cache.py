@@ -0,0 +1,264 @@
+# app/services/embedding_cache.py
+import hashlib
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+from langchain_core.embeddings import Embeddings
+from starlette.concurrency import run_in_threadpool
+
+from app.utils.logger import logger
+
+load_dotenv(override=True)
+
+EMBEDDING_CACHE_PATH = "./app/cache/embeddings.sqlite3"
+LOOKUP_BATCH_SIZE = 500
+
+
+class EmbeddingCache:
+    """Persistent SQLite cache of embedding vectors.
+
+    Vectors are stored as float32 blobs keyed by model, dimensions and the
+    SHA-256 of the text, so a chunk embedded once is never sent upstream again
+    for any collection. The database uses WAL mode, so several server
+    processes can share it.
+    """
+
+    def __init__(self, path: str):
+        """Initialize the cache. The database is opened on first use.
+
+        Args:
+            path (str): Path of the SQLite database. An empty path disables the cache.
+        """
+        self.path = path
+        self._connection: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        """Whether the cache stores and serves vectors."""
+        return bool(self.path)
+
+    @staticmethod
+    def key(model: str, dimensions: Optional[int], text: str) -> str:
+        """Build the cache key of a text.
+
+        Args:
+            model (str): The embedding model.
+            dimensions (Optional[int]): The requested dimensions, if any.
+            text (str): The embedded text.
+
+        Returns:
+            str: The cache key.
+        """
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{model}:{dimensions or 'default'}:{digest}"
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(
+                self.path, timeout=30, check_same_thread=False
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings "
+                "(key TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+            )
+            self._connection = connection
+        return self._connection
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        """Return the cached vectors of the given keys.
+
+        Args:
+            keys (List[str]): Keys built with `key`.
+
+        Returns:
+            Dict[str, List[float]]: The vectors found, by key.
+        """
+        found = {}
+        if not self.enabled or not keys:
+            return found
+        unique = list(dict.fromkeys(keys))
+        try:
+            with self._lock:
+                connection = self._connect()
+                for start in range(0, len(unique), LOOKUP_BATCH_SIZE):
+                    batch = unique[start : start + LOOKUP_BATCH_SIZE]
+                    rows = connection.execute(
+                        "SELECT key, vector FROM embeddings WHERE key IN "
+                        f"({','.join('?' * len(batch))})",
+                        batch,
+                    )
+                    for key, blob in rows:
+                        found[key] = np.frombuffer(
+                            blob, dtype=np.float32
+                        ).tolist()
+        except sqlite3.Error as e:
+            logger.error(f"Error reading the embedding cache: {e}")
+        with self._lock:
+            self.hits += sum(1 for key in keys if key in found)
+            self.misses += sum(1 for key in keys if key not in found)
+        return found
+
+    def put_many(self, vectors: Dict[str, List[float]]) -> None:
+        """Store vectors.
+
+        Args:
+            vectors (Dict[str, List[float]]): The vectors to store, by key.
+        """
+        if not self.enabled or not vectors:
+            return
+        rows = [
+            (key, np.asarray(vector, dtype=np.float32).tobytes())
+            for key, vector in vectors.items()
+        ]
+        try:
+            with self._lock:
+                connection = self._connect()
+                with connection:
+                    connection.executemany(
+                        "INSERT OR IGNORE INTO embeddings (key, vector) "
+                        "VALUES (?, ?)",
+                        rows,
+                    )
+        except sqlite3.Error as e:
+            logger.error(f"Error writing the embedding cache: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Return cache counters.
+
+        Returns:
+            Dict[str, Any]: Hits, misses, the hit ratio and the number of stored vectors.
+        """
+        entries = 0
+        if self.enabled:
+            try:
+                with self._lock:
+                    entries = (
+                        self._connect()
+                        .execute("SELECT COUNT(*) FROM embeddings")
+                        .fetchone()[0]
+                    )
+            except sqlite3.Error as e:
+                logger.error(f"Error reading the embedding cache: {e}")
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "entries": entries,
+            }
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that only sends cache misses upstream."""
+
+    def __init__(self, embeddings: Embeddings, cache: EmbeddingCache):
+        """Wrap an embeddings client.
+
+        Args:
+            embeddings (Embeddings): The upstream client. Its `model` and
+                `dimensions` attributes are part of the cache key.
+            cache (EmbeddingCache): The cache to read and fill.
+        """
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model = getattr(embeddings, "model", type(embeddings).__name__)
+        self.dimensions = getattr(embeddings, "dimensions", None)
+
+    def cache_keys(self, texts: List[str]) -> List[str]:
+        """Return the cache key of every text."""
+        return [
+            self.cache.key(self.model, self.dimensions, text) for text in texts
+        ]
+
+    @staticmethod
+    def _missing(keys: List[str], found: Dict[str, List[float]]) -> List[int]:
+        """Positions of the first occurrence of every uncached key."""
+        missing = {}
+        for i, key in enumerate(keys):
+            if key not in found and key not in missing:
+                missing[key] = i
+        return list(missing.values())
+
+    def _merge(
+        self,
+        keys: List[str],
+        found: Dict[str, List[float]],
+        missing: List[int],
+        vectors: List[List[float]],
+    ) -> List[List[float]]:
+        computed = {keys[i]: vector for i, vector in zip(missing, vectors)}
+        self.cache.put_many(computed)
+        found.update(computed)
+        return [found[key] for key in keys]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts, only sending uncached ones upstream.
+
+        Args:
+            texts (List[str]): The texts to embed.
+
+        Returns:
+            List[List[float]]: One vector per text.
+        """
+        keys = self.cache_keys(texts)
+        found = self.cache.get_many(keys)
+        missing = self._missing(keys, found)
+        vectors = (
+            self.embeddings.embed_documents([texts[i] for i in missing])
+            if missing
+            else []
+        )
+        return self._merge(keys, found, missing, vectors)
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a query, using the cache.
+
+        Args:
+            text (str): The query.
+
+        Returns:
+            List[float]: The query vector.
+        """
+        key = self.cache.key(self.model, self.dimensions, text)
+        found = self.cache.get_many([key])
+        if key in found:
+            return found[key]
+        vector = self.embeddings.embed_query(text)
+        self.cache.put_many({key: vector})
+        return vector
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Async version of `embed_documents`."""
+        keys = self.cache_keys(texts)
+        found = await run_in_threadpool(self.cache.get_many, keys)
+        missing = self._missing(keys, found)
+        vectors = (
+            await self.embeddings.aembed_documents([texts[i] for i in missing])
+            if missing
+            else []
+        )
+        return await run_in_threadpool(
+            self._merge, keys, found, missing, vectors
+        )
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """Async version of `embed_query`."""
+        return (await self.aembed_documents([text]))[0]
+
+
+embedding_cache = EmbeddingCache(
+    path=os.getenv("EMBEDDING_CACHE_PATH", EMBEDDING_CACHE_PATH)
+)
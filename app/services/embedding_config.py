@@ -0,0 +1,116 @@
+# app/services/embedding_config.py
+from typing import Any, Dict, Optional, Sequence
+
+from fastapi import HTTPException, status
+
+from app.constants.openai_models import (
+    EMBEDDING_MODEL_DIMENSIONS,
+    MATRYOSHKA_EMBEDDING_MODELS,
+    EmbeddingOpenAIModels,
+)
+
+EMBEDDING_METADATA_KEY = "embedding"
+QUANTIZATIONS = ("none", "halfvec", "int8", "binary")
+DEFAULT_RESCORE_FACTOR = 4
+MAX_RESCORE_FACTOR = 100
+
+
+def build_embedding_config(
+    embedding_model: EmbeddingOpenAIModels,
+    dimensions: Optional[int] = None,
+    quantization: Optional[str] = None,
+    rescore_factor: Optional[int] = None,
+    supported_quantizations: Sequence[str] = QUANTIZATIONS,
+) -> Dict[str, Any]:
+    """Validate and build the embedding settings of a collection.
+
+    Args:
+        embedding_model (EmbeddingOpenAIModels): The embedding model.
+        dimensions (Optional[int], optional): Reduced output dimensions.
+            Defaults to the native dimensions of the model.
+        quantization (Optional[str], optional): Storage used to scan the
+            collection: `none`, `halfvec`, `int8` or `binary`.
+        rescore_factor (Optional[int], optional): With quantization, the
+            `k * rescore_factor` best candidates are rescored at full precision.
+        supported_quantizations (Sequence[str], optional): Quantizations the
+            vector backend implements.
+
+    Returns:
+        Dict[str, Any]: The settings to record in the collection metadata.
+
+    Raises:
+        HTTPException: If a setting is invalid for the model or the backend.
+    """
+    embedding_model = EmbeddingOpenAIModels(embedding_model)
+    native = EMBEDDING_MODEL_DIMENSIONS[embedding_model]
+    if dimensions is not None and dimensions != native:
+        if embedding_model not in MATRYOSHKA_EMBEDDING_MODELS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=(
+                    f"{embedding_model.value} does not support reduced "
+                    "dimensions"
+                ),
+            )
+        if not 1 <= dimensions <= native:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"dimensions must be between 1 and {native}",
+            )
+    quantization = quantization or "none"
+    if quantization not in supported_quantizations:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=(
+                "quantization must be one of "
+                f"{', '.join(supported_quantizations)}"
+            ),
+        )
+    if rescore_factor is None:
+        rescore_factor = DEFAULT_RESCORE_FACTOR
+    if not 1 <= rescore_factor <= MAX_RESCORE_FACTOR:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"rescore_factor must be between 1 and {MAX_RESCORE_FACTOR}",
+        )
+    return {
+        "model": embedding_model.value,
+        "dimensions": (
+            dimensions
+            if dimensions is not None and dimensions != native
+            else None
+        ),
+        "quantization": quantization,
+        "rescore_factor": rescore_factor,
+    }
+
+
+def embedding_config(metadata: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Return the embedding settings recorded in collection metadata.
+
+    Collections created before the settings existed use full dimensions and
+    no quantization.
+
+    Args:
+        metadata (Optional[Dict[str, Any]]): The collection metadata.
+
+    Returns:
+        Dict[str, Any]: The embedding settings.
+    """
+    config = (metadata or {}).get(EMBEDDING_METADATA_KEY) or {}
+    return {
+        "dimensions": None,
+        "quantization": "none",
+        "rescore_factor": DEFAULT_RESCORE_FACTOR,
+        **config,
+    }
+
+
+def same_storage(a: Dict[str, Any], b: Dict[str, Any]) -> bool:
+    """Whether two settings store vectors the same way.
+
+    Only `rescore_factor` can change once a collection has embeddings.
+    """
+    return all(
+        a.get(key) == b.get(key) for key in ("dimensions", "quantization")
+    )
@@ -0,0 +1,297 @@
+# app/services/embedding_scheduler.py
+import asyncio
+import os
+import random
+import time
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import openai
+from dotenv import load_dotenv
+from langchain_core.embeddings import Embeddings
+from starlette.concurrency import run_in_threadpool
+
+from app.services.embedding_cache import CachedEmbeddings
+from app.utils.logger import logger
+
+load_dotenv(override=True)
+
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+
+
+@lru_cache(maxsize=8)
+def _token_counter(model: str) -> Callable[[str], int]:
+    """Return a function counting the tokens of a text for `model`.
+
+    Falls back to an estimate of 4 characters per token when the tiktoken
+    encoding is not available, e.g. without network access on first use.
+    """
+    try:
+        import tiktoken
+
+        try:
+            encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            encoding = tiktoken.get_encoding("cl100k_base")
+        return lambda text: len(encoding.encode(text, disallowed_special=()))
+    except Exception as e:
+        logger.warning(f"Estimating embedding tokens, tiktoken failed: {e}")
+        return lambda text: len(text) // 4 + 1
+
+
+class TokenBucket:
+    """Async token bucket refilled continuously at `rate_per_minute`.
+
+    Waiters are served in order, so one large request cannot be starved by a
+    stream of small ones. A rate of 0 disables the limit.
+    """
+
+    def __init__(self, rate_per_minute: float):
+        """Initialize a full bucket.
+
+        Args:
+            rate_per_minute (float): Tokens added per minute, also the capacity.
+        """
+        self.rate = rate_per_minute / 60.0
+        self.capacity = rate_per_minute
+        self.tokens = rate_per_minute
+        self.updated = time.monotonic()
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def acquire(self, amount: float) -> None:
+        """Wait until `amount` tokens are available and take them.
+
+        Args:
+            amount (float): Tokens to take. Clamped to the bucket capacity.
+        """
+        if self.rate <= 0:
+            return
+        amount = min(amount, self.capacity)
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity,
+                    self.tokens + (now - self.updated) * self.rate,
+                )
+                self.updated = now
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+
+class EmbeddingRateLimiter:
+    """Process-wide tokens-per-minute and requests-per-minute limits."""
+
+    def __init__(self, tokens_per_minute: float, requests_per_minute: float):
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.requests = TokenBucket(requests_per_minute)
+
+    async def acquire(self, tokens: int) -> None:
+        """Wait for one request slot and `tokens` tokens."""
+        await self.requests.acquire(1)
+        await self.tokens.acquire(tokens)
+
+
+class EmbeddingScheduler:
+    """Embeds large batches of texts concurrently within the API rate limits.
+
+    Texts are grouped into batches bounded both by count and by tokens, and up
+    to `max_concurrency` batches are in flight at once. Every request waits on
+    the shared rate limiter, and rate limit, timeout, connection and server
+    errors are retried with exponential backoff and full jitter. Texts found
+    in the embedding cache are not sent upstream.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        rate_limiter: EmbeddingRateLimiter,
+        max_batch_size: int = 256,
+        max_batch_tokens: int = 50_000,
+        max_concurrency: int = 4,
+        max_retries: int = 6,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+    ):
+        """Initialize the scheduler.
+
+        Args:
+            embeddings (Embeddings): The embeddings client, optionally cached.
+            rate_limiter (EmbeddingRateLimiter): The shared rate limiter.
+            max_batch_size (int, optional): Maximum texts per request.
+            max_batch_tokens (int, optional): Maximum tokens per request.
+            max_concurrency (int, optional): Maximum requests in flight.
+            max_retries (int, optional): Retries of a failed request.
+            base_delay (float, optional): Backoff of the first retry, in seconds.
+            max_delay (float, optional): Maximum backoff, in seconds.
+        """
+        if isinstance(embeddings, CachedEmbeddings):
+            self.cache: Optional[CachedEmbeddings] = embeddings
+            self.embeddings = embeddings.embeddings
+        else:
+            self.cache = None
+            self.embeddings = embeddings
+        self.rate_limiter = rate_limiter
+        self.max_batch_size = max_batch_size
+        self.max_batch_tokens = max_batch_tokens
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.count_tokens = _token_counter(
+            getattr(self.embeddings, "model", "text-embedding-3-large")
+        )
+
+    def plan_batches(
+        self, texts: List[str], positions: List[int]
+    ) -> List[Tuple[List[int], int]]:
+        """Group texts into batches within the count and token limits.
+
+        Args:
+            texts (List[str]): All texts of the job.
+            positions (List[int]): Positions of the texts to batch.
+
+        Returns:
+            List[Tuple[List[int], int]]: The positions of every batch and its
+                number of tokens.
+        """
+        batches, current, current_tokens = [], [], 0
+        for i in positions:
+            tokens = self.count_tokens(texts[i])
+            if current and (
+                len(current) >= self.max_batch_size
+                or current_tokens + tokens > self.max_batch_tokens
+            ):
+                batches.append((current, current_tokens))
+                current, current_tokens = [], 0
+            current.append(i)
+            current_tokens += tokens
+        if current:
+            batches.append((current, current_tokens))
+        return batches
+
+    async def _embed_batch(
+        self, texts: List[str], tokens: int, stats: Dict[str, Any]
+    ) -> List[List[float]]:
+        for attempt in range(self.max_retries + 1):
+            await self.rate_limiter.acquire(tokens)
+            try:
+                return await self.embeddings.aembed_documents(texts)
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = random.uniform(
+                    0, min(self.max_delay, self.base_delay * 2**attempt)
+                )
+                stats["retries"] += 1
+                logger.warning(
+                    f"Embedding request failed ({type(e).__name__}), "
+                    f"retrying in {delay:.1f}s"
+                )
+                await asyncio.sleep(delay)
+
+    async def run(
+        self,
+        texts: List[str],
+        on_batch: Callable[[List[int], List[List[float]]], Awaitable[None]],
+    ) -> Dict[str, Any]:
+        """Embed every text, handing each finished batch to `on_batch`.
+
+        Args:
+            texts (List[str]): The texts to embed.
+            on_batch (Callable[[List[int], List[List[float]]], Awaitable[None]]):
+                Receives the positions of a batch in `texts` and its vectors.
+
+        Returns:
+            Dict[str, Any]: Throughput of the job.
+        """
+        started = time.perf_counter()
+        stats = {"chunks": len(texts), "cached": 0, "batches": 0}
+        stats.update({"tokens": 0, "retries": 0})
+        positions = list(range(len(texts)))
+
+        keys = self.cache.cache_keys(texts) if self.cache is not None else []
+        if keys:
+            found = await run_in_threadpool(self.cache.cache.get_many, keys)
+            cached = [i for i in positions if keys[i] in found]
+            if cached:
+                stats["cached"] = len(cached)
+                await on_batch(cached, [found[keys[i]] for i in cached])
+            positions = [i for i in positions if keys[i] not in found]
+
+        batches = self.plan_batches(texts, positions)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def process(batch: List[int], tokens: int) -> None:
+            async with semaphore:
+                vectors = await self._embed_batch(
+                    [texts[i] for i in batch], tokens, stats
+                )
+            if keys:
+                await run_in_threadpool(
+                    self.cache.cache.put_many,
+                    {keys[i]: v for i, v in zip(batch, vectors)},
+                )
+            await on_batch(batch, vectors)
+            stats["batches"] += 1
+            stats["tokens"] += tokens
+
+        tasks = [asyncio.ensure_future(process(*b)) for b in batches]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+        seconds = time.perf_counter() - started
+        stats["seconds"] = round(seconds, 3)
+        stats["chunks_per_second"] = (
+            round(len(texts) / seconds, 2) if seconds else 0.0
+        )
+        logger.info(
+            f"Embedded {len(texts)} chunks ({stats['cached']} cached) in "
+            f"{stats['batches']} batches, {seconds:.2f}s "
+            f"({stats['chunks_per_second']} chunks/s, "
+            f"{stats['retries']} retries)"
+        )
+        return stats
+
+
+embedding_rate_limiter = EmbeddingRateLimiter(
+    tokens_per_minute=float(
+        os.getenv("EMBEDDING_TOKENS_PER_MINUTE", 1_000_000)
+    ),
+    requests_per_minute=float(
+        os.getenv("EMBEDDING_REQUESTS_PER_MINUTE", 3_000)
+    ),
+)
+
+
+def create_embedding_scheduler(embeddings: Embeddings) -> EmbeddingScheduler:
+    """Create a scheduler for `embeddings` with the configured limits.
+
+    Args:
+        embeddings (Embeddings): The embeddings client, optionally cached.
+
+    Returns:
+        EmbeddingScheduler: A scheduler sharing the process-wide rate limiter.
+    """
+    return EmbeddingScheduler(
+        embeddings,
+        embedding_rate_limiter,
+        max_batch_size=int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", 256)),
+        max_batch_tokens=int(os.getenv("EMBEDDING_BATCH_MAX_TOKENS", 50_000)),
+        max_concurrency=int(os.getenv("EMBEDDING_MAX_CONCURRENCY", 4)),
+        max_retries=int(os.getenv("EMBEDDING_MAX_RETRIES", 6)),
+    )
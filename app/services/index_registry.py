@@ -0,0 +1,211 @@
+# app/services/index_registry.py
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from app.utils.logger import logger
+
+load_dotenv(override=True)
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+DEFAULT_MAX_ENTRIES = 32
+
+
+def _path_signature(path: str) -> Tuple[Tuple[str, int, int], ...]:
+    """Build a cheap generation signature for an index path.
+
+    The signature is made of the name, modification time (ns) and size of
+    every file that makes up the index, so any rewrite of the index changes it.
+
+    Args:
+        path (str): Path to the index file or folder.
+
+    Returns:
+        Tuple[Tuple[str, int, int], ...]: The signature of the index on disk.
+
+    Raises:
+        FileNotFoundError: If the index does not exist.
+    """
+    if os.path.isdir(path):
+        signature = []
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    stat = entry.stat()
+                    signature.append(
+                        (entry.name, stat.st_mtime_ns, stat.st_size)
+                    )
+        if not signature:
+            raise FileNotFoundError(path)
+        return tuple(sorted(signature))
+    stat = os.stat(path)
+    return ((os.path.basename(path), stat.st_mtime_ns, stat.st_size),)
+
+
+def _estimate_size(index: Any) -> int:
+    """Estimate the resident memory used by a loaded index.
+
+    Args:
+        index (Any): The loaded index.
+
+    Returns:
+        int: Approximate size in bytes.
+    """
+    return getattr(index, "nbytes", 0)
+
+
+class _Entry:
+    __slots__ = ("value", "signature", "size")
+
+    def __init__(self, value: Any, signature: tuple, size: int):
+        self.value = value
+        self.signature = signature
+        self.size = size
+
+
+class IndexRegistry:
+    """Process-wide LRU cache of loaded indexes.
+
+    Entries are keyed by index name and validated against the files on disk on
+    every lookup, so an index rebuilt by another request or worker is reloaded
+    transparently. The cache is bounded both by number of entries and by an
+    approximate memory budget.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        sizer: Callable[[Any], int] = _estimate_size,
+    ):
+        """Initialize the registry.
+
+        Args:
+            max_bytes (int, optional): Memory budget for all cached indexes.
+            max_entries (int, optional): Maximum number of cached indexes.
+            sizer (Callable[[Any], int], optional): Estimates the size of a loaded index.
+        """
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.sizer = sizer
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.reloads = 0
+
+    def get(self, name: str, path: str, loader: Callable[[str], Any]) -> Any:
+        """Return a loaded index, loading it from disk if needed.
+
+        Args:
+            name (str): The index name used as cache key.
+            path (str): The path of the index on disk.
+            loader (Callable[[str], Any]): Loads the index from `path`.
+
+        Returns:
+            Any: The loaded index.
+
+        Raises:
+            FileNotFoundError: If the index does not exist on disk.
+        """
+        try:
+            signature = _path_signature(path)
+        except FileNotFoundError:
+            self.invalidate(name)
+            raise
+
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None and entry.signature == signature:
+                self._entries.move_to_end(name)
+                self.hits += 1
+                return entry.value
+            self.misses += 1
+            if entry is not None:
+                self.reloads += 1
+                self._remove(name)
+
+        # Load outside the lock so a slow load doesn't block other indexes.
+        value = loader(path)
+        size = self.sizer(value)
+
+        with self._lock:
+            current = self._entries.get(name)
+            if current is not None:
+                self._remove(name)
+            self._entries[name] = _Entry(value, signature, size)
+            self._current_bytes += size
+            self._evict(keep=name)
+        return value
+
+    def invalidate(self, name: str) -> None:
+        """Drop an index from the cache.
+
+        Args:
+            name (str): The index name.
+        """
+        with self._lock:
+            if name in self._entries:
+                self._remove(name)
+
+    def clear(self) -> None:
+        """Drop every cached index."""
+        with self._lock:
+            self._entries.clear()
+            self._current_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Return cache counters and usage.
+
+        Returns:
+            Dict[str, Any]: Hits, misses, evictions, reloads and memory usage.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "reloads": self.reloads,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "current_bytes": self._current_bytes,
+                "max_bytes": self.max_bytes,
+                "indexes": list(self._entries.keys()),
+            }
+
+    def _remove(self, name: str) -> None:
+        entry = self._entries.pop(name)
+        self._current_bytes -= entry.size
+
+    def _evict(self, keep: Optional[str] = None) -> None:
+        """Evict least recently used entries until within budget.
+
+        The entry named `keep` is never evicted, so an index larger than the
+        whole budget can still be served.
+        """
+        while self._entries and (
+            len(self._entries) > self.max_entries
+            or self._current_bytes > self.max_bytes
+        ):
+            name = next(iter(self._entries))
+            if name == keep:
+                if len(self._entries) == 1:
+                    break
+                self._entries.move_to_end(name)
+                continue
+            self._remove(name)
+            self.evictions += 1
+            logger.info(f"Evicted index {name} from the index registry")
+
+
+index_registry = IndexRegistry(
+    max_bytes=int(os.getenv("INDEX_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES)),
+    max_entries=int(os.getenv("INDEX_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)),
+)
@@ -1,13 +1,57 @@
 # app/services/index_service.py
+import fcntl
 import os
 import shutil
-from typing import List
+from contextlib import contextmanager
+from typing import Callable, List
 
+from dotenv import load_dotenv
 from fastapi import HTTPException
 from langchain_community.retrievers import TFIDFRetriever
 from langchain_core.documents import Document
 from starlette import status
 
+from app.services.answer_cache import answer_cache, tfidf_namespace
+from app.services.index_registry import index_registry
+from app.services.tfidf_index import TFIDFIndex
+from app.utils.logger import logger
+
+load_dotenv(override=True)
+
+INDEXES_PATH = "./app/indexes"
+COMPACTION_MAX_SEGMENTS = int(os.getenv("TFIDF_COMPACTION_MAX_SEGMENTS", 8))
+COMPACTION_MAX_DELETED_RATIO = float(
+    os.getenv("TFIDF_COMPACTION_MAX_DELETED_RATIO", 0.25)
+)
+
+
+def _load_legacy_index(path: str) -> TFIDFIndex:
+    """Load an index pickled by `TFIDFRetriever.save_local`.
+
+    Kept for indexes created before the native format; saving the index again
+    migrates it.
+    """
+    logger.warning(
+        f"Loading legacy pickled index {path}, re-create it to migrate it "
+        "to the native format"
+    )
+    retriever = TFIDFRetriever.load_local(
+        path, allow_dangerous_deserialization=True
+    )
+    return TFIDFIndex.from_retriever(retriever)
+
+
+@contextmanager
+def _index_lock(name: str):
+    """Serialize writers of an index across requests and worker processes."""
+    os.makedirs(INDEXES_PATH, exist_ok=True)
+    with open(f"{INDEXES_PATH}/.{name}.lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
 
 class IndexService:
     """Service for managing TF-IDF based document retrieval.
@@ -21,9 +65,9 @@ class IndexService:
         Args:
             documents (List[Document], optional): Documents used to initialize the index. Defaults to None.
         """
-        self.retriever = None
+        self.index = None
         if documents:
-            self.retriever = TFIDFRetriever.from_documents(documents)
+            self.index = TFIDFIndex.from_documents(documents)
 
     def index_documents(self, documents: List[Document]) -> None:
         """Create a TF-IDF index from the provided documents.
@@ -31,10 +75,12 @@ class IndexService:
         Args:
             documents (List[Document]): Documents to index.
         """
-        self.retriever = TFIDFRetriever.from_documents(documents)
+        self.index = TFIDFIndex.from_documents(documents)
 
     def save_index(self, name: str) -> None:
-        """Save the current TF-IDF index to a local file.
+        """Save the current TF-IDF index to a local folder.
+
+        The index is written in the native memory-mapped format.
 
         Args:
             name (str): The base name of the index file.
@@ -42,13 +88,14 @@ class IndexService:
         Raises:
             HTTPException: If no index has been created or if an error occurs while saving.
         """
-        if not self.retriever:
+        if self.index is None:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="No index has been created yet.",
             )
         try:
-            self.retriever.save_local(f"./app/indexes/{name}.pkl")
+            with _index_lock(name):
+                self._write_index(name)
         except Exception as e:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -58,6 +105,10 @@ class IndexService:
     def load_index(self, name: str) -> None:
         """Load an existing TF-IDF index from a local file.
 
+        Loaded indexes are shared through the process-wide index registry, so
+        the index is only opened again when it changes on disk. Indexes pickled
+        by earlier versions are still loaded.
+
         Args:
             name (str): The base name of the index file to load.
 
@@ -65,16 +116,75 @@ class IndexService:
             HTTPException: If the index file is not found.
         """
         try:
-            self.retriever = TFIDFRetriever.load_local(
-                f"./app/indexes/{name}.pkl",
-                allow_dangerous_deserialization=True,
-            )
+            index_path = self._index_path(name)
+            if TFIDFIndex.exists(index_path):
+                self.index = index_registry.get(
+                    name, index_path, TFIDFIndex.load
+                )
+            else:
+                self.index = index_registry.get(
+                    name, self._legacy_index_path(name), _load_legacy_index
+                )
         except FileNotFoundError:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Index {name} not found",
             )
 
+    def append_documents(self, name: str, documents: List[Document]) -> None:
+        """Append documents to an existing index without refitting it.
+
+        The documents are added as a new segment; the index is compacted when
+        it has accumulated too many segments.
+
+        Args:
+            name (str): The name of the index.
+            documents (List[Document]): Documents to append.
+
+        Raises:
+            HTTPException: If the index is not found or the update fails.
+        """
+        self._update_index(name, lambda index: index.add_documents(documents))
+
+    def remove_documents(self, name: str, file_names: List[str]) -> int:
+        """Remove the chunks of the given files from an existing index.
+
+        Chunks are marked as deleted; the index is compacted when the share of
+        deleted chunks grows too large.
+
+        Args:
+            name (str): The name of the index.
+            file_names (List[str]): Names of the files to remove.
+
+        Returns:
+            int: The number of removed chunks.
+
+        Raises:
+            HTTPException: If the index is not found or the update fails.
+        """
+        removed = 0
+
+        def remove(index: TFIDFIndex) -> TFIDFIndex:
+            nonlocal removed
+            index, removed = index.remove_files(file_names)
+            return index
+
+        self._update_index(name, remove)
+        return removed
+
+    def compact_index(self, name: str) -> None:
+        """Merge all segments of an index and drop deleted chunks.
+
+        Args:
+            name (str): The name of the index.
+
+        Raises:
+            HTTPException: If the index is not found or compaction fails.
+        """
+        self._update_index(
+            name, lambda index: index.compacted(), compact=False
+        )
+
     def search(self, query: str, k: int = 10) -> List[Document]:
         """Search for relevant documents using the TF-IDF index.
 
@@ -88,14 +198,45 @@ class IndexService:
         Raises:
             HTTPException: If no index exists or if an error occurs during the search.
         """
-        if not self.retriever:
+        if self.index is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="No index has been created yet.",
+            )
+        try:
+            return self.index.search(query, k)
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Error performing search: {str(e)}",
+            )
+
+    def batch_search(
+        self, queries: List[str], k: int = 10
+    ) -> List[List[Document]]:
+        """Search for several queries at once using the TF-IDF index.
+
+        Args:
+            queries (List[str]): The search queries.
+            k (int, optional): The number of results per query. Defaults to 10.
+
+        Returns:
+            List[List[Document]]: Documents matching each query, in the same
+                order as `queries`.
+
+        Raises:
+            HTTPException: If no index exists or if an error occurs during the search.
+        """
+        if self.index is None:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="No index has been created yet.",
             )
         try:
-            self.retriever.k = k
-            return self.retriever.invoke(query)
+            return [
+                [doc for doc, _ in results]
+                for results in self.index.batch_search_with_scores(queries, k)
+            ]
         except Exception as e:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -112,11 +253,18 @@ class IndexService:
             HTTPException: If the index file is not found or removal fails.
         """
         try:
-            index_path = f"./app/indexes/{name}.pkl"
-            if os.path.isdir(index_path):
-                shutil.rmtree(index_path)
-            else:
-                os.remove(index_path)
+            index_registry.invalidate(name)
+            answer_cache.invalidate(tfidf_namespace(name))
+            paths = [self._index_path(name), self._legacy_index_path(name)]
+            existing = [path for path in paths if os.path.exists(path)]
+            if not existing:
+                raise FileNotFoundError(paths[0])
+            with _index_lock(name):
+                for index_path in existing:
+                    if os.path.isdir(index_path):
+                        shutil.rmtree(index_path)
+                    else:
+                        os.remove(index_path)
         except FileNotFoundError:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -127,3 +275,52 @@ class IndexService:
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Error removing index: {e}",
             )
+
+    def _update_index(
+        self,
+        name: str,
+        update: Callable[[TFIDFIndex], TFIDFIndex],
+        compact: bool = True,
+    ) -> None:
+        """Apply `update` to the latest version of an index and save it.
+
+        Raises:
+            HTTPException: If the index is not found or the update fails.
+        """
+        with _index_lock(name):
+            self.load_index(name)
+            try:
+                index = update(self.index)
+                if compact and index.needs_compaction(
+                    COMPACTION_MAX_SEGMENTS, COMPACTION_MAX_DELETED_RATIO
+                ):
+                    logger.info(f"Compacting index {name}")
+                    index = index.compacted()
+                if index is self.index:
+                    return
+                self.index = index
+                self._write_index(name)
+            except HTTPException:
+                raise
+            except Exception as e:
+                raise HTTPException(
+                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail=f"Error updating index: {str(e)}",
+                )
+
+    def _write_index(self, name: str) -> None:
+        """Save the current index and drop any legacy pickled copy."""
+        self.index.save(self._index_path(name))
+        index_registry.invalidate(name)
+        answer_cache.invalidate(tfidf_namespace(name))
+        legacy_path = self._legacy_index_path(name)
+        if os.path.isdir(legacy_path):
+            shutil.rmtree(legacy_path)
+
+    @staticmethod
+    def _index_path(name: str) -> str:
+        return f"{INDEXES_PATH}/{name}"
+
+    @staticmethod
+    def _legacy_index_path(name: str) -> str:
+        return f"{INDEXES_PATH}/{name}.pkl"
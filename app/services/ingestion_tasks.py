@@ -0,0 +1,46 @@
+# app/services/ingestion_tasks.py
+"""CPU-bound ingestion jobs executed in the process pool.
+
+Every task is a module-level function taking the document chunks first, as
+expected by `PDFLoaderService.run_in_process_pool`. Tasks write their results
+to disk and only return small values, so nothing large is sent back to the
+server process.
+"""
+
+from typing import List
+
+from langchain_core.documents import Document
+
+from app.services.index_service import IndexService
+
+
+def build_tfidf_index(docs: List[Document], index_name: str) -> int:
+    """
+    Fit a new TF-IDF index over the chunks and save it.
+
+    Args:
+        docs (List[Document]): The chunks of the uploaded PDFs.
+        index_name (str): The name of the index to create.
+
+    Returns:
+        int: The number of indexed chunks.
+    """
+    index_service = IndexService(docs)
+    index_service.save_index(index_name)
+    return len(docs)
+
+
+def append_tfidf_documents(docs: List[Document], index_name: str) -> int:
+    """
+    Append the chunks to an existing TF-IDF index.
+
+    Args:
+        docs (List[Document]): The chunks of the uploaded PDFs.
+        index_name (str): The name of the index to update.
+
+    Returns:
+        int: The number of appended chunks.
+    """
+    index_service = IndexService()
+    index_service.append_documents(index_name, docs)
+    return len(docs)
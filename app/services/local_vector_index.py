@@ -0,0 +1,770 @@
+# app/services/local_vector_index.py
+import fcntl
+import json
+import mmap
+import operator
+import os
+import re
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from app.services.embedding_config import (
+    DEFAULT_RESCORE_FACTOR,
+    same_storage,
+)
+
+FORMAT_VERSION = 1
+META_FILE = "meta.json"
+VECTORS_FILE = "vectors.f32"
+DOCUMENTS_FILE = "documents.jsonl"
+OFFSETS_FILE = "documents_offsets.i64"
+IDS_FILE = "ids.jsonl"
+DELETED_FILE = "deleted.npy"
+CENTROIDS_FILE = "ivf_centroids.npy"
+ASSIGNMENTS_FILE = "ivf_assignments.i32"
+# Compact copies of the vectors scanned before rescoring, by quantization.
+QUANTIZED_FILES = {
+    "halfvec": ("vectors.f16", np.float16),
+    "int8": ("vectors.i8", np.int8),
+}
+# Rows multiplied at once, bounding the temporary score matrix.
+ROW_BLOCK = 65_536
+# Quantized blocks are converted to float32 before multiplying.
+QUANTIZED_ROW_BLOCK = 8_192
+QUERY_BLOCK = 32
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLES_PER_LIST = 256
+
+_COMPARISONS = {
+    "$eq": operator.eq,
+    "$ne": operator.ne,
+    "$lt": operator.lt,
+    "$lte": operator.le,
+    "$gt": operator.gt,
+    "$gte": operator.ge,
+}
+
+
+def _like(pattern: str, flags: int = 0) -> re.Pattern:
+    """Translate an SQL LIKE pattern into a regular expression."""
+    parts = (
+        ".*" if c == "%" else "." if c == "_" else re.escape(c)
+        for c in pattern
+    )
+    return re.compile("".join(parts), flags | re.DOTALL)
+
+
+def _matches_condition(value: Any, condition: Any) -> bool:
+    if not isinstance(condition, dict):
+        return value == condition
+    for op, expected in condition.items():
+        if op == "$exists":
+            if (value is not None) != bool(expected):
+                return False
+        elif op == "$in":
+            if value not in expected:
+                return False
+        elif op == "$nin":
+            if value in expected:
+                return False
+        elif op == "$between":
+            low, high = expected
+            if value is None or not low <= value <= high:
+                return False
+        elif op in ("$like", "$ilike"):
+            flags = re.IGNORECASE if op == "$ilike" else 0
+            if not isinstance(value, str) or not _like(
+                expected, flags
+            ).fullmatch(value):
+                return False
+        elif op in _COMPARISONS:
+            try:
+                if not _COMPARISONS[op](value, expected):
+                    return False
+            except TypeError:
+                return False
+        else:
+            raise ValueError(f"Unsupported filter operator {op}")
+    return True
+
+
+def matches_filter(metadata: Dict[str, Any], filter: Dict[str, Any]) -> bool:
+    """Evaluate a PGVector-style metadata filter against a metadata dict.
+
+    Supports field equality, `$eq`, `$ne`, `$lt`, `$lte`, `$gt`, `$gte`,
+    `$in`, `$nin`, `$between`, `$exists`, `$like`, `$ilike`, and `$and` /
+    `$or` combinations.
+
+    Args:
+        metadata (Dict[str, Any]): The document metadata.
+        filter (Dict[str, Any]): The filter.
+
+    Returns:
+        bool: Whether the metadata matches.
+    """
+    for key, condition in filter.items():
+        if key == "$and":
+            if not all(matches_filter(metadata, f) for f in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_filter(metadata, f) for f in condition):
+                return False
+        elif not _matches_condition(metadata.get(key), condition):
+            return False
+    return True
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return vectors / norms
+
+
+def _train_centroids(
+    vectors: np.ndarray, n_lists: int, seed: int = 0
+) -> np.ndarray:
+    """Train an IVF coarse quantizer with spherical k-means on a sample."""
+    rng = np.random.default_rng(seed)
+    n_samples = min(len(vectors), n_lists * KMEANS_SAMPLES_PER_LIST)
+    sample = np.asarray(
+        vectors[np.sort(rng.choice(len(vectors), n_samples, replace=False))]
+    )
+    centroids = sample[rng.choice(n_samples, n_lists, replace=False)].copy()
+    for _ in range(KMEANS_ITERATIONS):
+        assignments = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, sample)
+        empty = ~np.any(sums, axis=1)
+        sums[empty] = centroids[empty]
+        centroids = _normalize(sums)
+    return centroids.astype(np.float32)
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    assignments = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), ROW_BLOCK):
+        block = np.asarray(vectors[start : start + ROW_BLOCK])
+        assignments[start : start + len(block)] = np.argmax(
+            block @ centroids.T, axis=1
+        )
+    return assignments
+
+
+def _int8_scale(vectors: np.ndarray) -> float:
+    """Scale mapping almost every component of `vectors` into int8."""
+    bound = float(np.quantile(np.abs(vectors), 0.999)) if vectors.size else 0
+    return 127.0 / max(bound, 1e-6)
+
+
+def _quantize(
+    vectors: np.ndarray, quantization: str, scale: Optional[float]
+) -> np.ndarray:
+    if quantization == "int8":
+        return np.clip(np.rint(vectors * scale), -127, 127).astype(np.int8)
+    return vectors.astype(np.float16)
+
+
+def _encode(id: str, document: Document) -> bytes:
+    return (
+        json.dumps(
+            {
+                "id": id,
+                "page_content": document.page_content,
+                "metadata": document.metadata,
+            },
+            ensure_ascii=False,
+            default=str,
+        )
+        + "\n"
+    ).encode("utf-8")
+
+
+def _write_atomically(path: str, write) -> None:
+    tmp_path = f"{path}.tmp"
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+@contextmanager
+def _write_lock(path: str):
+    """Serialize writers of a collection across requests and processes."""
+    parent, name = os.path.split(os.path.normpath(path))
+    os.makedirs(parent or ".", exist_ok=True)
+    with open(os.path.join(parent, f".{name}.lock"), "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class LocalVectorIndex:
+    """In-process vector index of one collection, stored in plain files.
+
+    Embeddings are L2-normalized float32 rows appended to a memory-mapped
+    file, and searched by cosine distance with blocked matrix products and
+    `argpartition`. Documents are JSON lines located through an offsets file,
+    so only the returned documents are decoded. Deletes are tombstones; an
+    upsert tombstones the previous row of the id.
+
+    Large collections can get an IVF coarse quantizer: rows are clustered
+    with spherical k-means and a search only scores the rows of the `probes`
+    lists closest to the query.
+
+    A collection configured with `halfvec` or `int8` quantization also keeps
+    a float16 or int8 copy of the rows. Searches scan that copy and rescore
+    the `k * rescore_factor` best candidates with the float32 rows.
+
+    Files are only appended to, and `meta.json` is replaced last, so readers
+    see either the previous or the new row count.
+    """
+
+    def __init__(
+        self,
+        meta: Dict[str, Any],
+        vectors: np.ndarray,
+        buffer: Optional[mmap.mmap],
+        offsets: np.ndarray,
+        deleted: np.ndarray,
+        centroids: Optional[np.ndarray] = None,
+        assignments: Optional[np.ndarray] = None,
+        quantized: Optional[np.ndarray] = None,
+    ):
+        self.meta = meta
+        self.vectors = vectors
+        self.quantized = quantized
+        self.rescore_factor = (meta.get("embedding") or {}).get(
+            "rescore_factor", DEFAULT_RESCORE_FACTOR
+        )
+        self._buffer = buffer
+        self.offsets = offsets
+        # Tombstones written after `meta` was read may point past its rows.
+        self.deleted = deleted[deleted < len(vectors)]
+        deleted = self.deleted
+        self._deleted_mask = None
+        if len(deleted):
+            self._deleted_mask = np.zeros(len(vectors), dtype=bool)
+            self._deleted_mask[deleted] = True
+        self.centroids = centroids
+        self._lists = None
+        if centroids is not None:
+            order = np.argsort(assignments, kind="stable").astype(np.int64)
+            bounds = np.searchsorted(
+                assignments[order], np.arange(len(centroids) + 1)
+            )
+            self._lists = (order, bounds)
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        """Whether an index is stored at `path`."""
+        return os.path.isfile(os.path.join(path, META_FILE))
+
+    @classmethod
+    def load(cls, path: str) -> "LocalVectorIndex":
+        """Memory-map the committed rows of the index stored at `path`.
+
+        Args:
+            path (str): The index folder.
+
+        Returns:
+            LocalVectorIndex: The index.
+
+        Raises:
+            FileNotFoundError: If there is no index at `path`.
+        """
+        with open(os.path.join(path, META_FILE)) as f:
+            meta = json.load(f)
+        if meta["format_version"] != FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported vector index format version "
+                f"{meta['format_version']}"
+            )
+        count, dimensions = meta["count"], meta["dimensions"]
+        if count == 0:
+            return cls(
+                meta,
+                np.zeros((0, dimensions or 0), dtype=np.float32),
+                None,
+                np.zeros(1, dtype=np.int64),
+                np.zeros(0, dtype=np.int64),
+            )
+        vectors = np.memmap(
+            os.path.join(path, VECTORS_FILE),
+            dtype=np.float32,
+            mode="r",
+            shape=(count, dimensions),
+        )
+        offsets = np.memmap(
+            os.path.join(path, OFFSETS_FILE),
+            dtype=np.int64,
+            mode="r",
+            shape=(count + 1,),
+        )
+        with open(os.path.join(path, DOCUMENTS_FILE), "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        deleted = np.load(os.path.join(path, DELETED_FILE))
+        centroids = assignments = None
+        if meta.get("ivf"):
+            centroids = np.load(os.path.join(path, CENTROIDS_FILE))
+            assignments = np.memmap(
+                os.path.join(path, ASSIGNMENTS_FILE),
+                dtype=np.int32,
+                mode="r",
+                shape=(count,),
+            )
+        quantized = None
+        quantization = (meta.get("embedding") or {}).get("quantization")
+        if quantization in QUANTIZED_FILES:
+            name, dtype = QUANTIZED_FILES[quantization]
+            quantized = np.memmap(
+                os.path.join(path, name),
+                dtype=dtype,
+                mode="r",
+                shape=(count, dimensions),
+            )
+        return cls(
+            meta,
+            vectors,
+            buffer,
+            offsets,
+            deleted,
+            centroids,
+            assignments,
+            quantized,
+        )
+
+    @staticmethod
+    def read_meta(path: str) -> Optional[Dict[str, Any]]:
+        """Return the committed metadata of the index at `path`, if any."""
+        try:
+            with open(os.path.join(path, META_FILE)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate resident size; memory-mapped data is not counted."""
+        size = self.deleted.nbytes
+        if self._deleted_mask is not None:
+            size += self._deleted_mask.nbytes
+        if self._lists is not None:
+            size += self._lists[0].nbytes + self.centroids.nbytes
+        return size
+
+    def __len__(self) -> int:
+        return len(self.vectors) - len(self.deleted)
+
+    def _document(self, row: int) -> Document:
+        start, end = int(self.offsets[row]), int(self.offsets[row + 1])
+        data = json.loads(self._buffer[start:end])
+        return Document(
+            id=data["id"],
+            page_content=data["page_content"],
+            metadata=data["metadata"],
+        )
+
+    def _select(
+        self,
+        rows: Optional[np.ndarray],
+        scores: np.ndarray,
+        k: int,
+        filter: Optional[Dict[str, Any]],
+    ) -> List[Tuple[Document, float]]:
+        """Pick the `k` best live rows that match `filter`.
+
+        With a filter, the best candidates are checked in growing rounds until
+        `k` of them match or every candidate was checked.
+        """
+        if k <= 0:
+            return []
+        if rows is None:
+            rows = np.arange(len(scores))
+        if self._deleted_mask is not None:
+            live = ~self._deleted_mask[rows]
+            rows, scores = rows[live], scores[live]
+        results, checked = [], 0
+        fetch = k if filter is None else k * 4
+        while checked < len(rows):
+            fetch = min(fetch, len(rows))
+            top = np.argpartition(-scores, fetch - 1)[:fetch]
+            top = top[np.lexsort((rows[top], -scores[top]))]
+            for i in top[checked:]:
+                document = self._document(int(rows[i]))
+                if filter is None or matches_filter(document.metadata, filter):
+                    results.append((document, float(1 - scores[i])))
+                    if len(results) == k:
+                        return results
+            checked = fetch
+            fetch *= 4
+        return results
+
+    def search_with_scores(
+        self,
+        embeddings: Sequence[Sequence[float]],
+        k: int = 10,
+        filter: Optional[Dict[str, Any]] = None,
+        probes: Optional[int] = None,
+    ) -> List[List[Tuple[Document, float]]]:
+        """Return the `k` nearest documents of every query embedding.
+
+        Args:
+            embeddings (Sequence[Sequence[float]]): The query vectors.
+            k (int, optional): Results per query.
+            filter (Optional[Dict[str, Any]], optional): A metadata filter.
+            probes (Optional[int], optional): IVF lists scanned per query.
+                Defaults to the `probes` recorded when the quantizer was trained.
+
+        Returns:
+            List[List[Tuple[Document, float]]]: Documents and their cosine
+                distance for every query, nearest first.
+        """
+        if not len(embeddings):
+            return []
+        if k <= 0:
+            return [[] for _ in embeddings]
+        queries = _normalize(np.asarray(embeddings, dtype=np.float32))
+        if len(self) == 0:
+            return [[] for _ in queries]
+        if self._lists is not None:
+            return [
+                self._search_ivf(query, k, filter, probes) for query in queries
+            ]
+
+        results = []
+        n_rows = len(self.vectors)
+        matrix = self.vectors if self.quantized is None else self.quantized
+        row_block = (
+            ROW_BLOCK if self.quantized is None else QUANTIZED_ROW_BLOCK
+        )
+        for start in range(0, len(queries), QUERY_BLOCK):
+            block = queries[start : start + QUERY_BLOCK]
+            scores = np.empty((len(block), n_rows), dtype=np.float32)
+            for row in range(0, n_rows, row_block):
+                rows = np.asarray(matrix[row : row + row_block], np.float32)
+                scores[:, row : row + row_block] = block @ rows.T
+            results.extend(
+                self._rank(None, query_scores, query, k, filter)
+                for query, query_scores in zip(block, scores)
+            )
+        return results
+
+    def _rank(
+        self,
+        rows: Optional[np.ndarray],
+        scores: np.ndarray,
+        query: np.ndarray,
+        k: int,
+        filter: Optional[Dict[str, Any]],
+    ) -> List[Tuple[Document, float]]:
+        """Select results, rescoring quantized candidates at full precision.
+
+        Without quantization `scores` are exact. Otherwise the best
+        `k * rescore_factor` live rows are rescored with the float32 vectors;
+        the candidates grow when a filter leaves fewer than `k` of them.
+        """
+        if k <= 0:
+            return []
+        if self.quantized is None:
+            return self._select(rows, scores, k, filter)
+        if rows is None:
+            rows = np.arange(len(scores))
+        if self._deleted_mask is not None:
+            live = ~self._deleted_mask[rows]
+            rows, scores = rows[live], scores[live]
+        fetch = k * self.rescore_factor
+        while len(rows):
+            fetch = min(fetch, len(rows))
+            top = np.argpartition(-scores, fetch - 1)[:fetch]
+            candidates = np.sort(rows[top])
+            exact = np.asarray(self.vectors[candidates]) @ query
+            results = self._select(candidates, exact, k, filter)
+            if len(results) == k or fetch == len(rows):
+                return results
+            fetch *= 4
+        return []
+
+    def _search_ivf(
+        self,
+        query: np.ndarray,
+        k: int,
+        filter: Optional[Dict[str, Any]],
+        probes: Optional[int],
+    ) -> List[Tuple[Document, float]]:
+        order, bounds = self._lists
+        n_lists = len(self.centroids)
+        probes = min(probes or self.meta["ivf"]["probes"], n_lists)
+        centroid_scores = self.centroids @ query
+        lists = np.argpartition(-centroid_scores, probes - 1)[:probes]
+        rows = np.sort(
+            np.concatenate([order[bounds[i] : bounds[i + 1]] for i in lists])
+        )
+        matrix = self.vectors if self.quantized is None else self.quantized
+        scores = np.asarray(matrix[rows], np.float32) @ query
+        return self._rank(rows, scores, query, k, filter)
+
+    @classmethod
+    def append(
+        cls,
+        path: str,
+        documents: List[Document],
+        ids: List[str],
+        embeddings: Sequence[Sequence[float]],
+        ivf_min_rows: int = 0,
+    ) -> None:
+        """Append documents to the index at `path`, creating it if needed.
+
+        Rows whose id already exists replace the previous row, and of ids
+        repeated within the batch only the last one is kept, as with the
+        pgvector upsert. The IVF
+        quantizer is trained, or retrained, once the collection reaches
+        `ivf_min_rows` rows or doubles in size since the last training.
+
+        Args:
+            path (str): The index folder.
+            documents (List[Document]): The documents.
+            ids (List[str]): One id per document.
+            embeddings (Sequence[Sequence[float]]): One vector per document.
+            ivf_min_rows (int, optional): Rows from which an IVF quantizer is
+                used. 0 disables it.
+        """
+        vectors = _normalize(np.asarray(embeddings, dtype=np.float32))
+        last = {id: i for i, id in enumerate(ids)}
+        if len(last) < len(ids):
+            rows = sorted(last.values())
+            documents = [documents[i] for i in rows]
+            ids = [ids[i] for i in rows]
+            vectors = vectors[rows]
+        with _write_lock(path):
+            os.makedirs(path, exist_ok=True)
+            meta = cls._recover(path, vectors.shape[1])
+            if meta["dimensions"] is None:
+                meta["dimensions"] = vectors.shape[1]
+            if vectors.shape[1] != meta["dimensions"]:
+                raise ValueError(
+                    f"Expected {meta['dimensions']} dimensions, got "
+                    f"{vectors.shape[1]}"
+                )
+            count = meta["count"]
+            existing = cls._read_ids(path)
+            replaced = [existing[id] for id in ids if id in existing]
+
+            with open(os.path.join(path, VECTORS_FILE), "ab") as f:
+                f.write(vectors.tobytes())
+            quantization = (meta.get("embedding") or {}).get("quantization")
+            if quantization in QUANTIZED_FILES:
+                if quantization == "int8" and not meta.get("int8_scale"):
+                    meta["int8_scale"] = _int8_scale(vectors)
+                name = QUANTIZED_FILES[quantization][0]
+                with open(os.path.join(path, name), "ab") as f:
+                    f.write(
+                        _quantize(
+                            vectors, quantization, meta.get("int8_scale")
+                        ).tobytes()
+                    )
+            offsets = np.empty(len(documents), dtype=np.int64)
+            with open(os.path.join(path, DOCUMENTS_FILE), "ab") as f:
+                for i, (id, document) in enumerate(zip(ids, documents)):
+                    f.write(_encode(id, document))
+                    offsets[i] = f.tell()
+            with open(os.path.join(path, OFFSETS_FILE), "ab") as f:
+                f.write(offsets.tobytes())
+            with open(os.path.join(path, IDS_FILE), "a") as f:
+                f.writelines(json.dumps(id) + "\n" for id in ids)
+            if meta.get("ivf"):
+                centroids = np.load(os.path.join(path, CENTROIDS_FILE))
+                with open(os.path.join(path, ASSIGNMENTS_FILE), "ab") as f:
+                    f.write(_assign(vectors, centroids).tobytes())
+
+            meta["count"] = count + len(documents)
+            if ivf_min_rows and meta["count"] >= ivf_min_rows:
+                trained = (meta.get("ivf") or {}).get("trained_rows", 0)
+                if meta["count"] >= 2 * trained:
+                    meta["ivf"] = cls._train_ivf(path, meta)
+            cls._write_meta(path, meta)
+            # Tombstone replaced rows only once the new rows are committed.
+            if replaced:
+                cls._write_deleted(path, replaced)
+
+    @classmethod
+    def configure(cls, path: str, config: Dict[str, Any]) -> Dict[str, Any]:
+        """Record the embedding settings of the index at `path`.
+
+        Creates an empty index if needed. Dimensions and quantization can
+        only change while the index has no rows.
+
+        Args:
+            path (str): The index folder.
+            config (Dict[str, Any]): Settings from `build_embedding_config`.
+
+        Returns:
+            Dict[str, Any]: The recorded settings.
+
+        Raises:
+            ValueError: If the index has rows stored with other settings.
+        """
+        with _write_lock(path):
+            os.makedirs(path, exist_ok=True)
+            meta = cls._recover(path, None)
+            current = meta.get("embedding") or {}
+            if current == config:
+                return config
+            if meta["count"] and not same_storage(
+                {"dimensions": None, "quantization": "none", **current}, config
+            ):
+                raise ValueError(
+                    "The collection already has embeddings with other "
+                    "dimensions or quantization"
+                )
+            if meta["count"] == 0:
+                for quantization, (name, _) in QUANTIZED_FILES.items():
+                    file_path = os.path.join(path, name)
+                    if quantization == config["quantization"]:
+                        open(file_path, "wb").close()
+                    elif os.path.exists(file_path):
+                        os.remove(file_path)
+                meta.pop("int8_scale", None)
+            meta["embedding"] = config
+            cls._write_meta(path, meta)
+            return config
+
+    @classmethod
+    def delete(cls, path: str, ids: List[str]) -> int:
+        """Tombstone the rows of the given ids.
+
+        Args:
+            path (str): The index folder.
+            ids (List[str]): The ids to delete.
+
+        Returns:
+            int: The number of deleted rows.
+        """
+        with _write_lock(path):
+            if not cls.exists(path):
+                return 0
+            existing = cls._read_ids(path)
+            rows = [existing[id] for id in ids if id in existing]
+            if rows:
+                cls._write_deleted(path, rows)
+            return len(rows)
+
+    @staticmethod
+    def _write_meta(path: str, meta: Dict[str, Any]) -> None:
+        def write(tmp_path: str) -> None:
+            with open(tmp_path, "w") as f:
+                json.dump(meta, f)
+
+        _write_atomically(os.path.join(path, META_FILE), write)
+
+    @classmethod
+    def _recover(cls, path: str, dimensions: Optional[int]) -> Dict[str, Any]:
+        """Return the committed metadata, dropping rows of a failed append."""
+        if not cls.exists(path):
+            meta = {
+                "format_version": FORMAT_VERSION,
+                "dimensions": dimensions,
+                "count": 0,
+                "ivf": None,
+                "embedding": None,
+            }
+            for name in (
+                VECTORS_FILE,
+                DOCUMENTS_FILE,
+                IDS_FILE,
+                ASSIGNMENTS_FILE,
+            ):
+                open(os.path.join(path, name), "wb").close()
+            with open(os.path.join(path, OFFSETS_FILE), "wb") as f:
+                f.write(np.zeros(1, dtype=np.int64).tobytes())
+            np.save(
+                os.path.join(path, DELETED_FILE), np.zeros(0, dtype=np.int64)
+            )
+            return meta
+        with open(os.path.join(path, META_FILE)) as f:
+            meta = json.load(f)
+        count, dimensions = meta["count"], meta["dimensions"] or 0
+        sizes = {
+            VECTORS_FILE: count * dimensions * 4,
+            OFFSETS_FILE: (count + 1) * 8,
+            DOCUMENTS_FILE: cls._document_end(path, count),
+            ASSIGNMENTS_FILE: count * 4 if meta.get("ivf") else 0,
+        }
+        quantization = (meta.get("embedding") or {}).get("quantization")
+        if quantization in QUANTIZED_FILES:
+            name, dtype = QUANTIZED_FILES[quantization]
+            sizes[name] = count * dimensions * np.dtype(dtype).itemsize
+        for name, size in sizes.items():
+            file_path = os.path.join(path, name)
+            if os.path.getsize(file_path) != size:
+                os.truncate(file_path, size)
+        with open(os.path.join(path, IDS_FILE), "rb") as f:
+            lines = f.readlines()
+        if len(lines) != count:
+            with open(os.path.join(path, IDS_FILE), "wb") as f:
+                f.writelines(lines[:count])
+        return meta
+
+    @staticmethod
+    def _document_end(path: str, count: int) -> int:
+        offsets = np.fromfile(
+            os.path.join(path, OFFSETS_FILE),
+            dtype=np.int64,
+            count=1,
+            offset=count * 8,
+        )
+        return int(offsets[0])
+
+    @staticmethod
+    def _read_ids(path: str) -> Dict[str, int]:
+        """Map every live id to its latest row."""
+        deleted = set(np.load(os.path.join(path, DELETED_FILE)).tolist())
+        with open(os.path.join(path, IDS_FILE)) as f:
+            return {
+                json.loads(line): row
+                for row, line in enumerate(f)
+                if row not in deleted
+            }
+
+    @staticmethod
+    def _write_deleted(path: str, rows: List[int]) -> None:
+        deleted_path = os.path.join(path, DELETED_FILE)
+        deleted = np.union1d(np.load(deleted_path), rows).astype(np.int64)
+
+        def write(tmp_path: str) -> None:
+            with open(tmp_path, "wb") as f:
+                np.save(f, deleted)
+
+        _write_atomically(deleted_path, write)
+
+    @staticmethod
+    def _train_ivf(path: str, meta: Dict[str, Any]) -> Dict[str, Any]:
+        count = meta["count"]
+        vectors = np.memmap(
+            os.path.join(path, VECTORS_FILE),
+            dtype=np.float32,
+            mode="r",
+            shape=(count, meta["dimensions"]),
+        )
+        n_lists = max(1, int(np.sqrt(count)))
+        centroids = _train_centroids(vectors, n_lists)
+        assignments = _assign(vectors, centroids)
+
+        def write_centroids(tmp_path: str) -> None:
+            with open(tmp_path, "wb") as f:
+                np.save(f, centroids)
+
+        def write_assignments(tmp_path: str) -> None:
+            assignments.tofile(tmp_path)
+
+        _write_atomically(os.path.join(path, CENTROIDS_FILE), write_centroids)
+        _write_atomically(
+            os.path.join(path, ASSIGNMENTS_FILE), write_assignments
+        )
+        return {
+            "lists": n_lists,
+            "probes": max(1, n_lists // 10),
+            "trained_rows": count,
+        }
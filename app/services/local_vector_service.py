@@ -0,0 +1,339 @@
+# app/services/local_vector_service.py
+import os
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+from fastapi import HTTPException, status
+from langchain_core.documents import Document
+from starlette.concurrency import run_in_threadpool
+
+from app.constants.openai_models import EmbeddingOpenAIModels
+from app.services.answer_cache import answer_cache, vector_namespace
+from app.services.embedding_config import build_embedding_config
+from app.services.embedding_scheduler import create_embedding_scheduler
+from app.services.index_registry import index_registry
+from app.services.local_vector_index import LocalVectorIndex
+from app.services.vector_store_registry import vector_store_registry
+
+load_dotenv(override=True)
+
+LOCAL_VECTORS_PATH = os.getenv("LOCAL_VECTORS_PATH", "./app/vectors")
+IVF_MIN_ROWS = int(os.getenv("LOCAL_VECTOR_IVF_MIN_ROWS", 100_000))
+LOCAL_QUANTIZATIONS = ("none", "halfvec", "int8")
+
+
+class LocalVectorService:
+    """Vector service backed by an in-process `LocalVectorIndex`.
+
+    Drop-in replacement of `VectorService` for deployments without
+    PostgreSQL: it exposes the same methods, and `filter_params` accepts the
+    same metadata filters. `probes` sets the IVF lists scanned once the
+    collection has a quantizer; `ef_search` has no effect. `configure`
+    supports `halfvec` and `int8` quantization.
+    """
+
+    def __init__(
+        self,
+        collection_name: str,
+        embedding_model: EmbeddingOpenAIModels = EmbeddingOpenAIModels.TEXT_EMBEDDING_3_LARGE,
+    ):
+        """
+        Initialize the local vector service.
+
+        Args:
+            collection_name (str): The collection (namespace) name.
+            embedding_model (EmbeddingOpenAIModels, optional): The embedding model.
+        """
+        self.collection_name = collection_name
+        self.embedding_model = embedding_model
+        self.path = os.path.join(LOCAL_VECTORS_PATH, collection_name)
+        meta = LocalVectorIndex.read_meta(self.path) or {}
+        self.embeddings = vector_store_registry.get_embeddings(
+            embedding_model, (meta.get("embedding") or {}).get("dimensions")
+        )
+
+    @classmethod
+    async def acreate(
+        cls,
+        collection_name: str,
+        embedding_model: EmbeddingOpenAIModels = EmbeddingOpenAIModels.TEXT_EMBEDDING_3_LARGE,
+    ) -> "LocalVectorService":
+        """Counterpart of `VectorService.acreate`."""
+        return cls(collection_name, embedding_model)
+
+    def _index(self) -> Optional[LocalVectorIndex]:
+        """Return the loaded index, or None if the collection is empty."""
+        if not LocalVectorIndex.exists(self.path):
+            return None
+        return index_registry.get(
+            f"vector:{self.collection_name}", self.path, LocalVectorIndex.load
+        )
+
+    @staticmethod
+    def _ids(documents: List[Document], ids: Optional[List]) -> List[str]:
+        if not ids:
+            ids = [doc.metadata.get("id") for doc in documents]
+        return [str(id) if id is not None else str(uuid.uuid4()) for id in ids]
+
+    def _append(
+        self,
+        documents: List[Document],
+        ids: List[str],
+        embeddings: List[List[float]],
+    ) -> None:
+        LocalVectorIndex.append(
+            self.path, documents, ids, embeddings, ivf_min_rows=IVF_MIN_ROWS
+        )
+        index_registry.invalidate(f"vector:{self.collection_name}")
+        answer_cache.invalidate(vector_namespace(self.collection_name))
+
+    def index_documents(
+        self, documents: List[Document], ids: List = None
+    ) -> None:
+        """
+        Index documents in the local collection.
+
+        Args:
+            documents (List[Document]): The documents to index.
+            ids (List, optional): Document identifiers. Defaults to the `id` metadata.
+        """
+        if not documents:
+            return
+        try:
+            self._append(
+                documents,
+                self._ids(documents, ids),
+                self.embeddings.embed_documents(
+                    [doc.page_content for doc in documents]
+                ),
+            )
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Error at indexing the documents: {e}",
+            )
+
+    def _search_by_vectors(
+        self,
+        embeddings: List[List[float]],
+        k: int,
+        filter_params: Optional[dict],
+        probes: Optional[int],
+    ) -> List[List[Tuple[Document, float]]]:
+        index = self._index()
+        if index is None:
+            return [[] for _ in embeddings]
+        return index.search_with_scores(
+            embeddings, k, filter=filter_params or None, probes=probes
+        )
+
+    def search(
+        self,
+        query: str,
+        k: int = 10,
+        filter_params: dict = None,
+        ef_search: Optional[int] = None,
+        probes: Optional[int] = None,
+    ) -> List[Document]:
+        """See `VectorService.search`."""
+        return [
+            doc
+            for doc, _ in self.search_with_score(
+                query, k, filter_params, ef_search, probes
+            )
+        ]
+
+    def search_with_score(
+        self,
+        query: str,
+        k: int = 10,
+        filter_params: dict = None,
+        ef_search: Optional[int] = None,
+        probes: Optional[int] = None,
+    ) -> List[Tuple[Document, float]]:
+        """See `VectorService.search_with_score`. Scores are cosine distances."""
+        try:
+            return self._search_by_vectors(
+                [self.embeddings.embed_query(query)], k, filter_params, probes
+            )[0]
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"An error occurred during search with score: {e}",
+            )
+
+    def batch_search_with_score(
+        self,
+        queries: List[str],
+        k: int = 10,
+        filter_params: dict = None,
+        ef_search: Optional[int] = None,
+        probes: Optional[int] = None,
+    ) -> List[List[Tuple[Document, float]]]:
+        """See `VectorService.batch_search_with_score`."""
+        if not queries:
+            return []
+        try:
+            return self._search_by_vectors(
+                self.embeddings.embed_documents(queries),
+                k,
+                filter_params,
+                probes,
+            )
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"An error occurred during batch search: {e}",
+            )
+
+    def batch_search(
+        self,
+        queries: List[str],
+        k: int = 10,
+        filter_params: dict = None,
+        ef_search: Optional[int] = None,
+        probes: Optional[int] = None,
+    ) -> List[List[Document]]:
+        """See `VectorService.batch_search`."""
+        return [
+            [doc for doc, _ in results]
+            for results in self.batch_search_with_score(
+                queries, k, filter_params, ef_search, probes
+            )
+        ]
+
+    def configure(
+        self,
+        dimensions: Optional[int] = None,
+        quantization: Optional[str] = None,
+        rescore_factor: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """
+        Set the embedding dimensions and quantization of the collection.
+
+        See `VectorService.configure`. The settings are recorded in the
+        collection's `meta.json`.
+
+        Args:
+            dimensions (int, optional): Reduced embedding dimensions.
+            quantization (str, optional): `none`, `halfvec`, or `int8`.
+            rescore_factor (int, optional): Candidates rescored per result.
+
+        Returns:
+            Dict[str, Any]: The recorded settings.
+
+        Raises:
+            HTTPException: If the settings are invalid or the collection
+                already has embeddings stored differently.
+        """
+        config = build_embedding_config(
+            self.embedding_model,
+            dimensions,
+            quantization,
+            rescore_factor,
+            LOCAL_QUANTIZATIONS,
+        )
+        try:
+            LocalVectorIndex.configure(self.path, config)
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Collection {self.collection_name}: {e}",
+            )
+        index_registry.invalidate(f"vector:{self.collection_name}")
+        answer_cache.invalidate(vector_namespace(self.collection_name))
+        self.embeddings = vector_store_registry.get_embeddings(
+            self.embedding_model, config["dimensions"]
+        )
+        return config
+
+    def delete_documents(self, ids: List) -> None:
+        """
+        Deletes documents from the local collection using their IDs.
+
+        Args:
+            ids (List): List of document identifiers to delete.
+        """
+        try:
+            LocalVectorIndex.delete(self.path, [str(id) for id in ids])
+            index_registry.invalidate(f"vector:{self.collection_name}")
+            answer_cache.invalidate(vector_namespace(self.collection_name))
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Error deleting documents: {e}",
+            )
+
+    async def aindex_documents(
+        self, documents: List[Document], ids: List = None
+    ) -> Dict[str, Any]:
+        """
+        Async version of `index_documents`.
+
+        Chunks are embedded by the `EmbeddingScheduler` and appended to the
+        collection once all of them are embedded.
+
+        Args:
+            documents (List[Document]): The documents to index.
+            ids (List, optional): Document identifiers. Defaults to the `id` metadata.
+
+        Returns:
+            Dict[str, Any]: Embedding throughput of the job.
+        """
+        try:
+            texts = [doc.page_content for doc in documents]
+            vectors: List[Optional[List[float]]] = [None] * len(texts)
+
+            async def collect(
+                batch: List[int], embeddings: List[List[float]]
+            ) -> None:
+                for i, embedding in zip(batch, embeddings):
+                    vectors[i] = embedding
+
+            scheduler = create_embedding_scheduler(self.embeddings)
+            stats = await scheduler.run(texts, collect)
+            if documents:
+                await run_in_threadpool(
+                    self._append,
+                    documents,
+                    self._ids(documents, ids),
+                    np.asarray(vectors, dtype=np.float32),
+                )
+            return stats
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Error at indexing the documents: {e}",
+            )
+
+    async def asearch(self, *args, **kwargs) -> List[Document]:
+        """Async version of `search`."""
+        return await run_in_threadpool(self.search, *args, **kwargs)
+
+    async def asearch_with_score(
+        self, *args, **kwargs
+    ) -> List[Tuple[Document, float]]:
+        """Async version of `search_with_score`."""
+        return await run_in_threadpool(self.search_with_score, *args, **kwargs)
+
+    async def abatch_search_with_score(
+        self, *args, **kwargs
+    ) -> List[List[Tuple[Document, float]]]:
+        """Async version of `batch_search_with_score`."""
+        return await run_in_threadpool(
+            self.batch_search_with_score, *args, **kwargs
+        )
+
+    async def abatch_search(self, *args, **kwargs) -> List[List[Document]]:
+        """Async version of `batch_search`."""
+        return await run_in_threadpool(self.batch_search, *args, **kwargs)
+
+    async def aconfigure(self, *args, **kwargs) -> Dict[str, Any]:
+        """Async version of `configure`."""
+        return await run_in_threadpool(self.configure, *args, **kwargs)
+
+    async def adelete_documents(self, ids: List) -> None:
+        """Async version of `delete_documents`."""
+        await run_in_threadpool(self.delete_documents, ids)
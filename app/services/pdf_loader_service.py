@@ -1,15 +1,190 @@
 # app/services/pdf_loader_service.py
+import asyncio
+import math
 import os
+import shutil
 import tempfile
-from typing import List
+import time
+from typing import (
+    Any,
+    BinaryIO,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
 
+from dotenv import load_dotenv
 from fastapi import HTTPException, UploadFile
-from langchain_community.document_loaders import PyPDFLoader
 from langchain_core.documents import Document
 from langchain_text_splitters import RecursiveCharacterTextSplitter
+from pypdf import PdfReader
 from starlette import status
+from starlette.concurrency import run_in_threadpool
 
+from app.services.chunk_cache import (
+    CHUNK_CACHE_PATH,
+    DEFAULT_MAX_BYTES,
+    ChunkCache,
+    hash_stream,
+)
 from app.utils.logger import logger
+from app.utils.process_pool import process_pool
+
+load_dotenv(override=True)
+
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+MIN_PAGES_PER_TASK = 8
+EXTRACTION_WORKERS = int(
+    os.getenv("PDF_EXTRACTION_WORKERS", process_pool.max_workers)
+)
+
+chunk_cache = ChunkCache(
+    path=os.getenv("CHUNK_CACHE_PATH", CHUNK_CACHE_PATH),
+    max_bytes=int(os.getenv("CHUNK_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES)),
+    chunk_size=CHUNK_SIZE,
+    chunk_overlap=CHUNK_OVERLAP,
+)
+
+
+def iter_pdf_pages(
+    stream: BinaryIO,
+    file_name: str,
+    source: Optional[str] = None,
+    start: int = 0,
+    end: Optional[int] = None,
+) -> Iterator[Document]:
+    """
+    Yield the pages of a PDF one at a time.
+
+    pypdf reads the objects it needs from the seekable `stream` on demand, so
+    the file is never loaded as a whole and only one page of text is
+    materialized at a time.
+
+    Args:
+        stream (BinaryIO): A seekable binary stream with the PDF content.
+        file_name (str): The original name of the uploaded file.
+        source (str, optional): The source stored in the metadata. Defaults to `file_name`.
+        start (int, optional): The first page to read. Defaults to 0.
+        end (int, optional): The page to stop before. Defaults to the last page.
+
+    Yields:
+        Document: One document per page.
+    """
+    reader = PdfReader(stream)
+    total_pages = len(reader.pages)
+    end = total_pages if end is None else min(end, total_pages)
+    # Computed for every page on each access, so read it once.
+    page_labels = reader.page_labels
+    for page_number in range(start, end):
+        page = reader.pages[page_number]
+        yield Document(
+            page_content=page.extract_text().strip(),
+            metadata={
+                "source": source or file_name,
+                "file_name": file_name,
+                "page": page_number,
+                "page_label": page_labels[page_number],
+                "total_pages": total_pages,
+            },
+        )
+
+
+def split_pages(pages: Iterable[Document]) -> Iterator[Document]:
+    """
+    Split pages into chunks as they are produced.
+
+    Every chunk records its offset in the page text as `start_index`, so
+    overlapping chunks can be merged back when building the prompt.
+
+    Args:
+        pages (Iterable[Document]): The pages to split.
+
+    Yields:
+        Document: The chunks of every page, in order.
+    """
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP,
+        add_start_index=True,
+    )
+    for page in pages:
+        yield from text_splitter.split_documents([page])
+
+
+def count_pdf_pages(path: str) -> int:
+    """
+    Count the pages of a PDF file without extracting them.
+
+    Args:
+        path (str): Path of the PDF file.
+
+    Returns:
+        int: The number of pages.
+    """
+    with open(path, "rb") as f:
+        return len(PdfReader(f).pages)
+
+
+def load_pdf_pages(path: str, start: int, end: int) -> List[Document]:
+    """
+    Parse a range of pages of a temporary PDF file and split them into chunks.
+
+    This is a module-level function so it can run in the process pool.
+
+    Args:
+        path (str): Path of the temporary PDF file.
+        start (int): The first page to parse.
+        end (int): The page to stop before.
+
+    Returns:
+        List[Document]: The chunks of the pages, in page order.
+    """
+    file_name = os.path.basename(path).split("_temp_")[0]
+    with open(path, "rb") as f:
+        return list(
+            split_pages(iter_pdf_pages(f, file_name, start=start, end=end))
+        )
+
+
+def _restamp(documents: List[Document], file_name: str) -> List[Document]:
+    """Attribute cached chunks to the file name of the current upload."""
+    for doc in documents:
+        doc.metadata["file_name"] = file_name
+        doc.metadata["source"] = file_name
+    return documents
+
+
+def plan_page_ranges(
+    page_counts: List[int], workers: int
+) -> List[Tuple[int, int, int]]:
+    """
+    Split files into page ranges to be extracted in parallel.
+
+    Ranges are sized so that all pages are spread over about `workers` jobs,
+    but never smaller than `MIN_PAGES_PER_TASK` pages since every job has to
+    open the file again.
+
+    Args:
+        page_counts (List[int]): The number of pages of each file.
+        workers (int): The number of parallel jobs.
+
+    Returns:
+        List[Tuple[int, int, int]]: (file index, start page, end page) ranges
+            in file and page order.
+    """
+    total_pages = sum(page_counts)
+    size = max(MIN_PAGES_PER_TASK, math.ceil(total_pages / max(workers, 1)))
+    return [
+        (file_index, start, min(start + size, page_count))
+        for file_index, page_count in enumerate(page_counts)
+        for start in range(0, page_count, size)
+    ]
 
 
 class PDFLoaderService:
@@ -26,9 +201,7 @@ class PDFLoaderService:
         self.files = files
         self.temp_paths = []
         self.docs = []
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000, chunk_overlap=200
-        )
+        self.extraction_stats: Dict[str, Any] = {}
 
         if not self.files:
             raise HTTPException(
@@ -43,24 +216,28 @@ class PDFLoaderService:
                     detail=f"File {file.filename} is not a PDF. Only PDF files are allowed.",
                 )
 
-        self._create_temp_files()
-
-    def _create_temp_files(self):
+    def _create_temp_files(self, files: Optional[List[UploadFile]] = None):
         """
         Create temporary files from the uploaded files.
 
+        Uploads are copied in chunks of `UPLOAD_CHUNK_SIZE` bytes, so a large
+        file is never held in memory as a whole.
+
+        Args:
+            files (List[UploadFile], optional): The files to copy. Defaults to all uploads.
+
         Raises:
             HTTPException: If there is an error processing the uploaded files.
         """
         try:
-            for file in self.files:
+            for file in self.files if files is None else files:
                 temp_file = tempfile.NamedTemporaryFile(
                     delete=False,
                     suffix=".pdf",
                     prefix=f"{file.filename}_temp_",
                 )
-                content = file.file.read()
-                temp_file.write(content)
+                file.file.seek(0)
+                shutil.copyfileobj(file.file, temp_file, UPLOAD_CHUNK_SIZE)
                 temp_file.close()
                 self.temp_paths.append(temp_file.name)
         except Exception as e:
@@ -70,6 +247,36 @@ class PDFLoaderService:
                 detail=f"Error processing uploaded files: {str(e)}",
             )
 
+    def iter_documents(self) -> Iterator[Document]:
+        """
+        Stream the chunks of the uploaded PDFs.
+
+        The uploads are read directly from their spooled files, without
+        temporary copies, and pages are parsed and split one at a time. Files
+        found in the chunk cache are not parsed at all.
+
+        Yields:
+            Document: The chunks of every file, in upload order.
+        """
+        self._pages_extracted = 0
+        self._cached_files = 0
+        for file in self.files:
+            file_hash = hash_stream(file.file) if chunk_cache.enabled else None
+            cached = chunk_cache.get(file_hash) if file_hash else None
+            if cached is not None:
+                self._cached_files += 1
+                yield from _restamp(cached, file.filename)
+                continue
+
+            chunks = []
+            for chunk in split_pages(iter_pdf_pages(file.file, file.filename)):
+                chunks.append(chunk)
+                yield chunk
+            if chunks:
+                self._pages_extracted += chunks[-1].metadata["total_pages"]
+            if file_hash:
+                chunk_cache.put(file_hash, chunks)
+
     def load_pdfs(self) -> List[Document]:
         """
         Load and process PDF documents.
@@ -81,26 +288,179 @@ class PDFLoaderService:
             HTTPException: If there is an error loading or processing the PDF documents.
         """
         try:
-            all_docs = []
-            for path in self.temp_paths:
-                loader = PyPDFLoader(path)
-                docs = loader.load()
-                for doc in docs:
-                    doc.metadata["file_name"] = (
-                        doc.metadata["source"]
-                        .split("/")[-1]
-                        .split("_temp_")[0]
+            started = time.perf_counter()
+            self.docs = list(self.iter_documents())
+            self._record_extraction(
+                self._pages_extracted, started, 1, self._cached_files
+            )
+            return self.docs
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Error loading PDF documents: {str(e)}",
+            )
+
+    async def aload_pdfs(self) -> List[Document]:
+        """
+        Load and process PDF documents in the process pool.
+
+        Files are split into page ranges that are extracted in parallel by up
+        to `PDF_EXTRACTION_WORKERS` workers, and the chunks are merged back in
+        file and page order. Files found in the chunk cache are not parsed.
+        When the process pool is disabled the uploads are streamed in a thread
+        instead, without temporary files.
+
+        Returns:
+            List[Document]: A list of processed documents split into chunks.
+
+        Raises:
+            HTTPException: If there is an error loading or processing the PDF documents.
+        """
+        if not process_pool.enabled:
+            return await run_in_threadpool(self.load_pdfs)
+        try:
+            started = time.perf_counter()
+            hashes, documents = await run_in_threadpool(self._lookup_cache)
+            missing = [i for i, docs in enumerate(documents) if docs is None]
+            await run_in_threadpool(
+                self._create_temp_files, [self.files[i] for i in missing]
+            )
+            page_counts = [
+                await run_in_threadpool(count_pdf_pages, path)
+                for path in self.temp_paths
+            ]
+            workers = max(1, min(EXTRACTION_WORKERS, process_pool.max_workers))
+            ranges = plan_page_ranges(page_counts, workers)
+            chunks = await self._extract_page_ranges(ranges, workers)
+
+            for i in missing:
+                documents[i] = []
+            for (temp_index, _, _), chunk in zip(ranges, chunks):
+                documents[missing[temp_index]].extend(chunk)
+            for i in missing:
+                if hashes[i]:
+                    await run_in_threadpool(
+                        chunk_cache.put, hashes[i], documents[i]
                     )
-                all_docs.extend(docs)
-            self.delete_temp_files()
-            self.docs = self.text_splitter.split_documents(all_docs)
+
+            self.docs = [doc for docs in documents for doc in docs]
+            self._record_extraction(
+                sum(page_counts),
+                started,
+                workers,
+                len(self.files) - len(missing),
+            )
             return self.docs
+        except HTTPException:
+            raise
         except Exception as e:
-            self.delete_temp_files()
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Error loading PDF documents: {str(e)}",
             )
+        finally:
+            self.delete_temp_files()
+
+    def _lookup_cache(
+        self,
+    ) -> Tuple[List[Optional[str]], List[Optional[List[Document]]]]:
+        """
+        Hash the uploads and look them up in the chunk cache.
+
+        Returns:
+            Tuple[List[Optional[str]], List[Optional[List[Document]]]]: The hash
+                of every upload (None when the cache is disabled) and its cached
+                chunks (None on a miss).
+        """
+        hashes, documents = [], []
+        for file in self.files:
+            file_hash = hash_stream(file.file) if chunk_cache.enabled else None
+            cached = chunk_cache.get(file_hash) if file_hash else None
+            hashes.append(file_hash)
+            documents.append(
+                None if cached is None else _restamp(cached, file.filename)
+            )
+        return hashes, documents
+
+    async def _extract_page_ranges(
+        self, ranges: List[Tuple[int, int, int]], workers: int
+    ) -> List[List[Document]]:
+        """
+        Extract page ranges in the process pool, at most `workers` at a time.
+
+        Args:
+            ranges (List[Tuple[int, int, int]]): Ranges from `plan_page_ranges`.
+            workers (int): The number of jobs allowed to run at once.
+
+        Returns:
+            List[List[Document]]: The chunks of every range, in range order.
+        """
+        semaphore = asyncio.Semaphore(workers)
+
+        async def extract(file_index: int, start: int, end: int):
+            async with semaphore:
+                return await process_pool.run(
+                    load_pdf_pages, self.temp_paths[file_index], start, end
+                )
+
+        tasks = [asyncio.ensure_future(extract(*r)) for r in ranges]
+        try:
+            return await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+    def _record_extraction(
+        self, pages: int, started: float, workers: int, cached_files: int = 0
+    ) -> None:
+        """Store and log the extraction throughput."""
+        seconds = time.perf_counter() - started
+        self.extraction_stats = {
+            "files": len(self.files),
+            "cached_files": cached_files,
+            "pages": pages,
+            "workers": workers,
+            "seconds": round(seconds, 3),
+            "pages_per_second": round(pages / seconds, 2) if seconds else 0.0,
+        }
+        logger.info(
+            f"Extracted {pages} pages from {len(self.files)} files "
+            f"({cached_files} cached) in "
+            f"{seconds:.2f}s ({self.extraction_stats['pages_per_second']} "
+            f"pages/s, {workers} workers)"
+        )
+
+    async def run_in_process_pool(
+        self, task: Callable[..., Any], *args: Any
+    ) -> Any:
+        """
+        Load the PDF documents and run `task(docs, *args)` in the process pool.
+
+        Heavy work that consumes the uploaded PDFs (index fitting) should go
+        through here so it doesn't block the event loop.
+
+        Args:
+            task (Callable[..., Any]): A module-level function taking the documents first.
+            *args: Additional positional arguments for `task`.
+
+        Returns:
+            Any: The return value of `task`.
+
+        Raises:
+            HTTPException: If the task fails or the process pool is saturated.
+        """
+        docs = await self.aload_pdfs()
+        try:
+            return await process_pool.run(task, docs, *args)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Error processing PDF documents: {str(e)}",
+            )
 
     def delete_temp_files(self):
         """Delete all temporary files created during PDF processing."""
@@ -109,3 +469,4 @@ class PDFLoaderService:
                 os.remove(path)
             except Exception as e:
                 logger.error(f"Error deleting temp file {path}: {e}")
+        self.temp_paths = []
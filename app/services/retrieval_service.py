@@ -1,18 +1,42 @@
 # app/services/retrieval_service.py
-from typing import Dict
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from dotenv import load_dotenv
+from langchain_core.documents import Document
+from starlette.concurrency import run_in_threadpool
 
 from app.constants.openai_models import EmbeddingOpenAIModels
 from app.core.agents.retrieval_agent import RetrievalAgent
+from app.services.answer_cache import (
+    answer_cache,
+    tfidf_namespace,
+    vector_namespace,
+)
 from app.services.index_service import IndexService
-from app.services.vector_service import VectorService
+from app.services.semantic_cache import semantic_cache
+from app.services.vector_service import create_vector_service
+from app.utils.logger import logger
+from app.utils.rank_fusion import DEFAULT_RRF_K, reciprocal_rank_fusion
+
+load_dotenv(override=True)
+
+# Hybrid retrieval fetches k * HYBRID_CANDIDATES_FACTOR results per retriever.
+HYBRID_CANDIDATES_FACTOR = int(os.getenv("HYBRID_CANDIDATES_FACTOR", 3))
+HYBRID_RRF_K = int(os.getenv("HYBRID_RRF_K", DEFAULT_RRF_K))
 
 
 class RetrievalService:
     """
     Service for handling document retrieval and query processing.
 
-    This service coordinates between either a TF-IDF index or a vector store for document retrieval
-    and the retrieval agent for generating the response.
+    This service coordinates between a TF-IDF index, a vector store, or both
+    (hybrid retrieval) for document retrieval and the retrieval agent for
+    generating the response. Answers are cached by query and retrieved
+    context in the `answer_cache`, and by query similarity in the
+    `semantic_cache`, which is looked up before retrieval.
     """
 
     def __init__(self, index_name: str = None, collection: str = None):
@@ -25,14 +49,149 @@ class RetrievalService:
         """
         self.retrieval_agent = RetrievalAgent()
         self.index_service = IndexService()
+        self.namespaces: List[str] = []
         if index_name:
             self.index_service.load_index(index_name)
+            self.namespaces.append(tfidf_namespace(index_name))
         if collection:
-            self.vector_service = VectorService(
+            self.namespaces.append(vector_namespace(collection))
+            self.vector_service = create_vector_service(
                 embedding_model=EmbeddingOpenAIModels.TEXT_EMBEDDING_3_LARGE,
                 collection_name=collection,
             )
 
+    def _answer_key(self, query: str, documents: List[Document]) -> str:
+        return answer_cache.key(
+            self.retrieval_agent.model_openai,
+            self.retrieval_agent.PROMPT_VERSION,
+            query,
+            documents,
+        )
+
+    def _answer(self, query: str, documents: List[Document]) -> Dict[str, str]:
+        """Generate the answer, or return the cached one for the same context."""
+        key = self._answer_key(query, documents)
+        response = answer_cache.get(key)
+        if response is None:
+            response = self.retrieval_agent.generate_response(query, documents)
+            answer_cache.put(key, response, self.namespaces)
+        return response
+
+    async def _aanswer(
+        self, query: str, documents: List[Document]
+    ) -> Dict[str, str]:
+        """Async version of `_answer`."""
+        key = self._answer_key(query, documents)
+        response = await run_in_threadpool(answer_cache.get, key)
+        if response is None:
+            response = await self.retrieval_agent.agenerate_response(
+                query, documents
+            )
+            await run_in_threadpool(
+                answer_cache.put, key, response, self.namespaces
+            )
+        return response
+
+    def semantic_lookup(
+        self, query: str, retrieval_type: str, k: int = 5
+    ) -> Dict[str, Any]:
+        """
+        Look a query up in the semantic cache.
+
+        Args:
+            query (str): The search query.
+            retrieval_type (str): The retrieval method to use ('tfidf', 'vector' or 'hybrid').
+            k (int, optional): The number of documents to retrieve. Defaults to 5.
+
+        Returns:
+            Dict[str, Any]: The `response` and `documents` of a similar query
+                answered before, None on a miss, along with the `scope`,
+                `embedding` and namespace `generations` needed to store the
+                answer.
+        """
+        generations = semantic_cache.generations(self.namespaces)
+        scope = semantic_cache.scope(
+            self.retrieval_agent.model_openai,
+            self.retrieval_agent.PROMPT_VERSION,
+            retrieval_type,
+            k,
+            *self.namespaces,
+        )
+        try:
+            embedding = semantic_cache.embed(query)
+        except Exception as e:
+            logger.error(
+                f"Error embedding the query for the semantic cache: {e}"
+            )
+            embedding = None
+        cached = semantic_cache.get(scope, embedding) or {}
+        return {
+            "scope": scope,
+            "embedding": embedding,
+            "generations": generations,
+            "response": cached.get("response"),
+            "documents": cached.get("documents"),
+        }
+
+    def _semantic_put(
+        self,
+        lookup: Dict[str, Any],
+        query: str,
+        response: Dict[str, str],
+        documents: List[Document],
+    ) -> None:
+        semantic_cache.put(
+            lookup["scope"],
+            self.namespaces,
+            query,
+            lookup["embedding"],
+            {"response": response, "documents": documents},
+            lookup["generations"],
+        )
+
+    def _fuse(
+        self, tfidf_docs: List[Document], vector_docs: List[Document], k: int
+    ) -> List[Document]:
+        return [
+            doc
+            for doc, _ in reciprocal_rank_fusion(
+                [tfidf_docs, vector_docs], k, rrf_k=HYBRID_RRF_K
+            )
+        ]
+
+    def hybrid_search(self, query: str, k: int = 5) -> List[Document]:
+        """
+        Search the TF-IDF index and the vector collection concurrently.
+
+        Each retriever returns `k * HYBRID_CANDIDATES_FACTOR` candidates, and
+        the lists are merged with reciprocal rank fusion, so the latency is
+        that of the slower retriever.
+
+        Args:
+            query (str): The search query.
+            k (int, optional): The number of fused documents. Defaults to 5.
+
+        Returns:
+            List[Document]: The fused documents, best first.
+        """
+        candidates = k * HYBRID_CANDIDATES_FACTOR
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            tfidf = executor.submit(
+                self.index_service.search, query, candidates
+            )
+            vector_docs = self.vector_service.search(query, candidates)
+            tfidf_docs = tfidf.result()
+        return self._fuse(tfidf_docs, vector_docs, k)
+
+    async def ahybrid_search(self, query: str, k: int = 5) -> List[Document]:
+        """Async version of `hybrid_search`."""
+        candidates = k * HYBRID_CANDIDATES_FACTOR
+        tfidf_docs, vector_docs = await asyncio.gather(
+            run_in_threadpool(self.index_service.search, query, candidates),
+            run_in_threadpool(self.vector_service.search, query, candidates),
+        )
+        return self._fuse(tfidf_docs, vector_docs, k)
+
     def retrieve_information(
         self, query: str, retrieval_type: str, k: int = 5
     ) -> Dict[str, str]:
@@ -41,7 +200,7 @@ class RetrievalService:
 
         Args:
             query (str): The search query.
-            retrieval_type (str): The retrieval method to use ('tfidf' or 'vector').
+            retrieval_type (str): The retrieval method to use ('tfidf', 'vector' or 'hybrid').
             k (int, optional): The number of documents to retrieve. Defaults to 5.
 
         Returns:
@@ -50,10 +209,113 @@ class RetrievalService:
         Raises:
             Exception: If retrieval or response generation fails.
         """
+        lookup = self.semantic_lookup(query, retrieval_type, k)
+        if lookup["response"] is not None:
+            return lookup["response"]
         if retrieval_type == "tfidf":
             docs = self.index_service.search(query, k)
         elif retrieval_type == "vector":
             docs = self.vector_service.search(query, k)
+        elif retrieval_type == "hybrid":
+            docs = self.hybrid_search(query, k)
         else:
             raise Exception(f"Unsupported retrieval type: {retrieval_type}")
-        return self.retrieval_agent.generate_response(query, docs)
+        response = self._answer(query, docs)
+        self._semantic_put(lookup, query, response, docs)
+        return response
+
+    async def aretrieve_documents(
+        self, query: str, retrieval_type: str, k: int = 5
+    ) -> List[Document]:
+        """
+        Search the documents of a query without blocking the event loop.
+
+        Args:
+            query (str): The search query.
+            retrieval_type (str): The retrieval method to use ('tfidf', 'vector' or 'hybrid').
+            k (int, optional): The number of documents to retrieve. Defaults to 5.
+
+        Returns:
+            List[Document]: The retrieved documents, best first.
+
+        Raises:
+            Exception: If the retrieval type is not supported.
+        """
+        if retrieval_type == "hybrid":
+            return await self.ahybrid_search(query, k)
+        if retrieval_type == "tfidf":
+            return await run_in_threadpool(self.index_service.search, query, k)
+        if retrieval_type == "vector":
+            return await run_in_threadpool(
+                self.vector_service.search, query, k
+            )
+        raise Exception(f"Unsupported retrieval type: {retrieval_type}")
+
+    async def aretrieve_information(
+        self, query: str, retrieval_type: str, k: int = 5
+    ) -> Dict[str, str]:
+        """
+        Async version of `retrieve_information`.
+
+        Searches run in the thread pool and the response is generated with
+        the async LLM client, so the event loop is not blocked.
+        """
+        lookup = await self.asemantic_lookup(query, retrieval_type, k)
+        if lookup["response"] is not None:
+            return lookup["response"]
+        docs = await self.aretrieve_documents(query, retrieval_type, k)
+        response = await self._aanswer(query, docs)
+        self._semantic_put(lookup, query, response, docs)
+        return response
+
+    async def asemantic_lookup(
+        self, query: str, retrieval_type: str, k: int = 5
+    ) -> Dict[str, Any]:
+        """Async version of `semantic_lookup`."""
+        return await run_in_threadpool(
+            self.semantic_lookup, query, retrieval_type, k
+        )
+
+    async def astream_response(
+        self,
+        query: str,
+        documents: List[Document],
+        lookup: Optional[Dict[str, Any]] = None,
+    ) -> AsyncIterator[str]:
+        """
+        Stream the answer to a query from already retrieved documents.
+
+        A cached answer is sent in one piece. Otherwise the streamed answer is
+        cached once it completes.
+
+        Args:
+            query (str): The search query.
+            documents (List[Document]): Documents from `aretrieve_documents`,
+                or the `documents` of a semantic cache hit.
+            lookup (Optional[Dict[str, Any]], optional): Result of
+                `asemantic_lookup`. Its answer is sent on a hit, and the
+                streamed answer is stored in the semantic cache on a miss.
+
+        Yields:
+            str: The answer, piece by piece.
+        """
+        key = self._answer_key(query, documents)
+        if lookup is not None and lookup["response"] is not None:
+            yield lookup["response"]["ai_response"]
+            return
+        response = await run_in_threadpool(answer_cache.get, key)
+        if response is not None:
+            yield response["ai_response"]
+            return
+        tokens = []
+        async for token in self.retrieval_agent.astream_response(
+            query, documents
+        ):
+            tokens.append(token)
+            yield token
+        response = {"ai_response": "".join(tokens)}
+        await run_in_threadpool(
+            answer_cache.put, key, response, self.namespaces
+        )
+        if lookup is not None:
+            self._semantic_put(lookup, query, response, documents)
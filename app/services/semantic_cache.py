@@ -0,0 +1,291 @@
+# app/services/semantic_cache.py
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+from app.constants.openai_models import EmbeddingOpenAIModels
+from app.services.answer_cache import answer_cache
+from app.services.vector_store_registry import vector_store_registry
+from app.utils.logger import logger
+
+load_dotenv(override=True)
+
+DEFAULT_SIMILARITY_THRESHOLD = 0.92
+INITIAL_CAPACITY = 64
+
+
+class _Scope:
+    """Cached queries of one scope, as a matrix of unit vectors."""
+
+    __slots__ = (
+        "namespaces",
+        "vectors",
+        "queries",
+        "values",
+        "expires_at",
+        "accessed_at",
+        "size",
+    )
+
+    def __init__(self, namespaces: Sequence[str], dimensions: int):
+        self.namespaces = tuple(namespaces)
+        self.vectors = np.zeros((INITIAL_CAPACITY, dimensions), np.float32)
+        self.queries: List[Optional[str]] = [None] * INITIAL_CAPACITY
+        self.values: List[Any] = [None] * INITIAL_CAPACITY
+        self.expires_at = np.zeros(INITIAL_CAPACITY)
+        self.accessed_at = np.zeros(INITIAL_CAPACITY)
+        self.size = 0
+
+    def slot(self, max_entries: int, now: float) -> int:
+        """Return the row of a new entry, evicting one when full."""
+        if self.size < max_entries:
+            if self.size == len(self.queries):
+                self._grow(min(2 * self.size, max_entries))
+            self.size += 1
+            return self.size - 1
+        expired = np.flatnonzero(self.expires_at[: self.size] <= now)
+        if len(expired):
+            return int(expired[0])
+        return int(np.argmin(self.accessed_at[: self.size]))
+
+    def _grow(self, capacity: int) -> None:
+        extra = capacity - len(self.queries)
+        self.vectors = np.vstack(
+            [
+                self.vectors,
+                np.zeros((extra, self.vectors.shape[1]), np.float32),
+            ]
+        )
+        self.queries.extend([None] * extra)
+        self.values.extend([None] * extra)
+        self.expires_at = np.concatenate([self.expires_at, np.zeros(extra)])
+        self.accessed_at = np.concatenate([self.accessed_at, np.zeros(extra)])
+
+
+class SemanticAnswerCache:
+    """Process-local cache of answers matched by query similarity.
+
+    Paraphrased questions ("what is the deadline" / "when is it due") miss
+    the exact-match `answer_cache`. This cache embeds the query and compares
+    it with one matrix product against the queries already answered in the
+    same scope (retrieval settings, indexes and collections). The closest
+    one is reused when its cosine similarity reaches `threshold`.
+
+    Every scope holds at most `max_entries` answers: expired entries are
+    replaced first, then the least recently used. Scopes are dropped when
+    one of their indexes or collections is invalidated in the
+    `answer_cache`. Every invalidation also bumps the generation of the
+    namespace, so an answer generated from documents retrieved before it
+    is not stored after it. Like the memory backend of the `answer_cache`, it is
+    per process: other uvicorn workers keep their answers until they expire.
+    """
+
+    def __init__(
+        self,
+        threshold: Optional[float],
+        max_entries: int,
+        ttl: float,
+        embedding_model: EmbeddingOpenAIModels = EmbeddingOpenAIModels.TEXT_EMBEDDING_3_LARGE,
+    ):
+        """Initialize the cache.
+
+        Args:
+            threshold (Optional[float]): Minimum cosine similarity of a hit.
+                None disables the cache.
+            max_entries (int): Answers kept per scope.
+            ttl (float): Seconds an answer stays valid.
+            embedding_model (EmbeddingOpenAIModels, optional): Model embedding
+                the queries. The vector collections' model, so the query
+                vector is reused from the embedding cache by vector search.
+        """
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.embedding_model = embedding_model
+        self._scopes: Dict[str, _Scope] = {}
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        """Whether the cache stores and serves answers."""
+        return self.threshold is not None and self.max_entries > 0
+
+    @staticmethod
+    def scope(*parts: Any) -> str:
+        """Build a scope key. Only answers of the same scope are compared."""
+        return "|".join(str(part) for part in parts)
+
+    def generations(self, namespaces: Sequence[str]) -> Tuple[int, ...]:
+        """Return the invalidation count of each namespace.
+
+        Args:
+            namespaces (Sequence[str]): Indexes and collections of a scope.
+
+        Returns:
+            Tuple[int, ...]: The generations, to pass to `put`.
+        """
+        with self._lock:
+            return tuple(
+                self._generations.get(namespace, 0) for namespace in namespaces
+            )
+
+    def embed(self, query: str) -> Optional[np.ndarray]:
+        """Embed a query as a unit vector, or return None when disabled.
+
+        Args:
+            query (str): The user's query.
+
+        Returns:
+            Optional[np.ndarray]: The normalized query vector.
+        """
+        if not self.enabled:
+            return None
+        vector = np.asarray(
+            vector_store_registry.get_embeddings(
+                self.embedding_model
+            ).embed_query(query),
+            dtype=np.float32,
+        )
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def get(
+        self, scope: str, embedding: Optional[np.ndarray]
+    ) -> Optional[Any]:
+        """Return the answer of the most similar cached query, if close enough.
+
+        Args:
+            scope (str): Key built with `scope`.
+            embedding (Optional[np.ndarray]): Vector built with `embed`.
+
+        Returns:
+            Optional[Any]: The cached answer.
+        """
+        if embedding is None:
+            return None
+        now = time.time()
+        with self._lock:
+            entries = self._scopes.get(scope)
+            value = None
+            if entries is not None and entries.size:
+                similarities = entries.vectors[: entries.size] @ embedding
+                similarities[entries.expires_at[: entries.size] <= now] = -1.0
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    entries.accessed_at[best] = now
+                    value = entries.values[best]
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return value
+
+    def put(
+        self,
+        scope: str,
+        namespaces: Sequence[str],
+        query: str,
+        embedding: Optional[np.ndarray],
+        value: Any,
+        generations: Optional[Sequence[int]] = None,
+    ) -> None:
+        """Store the answer of a query.
+
+        Args:
+            scope (str): Key built with `scope`.
+            namespaces (Sequence[str]): Indexes and collections it depends on.
+            query (str): The user's query.
+            embedding (Optional[np.ndarray]): Vector built with `embed`.
+            value (Any): The answer.
+            generations (Optional[Sequence[int]], optional): `generations` of
+                the namespaces taken before retrieval. The answer is not
+                stored if one of them was invalidated since.
+        """
+        if embedding is None:
+            return
+        now = time.time()
+        with self._lock:
+            if generations is not None and tuple(generations) != tuple(
+                self._generations.get(namespace, 0) for namespace in namespaces
+            ):
+                return
+            entries = self._scopes.get(scope)
+            if entries is None:
+                entries = self._scopes[scope] = _Scope(
+                    namespaces, len(embedding)
+                )
+            row = entries.slot(self.max_entries, now)
+            entries.vectors[row] = embedding
+            entries.queries[row] = query
+            entries.values[row] = value
+            entries.expires_at[row] = now + self.ttl
+            entries.accessed_at[row] = now
+
+    def invalidate(self, namespace: str) -> None:
+        """Drop the scopes that retrieve from an index or collection.
+
+        Args:
+            namespace (str): `tfidf:<index name>` or `vector:<collection name>`.
+        """
+        with self._lock:
+            self._generations[namespace] = (
+                self._generations.get(namespace, 0) + 1
+            )
+            scopes = [
+                scope
+                for scope, entries in self._scopes.items()
+                if namespace in entries.namespaces
+            ]
+            removed = sum(self._scopes.pop(scope).size for scope in scopes)
+        if removed:
+            logger.info(
+                f"Invalidated {removed} semantically cached answers of {namespace}"
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        """Return cache counters.
+
+        Returns:
+            Dict[str, Any]: Hits, misses, the hit ratio and the number of
+                scopes and stored answers.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "scopes": len(self._scopes),
+                "entries": sum(
+                    entries.size for entries in self._scopes.values()
+                ),
+            }
+
+
+def create_semantic_cache() -> SemanticAnswerCache:
+    """Create the semantic cache configured by the environment.
+
+    Returns:
+        SemanticAnswerCache: The cache, disabled when
+            `SEMANTIC_CACHE_THRESHOLD` is empty.
+    """
+    threshold = os.getenv(
+        "SEMANTIC_CACHE_THRESHOLD", str(DEFAULT_SIMILARITY_THRESHOLD)
+    )
+    cache = SemanticAnswerCache(
+        threshold=float(threshold) if threshold else None,
+        max_entries=int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", 1_000)),
+        ttl=float(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", 86_400)),
+    )
+    answer_cache.on_invalidate(cache.invalidate)
+    return cache
+
+
+semantic_cache = create_semantic_cache()
@@ -0,0 +1,904 @@
+# app/services/tfidf_index.py
+import json
+import os
+import shutil
+import time
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from scipy import sparse
+from sklearn.feature_extraction.text import CountVectorizer
+
+from app.utils.document_store import DocumentStore
+
+FORMAT_VERSION = 3
+CURRENT_FILE = "CURRENT"
+META_FILE = "meta.json"
+VOCABULARY_FILE = "vocabulary.json"
+SEGMENT_FILE = "segment.json"
+FILES_FILE = "files.json"
+SEGMENTS_DIR = "segments"
+
+# CountVectorizer parameters persisted with the index so queries are tokenized
+# exactly like the indexed documents.
+VECTORIZER_PARAMS = (
+    "lowercase",
+    "strip_accents",
+    "token_pattern",
+    "ngram_range",
+    "analyzer",
+    "stop_words",
+)
+
+
+def _new_id() -> str:
+    return f"{time.time_ns():020d}"
+
+
+def _compute_idf(df: np.ndarray, n_docs: int) -> np.ndarray:
+    """Smoothed IDF, identical to scikit-learn's `TfidfTransformer` default."""
+    return (np.log((1 + n_docs) / (1 + df)) + 1).astype(np.float32)
+
+
+def _is_memory_mapped(array: np.ndarray) -> bool:
+    while array is not None:
+        if isinstance(array, np.memmap):
+            return True
+        array = getattr(array, "base", None)
+    return False
+
+
+def _row_norms(tf: sparse.csr_matrix, idf: np.ndarray) -> np.ndarray:
+    weighted = tf.multiply(idf.reshape(1, -1)).tocsr()
+    weighted.data **= 2
+    return np.sqrt(np.asarray(weighted.sum(axis=1)).ravel()).astype(np.float32)
+
+
+def _file_ids(documents: Iterable[Document]) -> Dict[str, List[int]]:
+    """Map every `file_name` to the positions of its chunks."""
+    files: Dict[str, List[int]] = {}
+    for i, doc in enumerate(documents):
+        file_name = doc.metadata.get("file_name")
+        if file_name is not None:
+            files.setdefault(str(file_name), []).append(i)
+    return files
+
+
+def _save_matrix(path: str, prefix: str, matrix: sparse.spmatrix) -> None:
+    index_dtype = np.int32 if matrix.nnz < np.iinfo(np.int32).max else np.int64
+    np.save(
+        os.path.join(path, f"{prefix}_data.npy"),
+        np.asarray(matrix.data, dtype=np.float32),
+    )
+    np.save(
+        os.path.join(path, f"{prefix}_indices.npy"),
+        np.asarray(matrix.indices, dtype=index_dtype),
+    )
+    np.save(
+        os.path.join(path, f"{prefix}_indptr.npy"),
+        np.asarray(matrix.indptr, dtype=index_dtype),
+    )
+
+
+def _load_matrix(path: str, prefix: str, shape: tuple, matrix_class) -> Any:
+    def array(name: str) -> np.ndarray:
+        return np.load(
+            os.path.join(path, f"{prefix}_{name}.npy"), mmap_mode="r"
+        )
+
+    return matrix_class(
+        (array("data"), array("indices"), array("indptr")),
+        shape=shape,
+        copy=False,
+    )
+
+
+class TFIDFSegment:
+    """Immutable block of indexed chunks.
+
+    A segment holds the term-frequency matrix of its chunks in CSR and CSC
+    (postings) form, the L2 norm of every TF-IDF weighted row computed with the
+    IDF at the time the segment was built, the chunks themselves and the chunk
+    positions of every `file_name`. Its columns are the first `n_terms` terms
+    of the index vocabulary, which only ever grows.
+    """
+
+    def __init__(
+        self,
+        tf: sparse.csr_matrix,
+        norms: np.ndarray,
+        documents: Sequence[Document],
+        postings: sparse.csc_matrix = None,
+        files: Dict[str, List[int]] = None,
+        segment_id: str = None,
+    ):
+        """Initialize the segment.
+
+        Args:
+            tf (sparse.csr_matrix): Term-frequency matrix (chunks x terms).
+            norms (np.ndarray): L2 norm of every TF-IDF weighted row.
+            documents (Sequence[Document]): The chunks of the segment.
+            postings (sparse.csc_matrix, optional): `tf` in CSC form. Computed
+                from `tf` when not given.
+            files (Dict[str, List[int]], optional): Chunk positions per file
+                name. Computed from the documents when first needed.
+            segment_id (str, optional): Identifier of the segment on disk.
+        """
+        self.id = segment_id or _new_id()
+        self.tf = tf
+        self.postings = postings if postings is not None else tf.tocsc()
+        self.norms = norms
+        self.documents = documents
+        self._files = files
+
+    @classmethod
+    def build(
+        cls,
+        tf: sparse.csr_matrix,
+        idf: np.ndarray,
+        documents: List[Document],
+    ) -> "TFIDFSegment":
+        """Build a segment from its term frequencies and chunks.
+
+        Args:
+            tf (sparse.csr_matrix): Term-frequency matrix (chunks x terms).
+            idf (np.ndarray): Current IDF of the index vocabulary.
+            documents (List[Document]): The chunks, in `tf` row order.
+
+        Returns:
+            TFIDFSegment: The new segment.
+        """
+        tf = sparse.csr_matrix(tf, dtype=np.float32)
+        tf.sort_indices()
+        return cls(
+            tf=tf,
+            norms=_row_norms(tf, idf[: tf.shape[1]]),
+            documents=DocumentStore.from_documents(documents),
+            files=_file_ids(documents),
+        )
+
+    @classmethod
+    def load(
+        cls,
+        path: str,
+        segment_id: str = None,
+        shape: tuple = None,
+        with_postings: bool = True,
+    ) -> "TFIDFSegment":
+        """Memory-map a segment written by `write`.
+
+        Args:
+            path (str): The segment folder.
+            segment_id (str, optional): Identifier of the segment.
+            shape (tuple, optional): Matrix shape, read from the segment
+                metadata when not given.
+            with_postings (bool, optional): Whether postings were written.
+
+        Returns:
+            TFIDFSegment: The memory-mapped segment.
+        """
+        if shape is None:
+            with open(os.path.join(path, SEGMENT_FILE)) as f:
+                shape = json.load(f)["shape"]
+        shape = tuple(shape)
+        files = None
+        if os.path.isfile(os.path.join(path, FILES_FILE)):
+            with open(os.path.join(path, FILES_FILE)) as f:
+                files = json.load(f)
+        return cls(
+            tf=_load_matrix(path, "tf", shape, sparse.csr_matrix),
+            norms=np.load(os.path.join(path, "norms.npy"), mmap_mode="r"),
+            documents=DocumentStore.open(path),
+            postings=(
+                _load_matrix(path, "postings", shape, sparse.csc_matrix)
+                if with_postings
+                else None
+            ),
+            files=files,
+            segment_id=segment_id,
+        )
+
+    def write(self, path: str) -> None:
+        """Write the segment files to `path`.
+
+        Args:
+            path (str): The segment folder.
+        """
+        _save_matrix(path, "tf", self.tf)
+        _save_matrix(path, "postings", self.postings)
+        np.save(os.path.join(path, "norms.npy"), self.norms)
+        documents = self.documents
+        if not isinstance(documents, DocumentStore):
+            documents = DocumentStore.from_documents(documents)
+        documents.write(path)
+        with open(os.path.join(path, FILES_FILE), "w") as f:
+            json.dump(self.files, f, ensure_ascii=False)
+        with open(os.path.join(path, SEGMENT_FILE), "w") as f:
+            json.dump({"shape": list(self.tf.shape), "nnz": self.tf.nnz}, f)
+
+    @property
+    def files(self) -> Dict[str, List[int]]:
+        """Chunk positions per `file_name`."""
+        if self._files is None:
+            self._files = _file_ids(self.documents)
+        return self._files
+
+    @property
+    def n_docs(self) -> int:
+        return self.tf.shape[0]
+
+    @property
+    def n_terms(self) -> int:
+        return self.tf.shape[1]
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate resident size; memory-mapped arrays are not counted."""
+        size = 0
+        for array in (
+            self.tf.data,
+            self.tf.indices,
+            self.tf.indptr,
+            self.postings.data,
+            self.postings.indices,
+            self.postings.indptr,
+            self.norms,
+        ):
+            if not _is_memory_mapped(array):
+                size += array.nbytes
+        return size + getattr(self.documents, "nbytes", 0)
+
+
+class TFIDFIndex:
+    """TF-IDF index with a pickle-free, memory-mapped on-disk format.
+
+    The index is a list of immutable segments sharing one vocabulary, plus the
+    document frequency of every term and the ids of deleted chunks. Each
+    segment keeps raw term frequencies and row norms, so the cosine similarity
+    between a query and a chunk is `q · (tf * idf) / norm`. For an index built
+    in one go this ranks documents exactly like `TFIDFRetriever` with the
+    default vectorizer.
+
+    Appending documents adds a segment and updates the document frequencies,
+    and removing documents only records tombstones, so both cost depends on
+    the documents involved rather than on the size of the index. The IDF is
+    recomputed lazily from the document frequencies on first use. Row norms
+    keep the IDF of the time their segment was built until the index is
+    compacted, which merges all segments, drops deleted chunks and recomputes
+    every statistic.
+
+    Each segment also keeps its matrix in CSC form, i.e. one postings list per
+    term. A search only reads the postings of the query terms and selects the
+    top results with `argpartition`, so its cost depends on the number of query
+    terms and on `k` rather than on the number of chunks.
+
+    On disk an index is a folder with immutable segment folders, one small
+    folder per generation listing the live segments, and a `CURRENT` file
+    naming the active generation::
+
+        {name}/CURRENT
+        {name}/{generation}/meta.json
+        {name}/{generation}/vocabulary.json
+        {name}/{generation}/df.npy
+        {name}/{generation}/deleted.npy
+        {name}/segments/{segment}/segment.json
+        {name}/segments/{segment}/files.json
+        {name}/segments/{segment}/norms.npy
+        {name}/segments/{segment}/tf_{data,indices,indptr}.npy
+        {name}/segments/{segment}/postings_{data,indices,indptr}.npy
+        {name}/segments/{segment}/documents.jsonl
+        {name}/segments/{segment}/documents_offsets.npy
+
+    Arrays are opened with `numpy.memmap`, so every worker shares the same page
+    cache and loading does not depend on the size of the index. Saving only
+    writes new segments and a new generation, then swaps `CURRENT` atomically,
+    which never touches files other processes may have mapped.
+    """
+
+    def __init__(
+        self,
+        vocabulary: Dict[str, int],
+        segments: List[TFIDFSegment],
+        df: np.ndarray,
+        deleted: np.ndarray = None,
+        vectorizer_params: Dict[str, Any] = None,
+    ):
+        """Initialize the index.
+
+        Args:
+            vocabulary (Dict[str, int]): Mapping of terms to column indices.
+            segments (List[TFIDFSegment]): The segments, in chunk id order.
+            df (np.ndarray): Number of live chunks containing every term.
+            deleted (np.ndarray, optional): Sorted ids of deleted chunks.
+            vectorizer_params (Dict[str, Any], optional): Tokenization parameters.
+        """
+        self.vocabulary = vocabulary
+        self.segments = list(segments)
+        self.df = df
+        self.deleted = (
+            deleted if deleted is not None else np.empty(0, dtype=np.int64)
+        )
+        self.vectorizer_params = vectorizer_params or {}
+        self.vectorizer = CountVectorizer(
+            vocabulary=vocabulary, **self.vectorizer_params
+        )
+        self.offsets = np.cumsum(
+            [0] + [segment.n_docs for segment in self.segments]
+        )
+        self._idf = None
+
+    @classmethod
+    def from_term_frequencies(
+        cls,
+        vocabulary: Dict[str, int],
+        tf: sparse.csr_matrix,
+        documents: List[Document],
+        vectorizer_params: Dict[str, Any] = None,
+    ) -> "TFIDFIndex":
+        """Build a single-segment index from a term-frequency matrix.
+
+        Args:
+            vocabulary (Dict[str, int]): Mapping of terms to column indices.
+            tf (sparse.csr_matrix): Term-frequency matrix (chunks x terms).
+            documents (List[Document]): The chunks, in `tf` row order.
+            vectorizer_params (Dict[str, Any], optional): Tokenization parameters.
+
+        Returns:
+            TFIDFIndex: The index.
+        """
+        tf = sparse.csr_matrix(tf, dtype=np.float32)
+        tf.sort_indices()
+        df = np.bincount(tf.indices, minlength=len(vocabulary)).astype(
+            np.int64
+        )
+        segment = TFIDFSegment.build(
+            tf, _compute_idf(df, tf.shape[0]), documents
+        )
+        return cls(
+            vocabulary=vocabulary,
+            segments=[segment],
+            df=df,
+            vectorizer_params=vectorizer_params,
+        )
+
+    @classmethod
+    def from_documents(
+        cls, documents: List[Document], **vectorizer_params: Any
+    ) -> "TFIDFIndex":
+        """Fit a new index over the given documents.
+
+        Args:
+            documents (List[Document]): Documents to index.
+            **vectorizer_params: Optional `CountVectorizer` parameters.
+
+        Returns:
+            TFIDFIndex: The fitted index.
+
+        Raises:
+            ValueError: If no documents are given.
+        """
+        if not documents:
+            raise ValueError("Cannot build an index without documents.")
+        vectorizer = CountVectorizer(dtype=np.float32, **vectorizer_params)
+        tf = vectorizer.fit_transform(doc.page_content for doc in documents)
+        params = {
+            key: value
+            for key, value in vectorizer.get_params().items()
+            if key in VECTORIZER_PARAMS
+        }
+        return cls.from_term_frequencies(
+            vocabulary={
+                term: int(i) for term, i in vectorizer.vocabulary_.items()
+            },
+            tf=tf,
+            documents=documents,
+            vectorizer_params=params,
+        )
+
+    @classmethod
+    def from_retriever(cls, retriever: Any) -> "TFIDFIndex":
+        """Convert a legacy `TFIDFRetriever` into a native index.
+
+        The retriever stores L2-normalized TF-IDF rows, so dividing by the IDF
+        gives weights proportional to the term frequencies of each row, which
+        is all cosine similarity needs.
+
+        Args:
+            retriever (Any): The loaded `TFIDFRetriever`.
+
+        Returns:
+            TFIDFIndex: The equivalent native index.
+        """
+        vectorizer = retriever.vectorizer
+        idf = np.asarray(vectorizer.idf_, dtype=np.float32)
+        tfidf = sparse.csr_matrix(retriever.tfidf_array, dtype=np.float32)
+        tf = tfidf.multiply((1.0 / idf).reshape(1, -1)).tocsr()
+        params = {
+            key: value
+            for key, value in vectorizer.get_params().items()
+            if key in VECTORIZER_PARAMS and not callable(value)
+        }
+        return cls.from_term_frequencies(
+            vocabulary={
+                term: int(i) for term, i in vectorizer.vocabulary_.items()
+            },
+            tf=tf,
+            documents=list(retriever.docs),
+            vectorizer_params=params,
+        )
+
+    @classmethod
+    def exists(cls, path: str) -> bool:
+        """Whether a native index is stored at `path`."""
+        return os.path.isfile(os.path.join(path, CURRENT_FILE))
+
+    @classmethod
+    def load(cls, path: str) -> "TFIDFIndex":
+        """Open the current generation of the index stored at `path`.
+
+        Args:
+            path (str): The index folder.
+
+        Returns:
+            TFIDFIndex: The memory-mapped index.
+
+        Raises:
+            FileNotFoundError: If there is no index at `path`.
+        """
+        with open(os.path.join(path, CURRENT_FILE)) as f:
+            generation_path = os.path.join(path, f.read().strip())
+        with open(os.path.join(generation_path, META_FILE)) as f:
+            meta = json.load(f)
+        version = meta["format_version"]
+        if version not in (1, 2, FORMAT_VERSION):
+            raise ValueError(f"Unsupported index format version {version}")
+        with open(os.path.join(generation_path, VOCABULARY_FILE)) as f:
+            vocabulary = json.load(f)
+        params = meta["vectorizer_params"]
+        if params.get("ngram_range") is not None:
+            params["ngram_range"] = tuple(params["ngram_range"])
+
+        if version < 3:
+            # Single-segment layout with every file in the generation folder.
+            # The segment gets a new id so the next save migrates it.
+            segment = TFIDFSegment.load(
+                generation_path,
+                shape=meta["shape"],
+                with_postings=version >= 2,
+            )
+            return cls(
+                vocabulary=vocabulary,
+                segments=[segment],
+                df=np.diff(segment.postings.indptr).astype(np.int64),
+                vectorizer_params=params,
+            )
+
+        segments = [
+            TFIDFSegment.load(
+                os.path.join(path, SEGMENTS_DIR, segment_id),
+                segment_id=segment_id,
+            )
+            for segment_id in meta["segments"]
+        ]
+        return cls(
+            vocabulary=vocabulary,
+            segments=segments,
+            df=np.load(os.path.join(generation_path, "df.npy")),
+            deleted=np.load(os.path.join(generation_path, "deleted.npy")),
+            vectorizer_params=params,
+        )
+
+    def save(self, path: str) -> None:
+        """Write new segments and a new generation, and make it current.
+
+        Segments already present in `path` are not written again.
+
+        Args:
+            path (str): The index folder.
+        """
+        segments_path = os.path.join(path, SEGMENTS_DIR)
+        os.makedirs(segments_path, exist_ok=True)
+        for segment in self.segments:
+            segment_path = os.path.join(segments_path, segment.id)
+            if os.path.isdir(segment_path):
+                continue
+            self._write_atomically(segment_path, segment.write)
+
+        generation = _new_id()
+
+        def write_generation(tmp_path: str) -> None:
+            with open(os.path.join(tmp_path, VOCABULARY_FILE), "w") as f:
+                json.dump(self.vocabulary, f, ensure_ascii=False)
+            np.save(os.path.join(tmp_path, "df.npy"), self.df)
+            np.save(os.path.join(tmp_path, "deleted.npy"), self.deleted)
+            with open(os.path.join(tmp_path, META_FILE), "w") as f:
+                json.dump(
+                    {
+                        "format_version": FORMAT_VERSION,
+                        "generation": generation,
+                        "segments": [segment.id for segment in self.segments],
+                        "n_docs": int(self.n_docs),
+                        "n_deleted": int(len(self.deleted)),
+                        "vectorizer_params": self.vectorizer_params,
+                    },
+                    f,
+                )
+
+        self._write_atomically(
+            os.path.join(path, generation), write_generation
+        )
+        current_tmp = os.path.join(path, f"{CURRENT_FILE}.{generation}.tmp")
+        with open(current_tmp, "w") as f:
+            f.write(generation)
+        os.replace(current_tmp, os.path.join(path, CURRENT_FILE))
+        self._remove_stale_files(path, keep=generation)
+
+    @staticmethod
+    def _write_atomically(path: str, write) -> None:
+        tmp_path = f"{path}.tmp"
+        os.makedirs(tmp_path)
+        try:
+            write(tmp_path)
+            os.rename(tmp_path, path)
+        except Exception:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            raise
+
+    @staticmethod
+    def _remove_stale_files(path: str, keep: str) -> None:
+        """Delete stale generations and the segments only they reference.
+
+        The previous generation is kept for readers that resolved `CURRENT`
+        right before the swap.
+        """
+        generations = sorted(
+            entry.name
+            for entry in os.scandir(path)
+            if entry.is_dir() and entry.name.isdigit() and entry.name < keep
+        )
+        for generation in generations[:-1]:
+            shutil.rmtree(os.path.join(path, generation), ignore_errors=True)
+
+        referenced = set()
+        for generation in generations[-1:] + [keep]:
+            try:
+                with open(os.path.join(path, generation, META_FILE)) as f:
+                    referenced.update(json.load(f).get("segments", []))
+            except FileNotFoundError:
+                continue
+        segments_path = os.path.join(path, SEGMENTS_DIR)
+        for entry in os.scandir(segments_path):
+            if entry.name.isdigit() and entry.name not in referenced:
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+    @property
+    def idf(self) -> np.ndarray:
+        """IDF of every term, recomputed lazily from document frequencies."""
+        if self._idf is None:
+            self._idf = _compute_idf(self.df, len(self))
+        return self._idf
+
+    @property
+    def n_docs(self) -> int:
+        """Number of chunks, including deleted ones."""
+        return int(self.offsets[-1])
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate resident size; memory-mapped arrays are not counted."""
+        # Rough per-entry cost of a Python dict holding str -> int.
+        size = len(self.vocabulary) * 100
+        size += self.df.nbytes + self.deleted.nbytes
+        return size + sum(segment.nbytes for segment in self.segments)
+
+    def __len__(self) -> int:
+        return self.n_docs - len(self.deleted)
+
+    def add_documents(self, documents: List[Document]) -> "TFIDFIndex":
+        """Return a new index with `documents` appended as a new segment.
+
+        New terms extend the vocabulary. The cost depends on the new
+        documents, not on the size of the index.
+
+        Args:
+            documents (List[Document]): Documents to append.
+
+        Returns:
+            TFIDFIndex: The updated index. This index is left unchanged.
+        """
+        analyzer = self.vectorizer.build_analyzer()
+        vocabulary = dict(self.vocabulary)
+        indptr, indices, data = [0], [], []
+        for doc in documents:
+            counts = Counter()
+            for term in analyzer(doc.page_content):
+                column = vocabulary.setdefault(term, len(vocabulary))
+                counts[column] += 1
+            indices.extend(counts.keys())
+            data.extend(counts.values())
+            indptr.append(len(indices))
+        tf = sparse.csr_matrix(
+            (
+                np.asarray(data, dtype=np.float32),
+                np.asarray(indices, dtype=np.int64),
+                np.asarray(indptr, dtype=np.int64),
+            ),
+            shape=(len(documents), len(vocabulary)),
+        )
+
+        df = np.zeros(len(vocabulary), dtype=np.int64)
+        df[: len(self.df)] = self.df
+        df += np.bincount(tf.indices, minlength=len(vocabulary))
+        idf = _compute_idf(df, len(self) + len(documents))
+        return TFIDFIndex(
+            vocabulary=vocabulary,
+            segments=self.segments + [TFIDFSegment.build(tf, idf, documents)],
+            df=df,
+            deleted=self.deleted,
+            vectorizer_params=self.vectorizer_params,
+        )
+
+    def remove_files(
+        self, file_names: Iterable[str]
+    ) -> Tuple["TFIDFIndex", int]:
+        """Return a new index without the chunks of the given files.
+
+        Chunks are only marked as deleted; they are dropped from disk when the
+        index is compacted.
+
+        Args:
+            file_names (Iterable[str]): Values of the `file_name` metadata.
+
+        Returns:
+            Tuple[TFIDFIndex, int]: The updated index and the number of
+                removed chunks. This index is left unchanged.
+        """
+        file_names = set(file_names)
+        ids = []
+        for offset, segment in zip(self.offsets, self.segments):
+            for file_name in file_names:
+                ids.extend(
+                    offset + i for i in segment.files.get(file_name, [])
+                )
+        ids = np.setdiff1d(np.asarray(ids, dtype=np.int64), self.deleted)
+        if len(ids) == 0:
+            return self, 0
+
+        df = np.array(self.df, dtype=np.int64)
+        for offset, segment in zip(self.offsets, self.segments):
+            local = ids[(ids >= offset) & (ids < offset + segment.n_docs)]
+            if len(local):
+                rows = segment.tf[local - offset]
+                df[: segment.n_terms] -= np.bincount(
+                    rows.indices, minlength=segment.n_terms
+                )
+        index = TFIDFIndex(
+            vocabulary=self.vocabulary,
+            segments=self.segments,
+            df=df,
+            deleted=np.union1d(self.deleted, ids),
+            vectorizer_params=self.vectorizer_params,
+        )
+        return index, len(ids)
+
+    def needs_compaction(
+        self, max_segments: int, max_deleted_ratio: float
+    ) -> bool:
+        """Whether the index has too many segments or deleted chunks.
+
+        Args:
+            max_segments (int): Maximum number of segments.
+            max_deleted_ratio (float): Maximum fraction of deleted chunks.
+
+        Returns:
+            bool: True if the index should be compacted.
+        """
+        if len(self.segments) > max_segments:
+            return True
+        return bool(
+            self.n_docs and len(self.deleted) / self.n_docs > max_deleted_ratio
+        )
+
+    def compacted(self) -> "TFIDFIndex":
+        """Merge all segments into one, dropping deleted chunks.
+
+        Document frequencies, IDF and row norms are recomputed, so the result
+        ranks exactly like an index built from scratch over the live chunks.
+
+        Returns:
+            TFIDFIndex: The compacted index. This index is left unchanged.
+        """
+        n_terms = len(self.vocabulary)
+        blocks, documents = [], []
+        for offset, segment in zip(self.offsets, self.segments):
+            ids = np.arange(segment.n_docs)
+            live = ids[~np.isin(ids + offset, self.deleted)]
+            block = segment.tf[live]
+            blocks.append(
+                sparse.csr_matrix(
+                    (block.data, block.indices, block.indptr),
+                    shape=(block.shape[0], n_terms),
+                )
+            )
+            documents.extend(segment.documents[int(i)] for i in live)
+        return TFIDFIndex.from_term_frequencies(
+            vocabulary=self.vocabulary,
+            tf=sparse.vstack(blocks, format="csr"),
+            documents=documents,
+            vectorizer_params=self.vectorizer_params,
+        )
+
+    def query_vector(self, query: str) -> sparse.csr_matrix:
+        """Transform a query into an L2-normalized TF-IDF row.
+
+        Args:
+            query (str): The query.
+
+        Returns:
+            sparse.csr_matrix: A 1 x n_terms matrix.
+        """
+        q = self.vectorizer.transform([query]).astype(np.float32)
+        q = q.multiply(self.idf.reshape(1, -1)).tocsr()
+        norm = np.sqrt((q.data**2).sum())
+        if norm > 0:
+            q.data /= norm
+        return q
+
+    def _document(self, doc_id: int) -> Document:
+        segment = int(np.searchsorted(self.offsets, doc_id, side="right")) - 1
+        return self.segments[segment].documents[
+            doc_id - int(self.offsets[segment])
+        ]
+
+    def _is_deleted(self, doc_id: int) -> bool:
+        position = np.searchsorted(self.deleted, doc_id)
+        return bool(
+            position < len(self.deleted) and self.deleted[position] == doc_id
+        )
+
+    def _candidate_scores(self, query: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Score the live chunks sharing at least one term with the query.
+
+        Only the postings lists of the query terms are read.
+
+        Args:
+            query (str): The query.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Candidate chunk ids and their cosine
+                similarity to the query.
+        """
+        empty = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        q = self.query_vector(query)
+        if q.nnz == 0:
+            return empty
+        weights = q.data * self.idf[q.indices]
+        rows, values = [], []
+        for offset, segment in zip(self.offsets, self.segments):
+            postings = segment.postings
+            for term, weight in zip(q.indices, weights):
+                if term >= segment.n_terms:
+                    continue
+                start, end = postings.indptr[term], postings.indptr[term + 1]
+                if start == end:
+                    continue
+                local = postings.indices[start:end]
+                rows.append(local.astype(np.int64) + offset)
+                values.append(
+                    postings.data[start:end] * weight / segment.norms[local]
+                )
+        if not rows:
+            return empty
+        candidates, inverse = np.unique(
+            np.concatenate(rows), return_inverse=True
+        )
+        scores = np.bincount(inverse, weights=np.concatenate(values))
+        if len(self.deleted):
+            live = ~np.isin(candidates, self.deleted, assume_unique=True)
+            candidates, scores = candidates[live], scores[live]
+        return candidates, scores
+
+    def search_with_scores(
+        self, query: str, k: int = 10
+    ) -> List[Tuple[Document, float]]:
+        """Return the `k` documents most similar to the query with their scores.
+
+        When fewer than `k` chunks share a term with the query, the result is
+        padded with zero-score chunks in index order, like a full scan would.
+
+        Args:
+            query (str): The search query.
+            k (int, optional): The number of results to return. Defaults to 10.
+
+        Returns:
+            List[Tuple[Document, float]]: Documents and cosine similarities,
+                sorted by decreasing similarity.
+        """
+        if k <= 0:
+            return []
+        return self._top_k(*self._candidate_scores(query), k)
+
+    def batch_search_with_scores(
+        self, queries: List[str], k: int = 10
+    ) -> List[List[Tuple[Document, float]]]:
+        """Run several queries at once.
+
+        All queries are transformed into one sparse matrix and scored with one
+        sparse matrix product per segment against the postings, which only
+        reads the postings of terms present in some query.
+
+        Args:
+            queries (List[str]): The search queries.
+            k (int, optional): The number of results per query. Defaults to 10.
+
+        Returns:
+            List[List[Tuple[Document, float]]]: The results of every query, in
+                the same order as `queries`.
+        """
+        if k <= 0 or not queries:
+            return [[] for _ in queries]
+        q = self.vectorizer.transform(queries).astype(np.float32)
+        q = q.multiply(self.idf.reshape(1, -1)).tocsr()
+        norms = np.sqrt(np.asarray(q.multiply(q).sum(axis=1)).ravel())
+        norms[norms == 0] = 1
+        # Normalize the queries, then weight them by the IDF of the chunks.
+        q = sparse.diags(1 / norms) @ q.multiply(self.idf.reshape(1, -1))
+        q = sparse.csr_matrix(q)
+
+        blocks = []
+        for segment in self.segments:
+            scores = q[:, : segment.n_terms] @ segment.postings.T
+            inverse_norms = np.zeros(segment.n_docs, dtype=np.float32)
+            np.divide(
+                1, segment.norms, out=inverse_norms, where=segment.norms > 0
+            )
+            blocks.append(
+                sparse.csr_matrix(
+                    scores.multiply(inverse_norms.reshape(1, -1))
+                )
+            )
+        scores = sparse.hstack(blocks, format="csr")
+
+        results = []
+        for i in range(len(queries)):
+            start, end = scores.indptr[i], scores.indptr[i + 1]
+            candidates = scores.indices[start:end].astype(np.int64)
+            row_scores = scores.data[start:end]
+            if len(self.deleted):
+                live = ~np.isin(candidates, self.deleted, assume_unique=True)
+                candidates, row_scores = candidates[live], row_scores[live]
+            results.append(self._top_k(candidates, row_scores, k))
+        return results
+
+    def _top_k(
+        self, candidates: np.ndarray, scores: np.ndarray, k: int
+    ) -> List[Tuple[Document, float]]:
+        """Select the `k` best candidates, padding with zero-score chunks."""
+        if len(candidates) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+            candidates, scores = candidates[top], scores[top]
+        order = np.lexsort((candidates, -scores))
+        results = [(int(candidates[i]), float(scores[i])) for i in order]
+
+        if len(results) < k:
+            selected = {doc_id for doc_id, _ in results}
+            doc_id = 0
+            while len(results) < k and doc_id < self.n_docs:
+                if doc_id not in selected and not self._is_deleted(doc_id):
+                    results.append((doc_id, 0.0))
+                doc_id += 1
+        return [(self._document(doc_id), score) for doc_id, score in results]
+
+    def search(self, query: str, k: int = 10) -> List[Document]:
+        """Return the `k` documents most similar to the query.
+
+        Args:
+            query (str): The search query.
+            k (int, optional): The number of results to return. Defaults to 10.
+
+        Returns:
+            List[Document]: Documents sorted by decreasing similarity.
+        """
+        return [doc for doc, _ in self.search_with_scores(query, k)]
@@ -1,12 +1,42 @@
 import os
-from typing import List, Tuple
+from typing import Any, Dict, List, Optional, Tuple, Union
 
+from dotenv import load_dotenv
 from fastapi import HTTPException, status
 from langchain_core.documents import Document
-from langchain_openai import OpenAIEmbeddings
-from langchain_postgres.vectorstores import PGVector
+from sqlalchemy import Select, asc, select
+from starlette.concurrency import run_in_threadpool
 
 from app.constants.openai_models import EmbeddingOpenAIModels
+from app.services.ann_index_service import (
+    distance_expression,
+    needs_rescoring,
+    search_settings,
+)
+from app.services.answer_cache import answer_cache, vector_namespace
+from app.services.embedding_config import (
+    EMBEDDING_METADATA_KEY,
+    build_embedding_config,
+    embedding_config,
+    same_storage,
+)
+from app.services.embedding_scheduler import create_embedding_scheduler
+from app.services.local_vector_service import LocalVectorService
+from app.services.vector_store_registry import (
+    COPY_BATCH_SIZE,
+    PooledPGVector,
+    normalize_database_url,
+    vector_store_registry,
+)
+
+load_dotenv(override=True)
+
+VECTOR_BACKENDS = ("pgvector", "local")
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "pgvector")
+# pgvector has no int8 type; binary quantization is its compact index.
+# Embeddings are stored at full precision: quantization selects the
+# expression of the collection's ANN index and has no effect without one.
+PGVECTOR_QUANTIZATIONS = ("none", "halfvec", "binary")
 
 
 class VectorService:
@@ -14,21 +44,82 @@ class VectorService:
         self,
         collection_name: str,
         embedding_model: EmbeddingOpenAIModels = EmbeddingOpenAIModels.TEXT_EMBEDDING_3_LARGE,
-        connection: str = os.getenv("DATABASE_URL"),
+        connection: Optional[str] = None,
+        vector_store: Optional[PooledPGVector] = None,
     ):
+        """
+        Initialize the vector service.
+
+        The application-wide store of the collection is reused unless a
+        different `connection` is given. Use `acreate` to get a service whose
+        `a*` methods run on the async engine.
+
+        Args:
+            collection_name (str): The collection (namespace) name.
+            embedding_model (EmbeddingOpenAIModels, optional): The embedding model.
+            connection (str, optional): A database URL other than `DATABASE_URL`.
+            vector_store (PooledPGVector, optional): An initialized store to use as is.
+
+        Raises:
+            HTTPException: If the vector store cannot be initialized.
+        """
+        self.collection_name = collection_name
+        self.embedding_model = embedding_model
+        try:
+            if vector_store is not None:
+                self.vector_store = vector_store
+            elif connection is None or (
+                normalize_database_url(connection)
+                == vector_store_registry.connection
+            ):
+                self.vector_store = vector_store_registry.get_store(
+                    collection_name, embedding_model
+                )
+            else:
+                self.vector_store = PooledPGVector(
+                    embeddings=vector_store_registry.get_embeddings(
+                        embedding_model
+                    ),
+                    collection_name=collection_name,
+                    connection=normalize_database_url(connection),
+                    use_jsonb=True,
+                )
+            self.embeddings = self.vector_store.embeddings
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Error at initializing the vector store: {e}",
+            )
+
+    @classmethod
+    async def acreate(
+        cls,
+        collection_name: str,
+        embedding_model: EmbeddingOpenAIModels = EmbeddingOpenAIModels.TEXT_EMBEDDING_3_LARGE,
+    ) -> "VectorService":
+        """
+        Create a vector service backed by the shared async store of a collection.
+
+        Args:
+            collection_name (str): The collection (namespace) name.
+            embedding_model (EmbeddingOpenAIModels, optional): The embedding model.
+
+        Returns:
+            VectorService: A service for the async `a*` methods.
+
+        Raises:
+            HTTPException: If the vector store cannot be initialized.
+        """
         try:
-            self.embeddings = OpenAIEmbeddings(model=embedding_model)
-            self.vector_store = PGVector(
-                embeddings=self.embeddings,
-                collection_name=collection_name,
-                connection=connection,
-                use_jsonb=True,
+            vector_store = await vector_store_registry.aget_store(
+                collection_name, embedding_model
             )
         except Exception as e:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Error at initializing the vector store: {e}",
             )
+        return cls(collection_name, embedding_model, vector_store=vector_store)
 
     def index_documents(
         self, documents: List[Document], ids: List = None
@@ -37,6 +128,46 @@ class VectorService:
             if not ids:
                 ids = [doc.metadata.get("id") for doc in documents]
             self.vector_store.add_documents(documents, ids=ids)
+            answer_cache.invalidate(vector_namespace(self.collection_name))
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Error at indexing the documents: {e}",
+            )
+
+    def bulk_index_documents(
+        self,
+        documents: List[Document],
+        ids: List = None,
+        batch_size: int = COPY_BATCH_SIZE,
+    ) -> List[str]:
+        """
+        Index documents through binary `COPY` instead of ORM inserts.
+
+        Meant for large collections, where the database write is the
+        bottleneck once the embeddings are cached.
+
+        Args:
+            documents (List[Document]): The documents to index.
+            ids (List, optional): Document identifiers. Defaults to the `id` metadata.
+            batch_size (int, optional): Rows written per transaction.
+
+        Returns:
+            List[str]: The ids of the indexed documents.
+        """
+        try:
+            if not ids:
+                ids = [doc.metadata.get("id") for doc in documents]
+            texts = [doc.page_content for doc in documents]
+            ids = self.vector_store.bulk_add_embeddings(
+                texts=texts,
+                embeddings=self.embeddings.embed_documents(texts),
+                metadatas=[doc.metadata for doc in documents],
+                ids=ids,
+                batch_size=batch_size,
+            )
+            answer_cache.invalidate(vector_namespace(self.collection_name))
+            return ids
         except Exception as e:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -44,15 +175,24 @@ class VectorService:
             )
 
     def search(
-        self, query: str, k: int = 10, filter_params: dict = None
+        self,
+        query: str,
+        k: int = 10,
+        filter_params: dict = None,
+        ef_search: Optional[int] = None,
+        probes: Optional[int] = None,
     ) -> List[Document]:
         try:
-            if filter_params:
-                return self.vector_store.similarity_search(
-                    query, k=k, filter=filter_params
-                )
-            else:
-                return self.vector_store.similarity_search(query, k=k)
+            return [
+                doc
+                for doc, _ in self._search_by_vectors(
+                    [self.embeddings.embed_query(query)],
+                    k,
+                    filter_params,
+                    ef_search,
+                    probes,
+                )[0]
+            ]
         except Exception as e:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -60,7 +200,12 @@ class VectorService:
             )
 
     def search_with_score(
-        self, query: str, k: int = 10, filter_params: dict = None
+        self,
+        query: str,
+        k: int = 10,
+        filter_params: dict = None,
+        ef_search: Optional[int] = None,
+        probes: Optional[int] = None,
     ) -> List[Tuple[Document, float]]:
         """
         Perform a similarity search and return documents with their similarity scores.
@@ -69,25 +214,265 @@ class VectorService:
             query (str): The query string.
             k (int, optional): The number of results to return. Defaults to 10.
             filter_params (dict, optional): Filters to apply on document metadata.
+            ef_search (int, optional): HNSW candidate list size for this query.
+            probes (int, optional): IVFFlat lists scanned for this query.
 
         Returns:
             List[Tuple[Document, float]]: Tuples of documents and their similarity scores.
         """
         try:
-            if filter_params:
-                return self.vector_store.similarity_search_with_score(
-                    query, k=k, filter=filter_params
-                )
-            else:
-                return self.vector_store.similarity_search_with_score(
-                    query, k=k
-                )
+            return self._search_by_vectors(
+                [self.embeddings.embed_query(query)],
+                k,
+                filter_params,
+                ef_search,
+                probes,
+            )[0]
         except Exception as e:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"An error occurred during search with score: {e}",
             )
 
+    def batch_search_with_score(
+        self,
+        queries: List[str],
+        k: int = 10,
+        filter_params: dict = None,
+        ef_search: Optional[int] = None,
+        probes: Optional[int] = None,
+    ) -> List[List[Tuple[Document, float]]]:
+        """
+        Perform a similarity search for several queries at once.
+
+        The queries are embedded with a single embeddings call and searched
+        over one database session instead of one round trip pair per query.
+
+        Args:
+            queries (List[str]): The query strings.
+            k (int, optional): The number of results per query. Defaults to 10.
+            filter_params (dict, optional): Filters to apply on document metadata.
+            ef_search (int, optional): HNSW candidate list size for these queries.
+            probes (int, optional): IVFFlat lists scanned for these queries.
+
+        Returns:
+            List[List[Tuple[Document, float]]]: Documents and their scores for
+                each query, in the same order as `queries`.
+        """
+        if not queries:
+            return []
+        try:
+            return self._search_by_vectors(
+                self.embeddings.embed_documents(queries),
+                k,
+                filter_params,
+                ef_search,
+                probes,
+            )
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"An error occurred during batch search: {e}",
+            )
+
+    def _search_by_vectors(
+        self,
+        embeddings: List[List[float]],
+        k: int,
+        filter_params: Optional[dict],
+        ef_search: Optional[int],
+        probes: Optional[int],
+    ) -> List[List[Tuple[Document, float]]]:
+        """Search every embedding over one session."""
+        store = self.vector_store
+        with store._make_sync_session() as session:
+            collection = store.get_collection(session)
+            if not collection:
+                raise ValueError("Collection not found")
+            for statement in search_settings(ef_search, probes):
+                session.execute(statement)
+            return [
+                store._results_to_docs_and_scores(
+                    session.execute(
+                        self._query_statement(
+                            collection, embedding, k, filter_params
+                        )
+                    ).all()
+                )
+                for embedding in embeddings
+            ]
+
+    async def _asearch_by_vectors(
+        self,
+        embeddings: List[List[float]],
+        k: int,
+        filter_params: Optional[dict],
+        ef_search: Optional[int],
+        probes: Optional[int],
+    ) -> List[List[Tuple[Document, float]]]:
+        """Async version of `_search_by_vectors`."""
+        store = self.vector_store
+        async with store._make_async_session() as session:
+            collection = await store.aget_collection(session)
+            if not collection:
+                raise ValueError("Collection not found")
+            for statement in search_settings(ef_search, probes):
+                await session.execute(statement)
+            results = []
+            for embedding in embeddings:
+                rows = await session.execute(
+                    self._query_statement(
+                        collection, embedding, k, filter_params
+                    )
+                )
+                results.append(store._results_to_docs_and_scores(rows.all()))
+            return results
+
+    def _query_statement(
+        self,
+        collection: Any,
+        embedding: List[float],
+        k: int,
+        filter_params: Optional[dict],
+    ) -> Select:
+        """Build the similarity query for one embedding.
+
+        Uses the collection's ANN index, if any, through the same cast
+        expression the index was built on. When that expression is lossy
+        (halfvec or binary quantization), the `k * rescore_factor` best
+        candidates are re-ranked by their full precision distance. Without
+        an ANN index the search is exact on the stored vectors.
+        """
+        store = self.vector_store
+        filter_by = [store.EmbeddingStore.collection_id == collection.uuid]
+        if filter_params:
+            filter_by.append(store._create_filter_clause(filter_params))
+        distance = distance_expression(store, collection, embedding)
+        if not needs_rescoring(collection):
+            return (
+                select(store.EmbeddingStore, distance.label("distance"))
+                .filter(*filter_by)
+                .order_by(asc("distance"))
+                .limit(k)
+            )
+        rescore_factor = embedding_config(collection.cmetadata)[
+            "rescore_factor"
+        ]
+        candidates = (
+            select(store.EmbeddingStore.id)
+            .filter(*filter_by)
+            .order_by(asc(distance))
+            .limit(k * rescore_factor)
+            .scalar_subquery()
+        )
+        return (
+            select(
+                store.EmbeddingStore,
+                store.distance_strategy(embedding).label("distance"),
+            )
+            .filter(store.EmbeddingStore.id.in_(candidates))
+            .order_by(asc("distance"))
+            .limit(k)
+        )
+
+    def _record_embedding_config(self, config: Dict[str, Any]) -> None:
+        """Record embedding settings unless they change stored vectors."""
+        current = embedding_config(
+            vector_store_registry.get_collection_metadata(self.collection_name)
+        )
+        if current == {**current, **config}:
+            return
+        if not same_storage(
+            current, config
+        ) and vector_store_registry.count_embeddings(self.collection_name):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=(
+                    f"Collection {self.collection_name} already has embeddings "
+                    "with other dimensions or quantization"
+                ),
+            )
+        vector_store_registry.set_collection_metadata(
+            self.collection_name, EMBEDDING_METADATA_KEY, config
+        )
+
+    def configure(
+        self,
+        dimensions: Optional[int] = None,
+        quantization: Optional[str] = None,
+        rescore_factor: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """
+        Set the embedding dimensions and quantization of the collection.
+
+        The settings are recorded in the collection metadata, so every store
+        of the collection embeds and searches with them. Dimensions and
+        quantization can only change while the collection is empty. Applies
+        to collections of `DATABASE_URL`.
+
+        Embeddings are always stored at full precision (reduced dimensions
+        do shrink them). Quantization only takes effect once an ANN index is
+        built, which then indexes the halfvec or binary quantized vectors
+        and rescores its candidates; until then searches are exact.
+
+        Args:
+            dimensions (int, optional): Reduced embedding dimensions
+                (text-embedding-3 models only). Defaults to the native size.
+            quantization (str, optional): `none`, `halfvec`, or `binary`,
+                used by the ANN index.
+            rescore_factor (int, optional): With quantization, how many
+                candidates per result are rescored at full precision.
+
+        Returns:
+            Dict[str, Any]: The recorded settings.
+
+        Raises:
+            HTTPException: If the settings are invalid or the collection
+                already has embeddings stored differently.
+        """
+        config = build_embedding_config(
+            self.embedding_model,
+            dimensions,
+            quantization,
+            rescore_factor,
+            PGVECTOR_QUANTIZATIONS,
+        )
+        self._record_embedding_config(config)
+        self.vector_store = vector_store_registry.get_store(
+            self.collection_name, self.embedding_model
+        )
+        self.embeddings = self.vector_store.embeddings
+        return config
+
+    def batch_search(
+        self,
+        queries: List[str],
+        k: int = 10,
+        filter_params: dict = None,
+        ef_search: Optional[int] = None,
+        probes: Optional[int] = None,
+    ) -> List[List[Document]]:
+        """
+        Perform a similarity search for several queries at once.
+
+        Args:
+            queries (List[str]): The query strings.
+            k (int, optional): The number of results per query. Defaults to 10.
+            filter_params (dict, optional): Filters to apply on document metadata.
+            ef_search (int, optional): HNSW candidate list size for these queries.
+            probes (int, optional): IVFFlat lists scanned for these queries.
+
+        Returns:
+            List[List[Document]]: Documents for each query, in the same order
+                as `queries`.
+        """
+        return [
+            [doc for doc, _ in results]
+            for results in self.batch_search_with_score(
+                queries, k, filter_params, ef_search, probes
+            )
+        ]
+
     def delete_documents(self, ids: List) -> None:
         """
         Deletes documents from the vector store using their IDs.
@@ -97,8 +482,289 @@ class VectorService:
         """
         try:
             self.vector_store.delete(ids=ids)
+            answer_cache.invalidate(vector_namespace(self.collection_name))
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Error deleting documents: {e}",
+            )
+
+    async def aindex_documents(
+        self, documents: List[Document], ids: List = None
+    ) -> Dict[str, Any]:
+        """
+        Async version of `index_documents`. Requires a service from `acreate`.
+
+        Chunks are embedded by the `EmbeddingScheduler`, several token-bounded
+        batches at a time within the API rate limits, and every batch is
+        written with binary `COPY` as soon as its embeddings arrive.
+
+        Args:
+            documents (List[Document]): The documents to index.
+            ids (List, optional): Document identifiers. Defaults to the `id` metadata.
+
+        Returns:
+            Dict[str, Any]: Embedding throughput of the job.
+        """
+        try:
+            if not ids:
+                ids = [doc.metadata.get("id") for doc in documents]
+            texts = [doc.page_content for doc in documents]
+            metadatas = [doc.metadata for doc in documents]
+
+            async def store(
+                batch: List[int], vectors: List[List[float]]
+            ) -> None:
+                await self.vector_store.abulk_add_embeddings(
+                    texts=[texts[i] for i in batch],
+                    embeddings=vectors,
+                    metadatas=[metadatas[i] for i in batch],
+                    ids=[ids[i] for i in batch],
+                )
+
+            scheduler = create_embedding_scheduler(self.embeddings)
+            stats = await scheduler.run(texts, store)
+            await run_in_threadpool(
+                answer_cache.invalidate, vector_namespace(self.collection_name)
+            )
+            return stats
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Error at indexing the documents: {e}",
+            )
+
+    async def asearch(
+        self,
+        query: str,
+        k: int = 10,
+        filter_params: dict = None,
+        ef_search: Optional[int] = None,
+        probes: Optional[int] = None,
+    ) -> List[Document]:
+        """
+        Async version of `search`. Requires a service from `acreate`.
+
+        Args:
+            query (str): The query string.
+            k (int, optional): The number of results to return. Defaults to 10.
+            filter_params (dict, optional): Filters to apply on document metadata.
+            ef_search (int, optional): HNSW candidate list size for this query.
+            probes (int, optional): IVFFlat lists scanned for this query.
+
+        Returns:
+            List[Document]: The most similar documents.
+        """
+        try:
+            results = await self._asearch_by_vectors(
+                [await self.embeddings.aembed_query(query)],
+                k,
+                filter_params,
+                ef_search,
+                probes,
+            )
+            return [doc for doc, _ in results[0]]
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"An error occurred while searching documents: {e}",
+            )
+
+    async def asearch_with_score(
+        self,
+        query: str,
+        k: int = 10,
+        filter_params: dict = None,
+        ef_search: Optional[int] = None,
+        probes: Optional[int] = None,
+    ) -> List[Tuple[Document, float]]:
+        """
+        Async version of `search_with_score`. Requires a service from `acreate`.
+
+        Args:
+            query (str): The query string.
+            k (int, optional): The number of results to return. Defaults to 10.
+            filter_params (dict, optional): Filters to apply on document metadata.
+            ef_search (int, optional): HNSW candidate list size for this query.
+            probes (int, optional): IVFFlat lists scanned for this query.
+
+        Returns:
+            List[Tuple[Document, float]]: Tuples of documents and their similarity scores.
+        """
+        try:
+            results = await self._asearch_by_vectors(
+                [await self.embeddings.aembed_query(query)],
+                k,
+                filter_params,
+                ef_search,
+                probes,
+            )
+            return results[0]
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"An error occurred during search with score: {e}",
+            )
+
+    async def abatch_search_with_score(
+        self,
+        queries: List[str],
+        k: int = 10,
+        filter_params: dict = None,
+        ef_search: Optional[int] = None,
+        probes: Optional[int] = None,
+    ) -> List[List[Tuple[Document, float]]]:
+        """
+        Async version of `batch_search_with_score`. Requires a service from `acreate`.
+
+        Args:
+            queries (List[str]): The query strings.
+            k (int, optional): The number of results per query. Defaults to 10.
+            filter_params (dict, optional): Filters to apply on document metadata.
+            ef_search (int, optional): HNSW candidate list size for these queries.
+            probes (int, optional): IVFFlat lists scanned for these queries.
+
+        Returns:
+            List[List[Tuple[Document, float]]]: Documents and their scores for
+                each query, in the same order as `queries`.
+        """
+        if not queries:
+            return []
+        try:
+            return await self._asearch_by_vectors(
+                await self.embeddings.aembed_documents(queries),
+                k,
+                filter_params,
+                ef_search,
+                probes,
+            )
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"An error occurred during batch search: {e}",
+            )
+
+    async def abatch_search(
+        self,
+        queries: List[str],
+        k: int = 10,
+        filter_params: dict = None,
+        ef_search: Optional[int] = None,
+        probes: Optional[int] = None,
+    ) -> List[List[Document]]:
+        """
+        Async version of `batch_search`. Requires a service from `acreate`.
+
+        Args:
+            queries (List[str]): The query strings.
+            k (int, optional): The number of results per query. Defaults to 10.
+            filter_params (dict, optional): Filters to apply on document metadata.
+            ef_search (int, optional): HNSW candidate list size for these queries.
+            probes (int, optional): IVFFlat lists scanned for these queries.
+
+        Returns:
+            List[List[Document]]: Documents for each query, in the same order
+                as `queries`.
+        """
+        return [
+            [doc for doc, _ in results]
+            for results in await self.abatch_search_with_score(
+                queries, k, filter_params, ef_search, probes
+            )
+        ]
+
+    async def aconfigure(
+        self,
+        dimensions: Optional[int] = None,
+        quantization: Optional[str] = None,
+        rescore_factor: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """
+        Async version of `configure`. Requires a service from `acreate`.
+
+        Args:
+            dimensions (int, optional): Reduced embedding dimensions.
+            quantization (str, optional): `none`, `halfvec`, or `binary`.
+            rescore_factor (int, optional): Candidates rescored per result.
+
+        Returns:
+            Dict[str, Any]: The recorded settings.
+        """
+        config = build_embedding_config(
+            self.embedding_model,
+            dimensions,
+            quantization,
+            rescore_factor,
+            PGVECTOR_QUANTIZATIONS,
+        )
+        await run_in_threadpool(self._record_embedding_config, config)
+        self.vector_store = await vector_store_registry.aget_store(
+            self.collection_name, self.embedding_model
+        )
+        self.embeddings = self.vector_store.embeddings
+        return config
+
+    async def adelete_documents(self, ids: List) -> None:
+        """
+        Async version of `delete_documents`. Requires a service from `acreate`.
+
+        Args:
+            ids (List): List of document identifiers to delete.
+        """
+        try:
+            await self.vector_store.adelete(ids=ids)
+            await run_in_threadpool(
+                answer_cache.invalidate, vector_namespace(self.collection_name)
+            )
         except Exception as e:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Error deleting documents: {e}",
             )
+
+
+def _backend_service_class():
+    if VECTOR_BACKEND == "local":
+        return LocalVectorService
+    if VECTOR_BACKEND == "pgvector":
+        return VectorService
+    raise ValueError(
+        f"VECTOR_BACKEND must be one of {', '.join(VECTOR_BACKENDS)}, "
+        f"got {VECTOR_BACKEND}"
+    )
+
+
+def create_vector_service(
+    collection_name: str,
+    embedding_model: EmbeddingOpenAIModels = EmbeddingOpenAIModels.TEXT_EMBEDDING_3_LARGE,
+) -> Union[VectorService, LocalVectorService]:
+    """
+    Create the vector service of the configured `VECTOR_BACKEND`.
+
+    Args:
+        collection_name (str): The collection (namespace) name.
+        embedding_model (EmbeddingOpenAIModels, optional): The embedding model.
+
+    Returns:
+        Union[VectorService, LocalVectorService]: The service of the collection.
+    """
+    return _backend_service_class()(collection_name, embedding_model)
+
+
+async def acreate_vector_service(
+    collection_name: str,
+    embedding_model: EmbeddingOpenAIModels = EmbeddingOpenAIModels.TEXT_EMBEDDING_3_LARGE,
+) -> Union[VectorService, LocalVectorService]:
+    """
+    Async version of `create_vector_service`, for the async `a*` methods.
+
+    Args:
+        collection_name (str): The collection (namespace) name.
+        embedding_model (EmbeddingOpenAIModels, optional): The embedding model.
+
+    Returns:
+        Union[VectorService, LocalVectorService]: The service of the collection.
+    """
+    return await _backend_service_class().acreate(
+        collection_name, embedding_model
+    )
@@ -0,0 +1,650 @@
+# app/services/vector_store_registry.py
+import asyncio
+import os
+import threading
+import uuid
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from dotenv import load_dotenv
+from langchain_core.embeddings import Embeddings
+from langchain_openai import OpenAIEmbeddings
+from langchain_postgres.vectorstores import (
+    Base,
+    PGVector,
+    _create_vector_extension,
+    _get_embedding_collection_store,
+)
+from pgvector.psycopg import register_vector, register_vector_async
+from sqlalchemy import create_engine, func, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    create_async_engine,
+)
+from sqlalchemy.orm import Session
+
+from app.constants.openai_models import EmbeddingOpenAIModels
+from app.services.embedding_cache import CachedEmbeddings, embedding_cache
+from app.services.embedding_config import embedding_config
+from app.utils.logger import logger
+
+load_dotenv(override=True)
+
+COPY_BATCH_SIZE = int(os.getenv("VECTOR_COPY_BATCH_SIZE", 5000))
+COPY_COLUMNS = ("id", "collection_id", "embedding", "document", "cmetadata")
+COPY_TYPES = ("varchar", "uuid", "vector", "varchar", "jsonb")
+STAGING_TABLE = "_langchain_pg_embedding_copy"
+# Metadata keys with a (collection_id, cmetadata->>key) expression index.
+METADATA_INDEX_KEYS = tuple(
+    key.strip()
+    for key in os.getenv("VECTOR_METADATA_INDEX_KEYS", "file_name,page").split(
+        ","
+    )
+    if key.strip()
+)
+
+
+def metadata_index_statements(
+    keys: Sequence[str] = METADATA_INDEX_KEYS,
+) -> List[str]:
+    """Build the statements creating the metadata expression indexes.
+
+    Filters on `$in`, `$nin`, `$like` and `$ilike` compare
+    `cmetadata->>key`, so these indexes serve them within a collection.
+    Equality filters use the `ix_cmetadata_gin` index created by PGVector.
+
+    Args:
+        keys (Sequence[str], optional): The indexed metadata keys.
+
+    Returns:
+        List[str]: One `CREATE INDEX CONCURRENTLY IF NOT EXISTS` per key.
+
+    Raises:
+        ValueError: If a key is not a valid identifier.
+    """
+    statements = []
+    for key in keys:
+        if not key.isidentifier():
+            raise ValueError(f"Invalid metadata index key: {key}")
+        statements.append(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS "
+            f"ix_embedding_metadata_{key.lower()} ON langchain_pg_embedding "
+            f"(collection_id, (cmetadata->>'{key}'))"
+        )
+    return statements
+
+
+def normalize_database_url(url: str) -> str:
+    """Make a Postgres URL use the psycopg 3 driver required by PGVector.
+
+    Args:
+        url (str): A `postgres://`, `postgresql://` or driver-qualified URL.
+
+    Returns:
+        str: The URL with the `postgresql+psycopg` scheme.
+    """
+    for scheme in ("postgres://", "postgresql://"):
+        if url.startswith(scheme):
+            return "postgresql+psycopg://" + url[len(scheme) :]
+    return url
+
+
+class PooledPGVector(PGVector):
+    """PGVector store meant to live for the whole application.
+
+    The collection row is looked up once and kept. Later lookups only
+    re-read its `cmetadata` by primary key, so the embedding, quantization
+    and ANN index settings changed by another worker are seen on the next
+    query. Table creation is skipped when the registry already did it at
+    startup. Both sync and async engines are supported.
+
+    Scalar equality filters are written as JSONB containment, which the
+    GIN index on `cmetadata` serves, instead of `jsonb_path_match` calls
+    that the planner cannot push into an index.
+    """
+
+    def __init__(
+        self,
+        *args: Any,
+        skip_table_setup: bool = False,
+        on_collection_change: Optional[
+            Callable[["PooledPGVector", Any], None]
+        ] = None,
+        **kwargs,
+    ):
+        """Initialize the store.
+
+        Args:
+            skip_table_setup (bool, optional): Skip creating the tables.
+            on_collection_change (Optional[Callable], optional): Called with
+                the store and the collection row when the row is loaded or
+                its `cmetadata` changed.
+        """
+        self._skip_table_setup = skip_table_setup
+        self._on_collection_change = on_collection_change
+        self._collection = None
+        super().__init__(*args, **kwargs)
+
+    def create_tables_if_not_exists(self) -> None:
+        if not self._skip_table_setup:
+            super().create_tables_if_not_exists()
+
+    async def acreate_tables_if_not_exists(self) -> None:
+        if not self._skip_table_setup:
+            await super().acreate_tables_if_not_exists()
+
+    def _metadata_statement(self) -> Any:
+        return select(self.CollectionStore.cmetadata).filter(
+            self.CollectionStore.uuid == self._collection.uuid
+        )
+
+    def _refresh_collection(self, row: Any) -> None:
+        """Update the cached row with the `cmetadata` read from the table."""
+        if row is None:
+            # Deleted, possibly recreated under a new uuid, by another worker.
+            self._collection = None
+        elif row.cmetadata != self._collection.cmetadata:
+            self._collection.cmetadata = row.cmetadata
+            self._collection_changed()
+
+    def _collection_changed(self) -> None:
+        if self._on_collection_change is not None:
+            self._on_collection_change(self, self._collection)
+
+    def get_collection(self, session: Session) -> Any:
+        if self._collection is not None:
+            row = session.execute(self._metadata_statement()).first()
+            self._refresh_collection(row)
+        if self._collection is None:
+            collection = super().get_collection(session)
+            if collection is None:
+                return None
+            # Detach it so commits of the session don't expire the cached row.
+            session.expunge(collection)
+            self._collection = collection
+            self._collection_changed()
+        return self._collection
+
+    async def aget_collection(self, session: AsyncSession) -> Any:
+        if self._collection is not None:
+            row = (await session.execute(self._metadata_statement())).first()
+            self._refresh_collection(row)
+        if self._collection is None:
+            collection = await super().aget_collection(session)
+            if collection is None:
+                return None
+            session.expunge(collection)
+            self._collection = collection
+            self._collection_changed()
+        return self._collection
+
+    def _handle_field_filter(self, field: str, value: Any) -> Any:
+        operator, operand = "$eq", value
+        if isinstance(value, dict) and len(value) == 1:
+            operator, operand = next(iter(value.items()))
+        if (
+            operator == "$eq"
+            and field.isidentifier()
+            and not field.startswith("$")
+            and (operand is None or isinstance(operand, (str, int, float)))
+        ):
+            return self.EmbeddingStore.cmetadata.contains({field: operand})
+        return super()._handle_field_filter(field, value)
+
+    def delete_collection(self) -> None:
+        super().delete_collection()
+        self._collection = None
+
+    async def adelete_collection(self) -> None:
+        await super().adelete_collection()
+        self._collection = None
+
+    def _copy_rows(
+        self,
+        collection_id: uuid.UUID,
+        texts: Sequence[str],
+        embeddings: List[List[float]],
+        metadatas: Optional[List[dict]],
+        ids: Optional[List[Optional[str]]],
+    ) -> List[Tuple[str, uuid.UUID, List[float], str, dict]]:
+        ids = ids or [None] * len(texts)
+        metadatas = metadatas or [{}] * len(texts)
+        return [
+            (id or str(uuid.uuid4()), collection_id, embedding, text, metadata)
+            for id, text, embedding, metadata in zip(
+                ids, texts, embeddings, metadatas
+            )
+        ]
+
+    def _copy_statements(self) -> Tuple[str, str, str]:
+        table = self.EmbeddingStore.__tablename__
+        columns = ", ".join(COPY_COLUMNS)
+        updates = ", ".join(
+            f"{column} = EXCLUDED.{column}" for column in COPY_COLUMNS[1:]
+        )
+        return (
+            f"CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE} "
+            f"(LIKE {table} INCLUDING DEFAULTS) ON COMMIT DELETE ROWS",
+            f"COPY {STAGING_TABLE} ({columns}) FROM STDIN (FORMAT BINARY)",
+            f"INSERT INTO {table} ({columns}) "
+            f"SELECT {columns} FROM {STAGING_TABLE} "
+            f"ON CONFLICT (id) DO UPDATE SET {updates}",
+        )
+
+    def bulk_add_embeddings(
+        self,
+        texts: Sequence[str],
+        embeddings: List[List[float]],
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[Optional[str]]] = None,
+        batch_size: int = COPY_BATCH_SIZE,
+    ) -> List[str]:
+        """Insert embeddings with binary `COPY`, one transaction per batch.
+
+        Rows are copied into a temporary staging table and then upserted, so
+        existing ids are updated like `add_embeddings` does.
+
+        Args:
+            texts (Sequence[str]): The texts.
+            embeddings (List[List[float]]): One vector per text.
+            metadatas (Optional[List[dict]], optional): One metadata dict per text.
+            ids (Optional[List[Optional[str]]], optional): Ids, generated when missing.
+            batch_size (int, optional): Rows per transaction.
+
+        Returns:
+            List[str]: The ids of the inserted rows.
+        """
+        with self._make_sync_session() as session:
+            collection = self.get_collection(session)
+        if not collection:
+            raise ValueError("Collection not found")
+        rows = self._copy_rows(
+            collection.uuid, texts, embeddings, metadatas, ids
+        )
+        create, copy_rows, upsert = self._copy_statements()
+        for start in range(0, len(rows), batch_size):
+            with self._engine.begin() as conn:
+                driver = conn.connection.driver_connection
+                if not conn.connection.info.get("vector_registered"):
+                    register_vector(driver)
+                    conn.connection.info["vector_registered"] = True
+                with driver.cursor() as cursor:
+                    cursor.execute(create)
+                    with cursor.copy(copy_rows) as copy:
+                        copy.set_types(COPY_TYPES)
+                        for row in rows[start : start + batch_size]:
+                            copy.write_row(row)
+                    cursor.execute(upsert)
+        return [row[0] for row in rows]
+
+    async def abulk_add_embeddings(
+        self,
+        texts: Sequence[str],
+        embeddings: List[List[float]],
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[Optional[str]]] = None,
+        batch_size: int = COPY_BATCH_SIZE,
+    ) -> List[str]:
+        """Async version of `bulk_add_embeddings`."""
+        async with self._make_async_session() as session:
+            collection = await self.aget_collection(session)
+        if not collection:
+            raise ValueError("Collection not found")
+        rows = self._copy_rows(
+            collection.uuid, texts, embeddings, metadatas, ids
+        )
+        create, copy_rows, upsert = self._copy_statements()
+        for start in range(0, len(rows), batch_size):
+            async with self._async_engine.begin() as conn:
+                raw = await conn.get_raw_connection()
+                driver = raw.driver_connection
+                if not raw.info.get("vector_registered"):
+                    await register_vector_async(driver)
+                    raw.info["vector_registered"] = True
+                async with driver.cursor() as cursor:
+                    await cursor.execute(create)
+                    async with cursor.copy(copy_rows) as copy:
+                        copy.set_types(COPY_TYPES)
+                        for row in rows[start : start + batch_size]:
+                            await copy.write_row(row)
+                    await cursor.execute(upsert)
+        return [row[0] for row in rows]
+
+
+class VectorStoreRegistry:
+    """Application-scoped PGVector stores sharing one pooled engine.
+
+    Stores and embedding clients are created once per collection and model and
+    reused by every request. The pgvector extension and the tables are created
+    once by `setup` at startup rather than on every request. Async stores,
+    used by the async routes, share a separate async engine with the same
+    pool settings.
+    """
+
+    def __init__(
+        self,
+        connection: Optional[str],
+        pool_size: int = 5,
+        max_overflow: int = 10,
+        pool_timeout: int = 30,
+        pool_recycle: int = 1800,
+    ):
+        """Initialize the registry. The engine is created on first use.
+
+        Args:
+            connection (Optional[str]): The database URL.
+            pool_size (int, optional): Connections kept open in the pool.
+            max_overflow (int, optional): Extra connections allowed under load.
+            pool_timeout (int, optional): Seconds to wait for a free connection.
+            pool_recycle (int, optional): Seconds after which connections are recycled.
+        """
+        self.connection = normalize_database_url(connection or "")
+        self.engine_args = {
+            "pool_size": pool_size,
+            "max_overflow": max_overflow,
+            "pool_timeout": pool_timeout,
+            "pool_recycle": pool_recycle,
+            "pool_pre_ping": True,
+        }
+        self._engine: Optional[Engine] = None
+        self._async_engine: Optional[AsyncEngine] = None
+        self._embeddings: Dict[Tuple[str, Optional[int]], Embeddings] = {}
+        self._stores: Dict[Tuple[str, str], PooledPGVector] = {}
+        self._async_stores: Dict[Tuple[str, str], PooledPGVector] = {}
+        self._lock = threading.RLock()
+        self._async_lock: Optional[asyncio.Lock] = None
+        self._tables_ready = False
+
+    @property
+    def engine(self) -> Engine:
+        """The shared SQLAlchemy engine."""
+        with self._lock:
+            if self._engine is None:
+                if not self.connection:
+                    raise ValueError("DATABASE_URL is not configured")
+                self._engine = create_engine(
+                    self.connection, **self.engine_args
+                )
+            return self._engine
+
+    @property
+    def async_engine(self) -> AsyncEngine:
+        """The shared async SQLAlchemy engine."""
+        with self._lock:
+            if self._async_engine is None:
+                if not self.connection:
+                    raise ValueError("DATABASE_URL is not configured")
+                self._async_engine = create_async_engine(
+                    self.connection, **self.engine_args
+                )
+            return self._async_engine
+
+    def setup(self) -> None:
+        """Create the pgvector extension and the tables if needed."""
+        with self._lock:
+            if self._tables_ready:
+                return
+            with self.engine.connect() as conn:
+                _create_vector_extension(conn)
+            _get_embedding_collection_store()
+            Base.metadata.create_all(self.engine)
+            with self.engine.connect().execution_options(
+                isolation_level="AUTOCOMMIT"
+            ) as conn:
+                for statement in metadata_index_statements():
+                    conn.execute(text(statement))
+            self._tables_ready = True
+            logger.info("Vector store tables are ready")
+
+    def get_embeddings(
+        self,
+        embedding_model: EmbeddingOpenAIModels = EmbeddingOpenAIModels.TEXT_EMBEDDING_3_LARGE,
+        dimensions: Optional[int] = None,
+    ) -> Embeddings:
+        """Return the shared embeddings client of a model.
+
+        Args:
+            embedding_model (EmbeddingOpenAIModels, optional): The embedding model.
+            dimensions (Optional[int], optional): Reduced output dimensions.
+                Defaults to the native dimensions of the model.
+
+        Returns:
+            Embeddings: The client, wrapped by the embedding cache when enabled.
+        """
+        key = (embedding_model, dimensions)
+        with self._lock:
+            embeddings = self._embeddings.get(key)
+            if embeddings is None:
+                embeddings = OpenAIEmbeddings(
+                    model=embedding_model, dimensions=dimensions
+                )
+                if embedding_cache.enabled:
+                    embeddings = CachedEmbeddings(embeddings, embedding_cache)
+                self._embeddings[key] = embeddings
+            return embeddings
+
+    def _configure_store(
+        self,
+        store: PooledPGVector,
+        collection: Any,
+        embedding_model: EmbeddingOpenAIModels,
+    ) -> None:
+        """Embed with the dimensions recorded on the collection.
+
+        Called by the store whenever it loads the collection row or sees its
+        metadata change.
+        """
+        store.embedding_function = self.get_embeddings(
+            embedding_model,
+            embedding_config(collection.cmetadata)["dimensions"],
+        )
+
+    def get_store(
+        self,
+        collection_name: str,
+        embedding_model: EmbeddingOpenAIModels = EmbeddingOpenAIModels.TEXT_EMBEDDING_3_LARGE,
+    ) -> PooledPGVector:
+        """Return the store of a collection, creating it on first use.
+
+        Args:
+            collection_name (str): The collection name.
+            embedding_model (EmbeddingOpenAIModels, optional): The embedding model.
+
+        Returns:
+            PooledPGVector: The shared store.
+        """
+        key = (collection_name, embedding_model)
+        with self._lock:
+            store = self._stores.get(key)
+            if store is None:
+                store = PooledPGVector(
+                    embeddings=self.get_embeddings(embedding_model),
+                    collection_name=collection_name,
+                    connection=self.engine,
+                    use_jsonb=True,
+                    create_extension=not self._tables_ready,
+                    skip_table_setup=self._tables_ready,
+                    on_collection_change=partial(
+                        self._configure_store, embedding_model=embedding_model
+                    ),
+                )
+                with store._make_sync_session() as session:
+                    store.get_collection(session)
+                self._stores[key] = store
+            return store
+
+    async def aget_store(
+        self,
+        collection_name: str,
+        embedding_model: EmbeddingOpenAIModels = EmbeddingOpenAIModels.TEXT_EMBEDDING_3_LARGE,
+    ) -> PooledPGVector:
+        """Return the async store of a collection, creating it on first use.
+
+        The store is fully initialized before it is shared, so concurrent first
+        requests don't race on PGVector's lazy async setup.
+
+        Args:
+            collection_name (str): The collection name.
+            embedding_model (EmbeddingOpenAIModels, optional): The embedding model.
+
+        Returns:
+            PooledPGVector: The shared async store.
+        """
+        key = (collection_name, embedding_model)
+        store = self._async_stores.get(key)
+        if store is not None:
+            return store
+        if self._async_lock is None:
+            self._async_lock = asyncio.Lock()
+        async with self._async_lock:
+            store = self._async_stores.get(key)
+            if store is None:
+                store = PooledPGVector(
+                    embeddings=self.get_embeddings(embedding_model),
+                    collection_name=collection_name,
+                    connection=self.async_engine,
+                    use_jsonb=True,
+                    create_extension=not self._tables_ready,
+                    skip_table_setup=self._tables_ready,
+                    on_collection_change=partial(
+                        self._configure_store, embedding_model=embedding_model
+                    ),
+                )
+                await store.__apost_init__()
+                async with store._make_async_session() as session:
+                    await store.aget_collection(session)
+                self._async_stores[key] = store
+        return store
+
+    def get_collection_metadata(self, collection_name: str) -> Dict[str, Any]:
+        """Return the metadata of a collection without creating it.
+
+        Args:
+            collection_name (str): The collection name.
+
+        Returns:
+            Dict[str, Any]: The metadata, empty if the collection doesn't exist.
+        """
+        _, collection_store = _get_embedding_collection_store()
+        with Session(self.engine) as session:
+            metadata = session.execute(
+                select(collection_store.cmetadata).filter(
+                    collection_store.name == collection_name
+                )
+            ).scalar_one_or_none()
+        return dict(metadata or {})
+
+    def count_embeddings(self, collection_name: str) -> int:
+        """Return the number of embeddings stored in a collection.
+
+        Args:
+            collection_name (str): The collection name.
+
+        Returns:
+            int: The number of rows, 0 if the collection doesn't exist.
+        """
+        embedding_store, collection_store = _get_embedding_collection_store()
+        with Session(self.engine) as session:
+            return session.execute(
+                select(func.count())
+                .select_from(embedding_store)
+                .join(
+                    collection_store,
+                    collection_store.uuid == embedding_store.collection_id,
+                )
+                .filter(collection_store.name == collection_name)
+            ).scalar_one()
+
+    def set_collection_metadata(
+        self, collection_name: str, key: str, value: Optional[Any]
+    ) -> None:
+        """Set, or remove when `value` is None, one metadata key of a collection.
+
+        The cached stores of the collection are dropped, since they hold the
+        old collection row.
+
+        Args:
+            collection_name (str): The collection name.
+            key (str): The metadata key.
+            value (Optional[Any]): A JSON-serializable value.
+
+        Raises:
+            ValueError: If the collection doesn't exist.
+        """
+        _, collection_store = _get_embedding_collection_store()
+        with Session(self.engine) as session:
+            collection = session.execute(
+                select(collection_store)
+                .filter(collection_store.name == collection_name)
+                .with_for_update()
+            ).scalar_one_or_none()
+            if collection is None:
+                raise ValueError(f"Collection {collection_name} not found")
+            metadata = dict(collection.cmetadata or {})
+            if value is None:
+                metadata.pop(key, None)
+            else:
+                metadata[key] = value
+            collection.cmetadata = metadata
+            session.commit()
+        self.invalidate(collection_name)
+
+    def invalidate(self, collection_name: str) -> None:
+        """Drop the cached stores of a collection.
+
+        Args:
+            collection_name (str): The collection name.
+        """
+        with self._lock:
+            for stores in (self._stores, self._async_stores):
+                for key in [k for k in stores if k[0] == collection_name]:
+                    del stores[key]
+
+    def dispose(self) -> None:
+        """Drop every sync store and close the pooled connections."""
+        with self._lock:
+            self._stores.clear()
+            if self._engine is not None:
+                self._engine.dispose()
+                self._engine = None
+
+    async def adispose(self) -> None:
+        """Drop every store and close the sync and async connection pools."""
+        self.dispose()
+        with self._lock:
+            self._async_stores.clear()
+            async_engine, self._async_engine = self._async_engine, None
+        if async_engine is not None:
+            await async_engine.dispose()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the cached stores and the connection pool status.
+
+        Returns:
+            Dict[str, Any]: Store count and pool usage.
+        """
+        with self._lock:
+            return {
+                "stores": len(self._stores),
+                "async_stores": len(self._async_stores),
+                "collections": sorted(
+                    {k[0] for k in (*self._stores, *self._async_stores)}
+                ),
+                "pool": (self._engine.pool.status() if self._engine else None),
+                "async_pool": (
+                    self._async_engine.pool.status()
+                    if self._async_engine
+                    else None
+                ),
+            }
+
+
+vector_store_registry = VectorStoreRegistry(
+    connection=os.getenv("DATABASE_URL"),
+    pool_size=int(os.getenv("VECTOR_DB_POOL_SIZE", 5)),
+    max_overflow=int(os.getenv("VECTOR_DB_MAX_OVERFLOW", 10)),
+    pool_timeout=int(os.getenv("VECTOR_DB_POOL_TIMEOUT", 30)),
+    pool_recycle=int(os.getenv("VECTOR_DB_POOL_RECYCLE", 1800)),
+)
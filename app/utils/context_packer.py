@@ -0,0 +1,293 @@
+# app/utils/context_packer.py
+import math
+from functools import lru_cache
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+import tiktoken
+from langchain_core.documents import Document
+
+from app.utils.logger import logger
+
+# Chunks of a page whose offsets are at most this far apart are adjacent.
+ADJACENT_GAP = 2
+# Shortest text overlap merged when chunks have no `start_index`.
+MIN_TEXT_OVERLAP = 20
+# Word shingle similarity above which a block is a near-duplicate.
+NEAR_DUPLICATE_SIMILARITY = 0.9
+SHINGLE_SIZE = 5
+# A block is only truncated into the budget if this many tokens remain.
+MIN_TRUNCATED_TOKENS = 50
+CHARS_PER_TOKEN = 4
+DEFAULT_ENCODING = "o200k_base"
+
+
+class Tokenizer:
+    """Counts and truncates tokens with tiktoken.
+
+    Falls back to an estimate of `CHARS_PER_TOKEN` characters per token
+    when the encoding cannot be loaded (tiktoken downloads it on first use).
+    """
+
+    def __init__(self, model: str):
+        """Load the encoding of a model.
+
+        Args:
+            model (str): The OpenAI model the context is sent to.
+        """
+        try:
+            try:
+                self.encoding = tiktoken.encoding_for_model(model)
+            except KeyError:
+                self.encoding = tiktoken.get_encoding(DEFAULT_ENCODING)
+        except Exception as e:
+            logger.warning(
+                f"Could not load the tokenizer of {model}, estimating tokens: {e}"
+            )
+            self.encoding = None
+
+    def count(self, text: str) -> int:
+        """Number of tokens of a text."""
+        if self.encoding is None:
+            return math.ceil(len(text) / CHARS_PER_TOKEN)
+        return len(self.encoding.encode_ordinary(text))
+
+    def truncate(self, text: str, tokens: int) -> str:
+        """The longest prefix of a text with at most `tokens` tokens."""
+        if self.encoding is None:
+            return text[: tokens * CHARS_PER_TOKEN]
+        return self.encoding.decode(
+            self.encoding.encode_ordinary(text)[:tokens]
+        )
+
+
+@lru_cache(maxsize=None)
+def get_tokenizer(model: str) -> Tokenizer:
+    """Return the shared tokenizer of a model."""
+    return Tokenizer(model)
+
+
+def _page_key(document: Document) -> Hashable:
+    metadata = document.metadata or {}
+    return (
+        metadata.get("source") or metadata.get("file_name"),
+        metadata.get("page"),
+    )
+
+
+def _text_overlap(first: str, second: str) -> int:
+    """Length of the longest suffix of `first` that starts `second`."""
+    if len(second) < MIN_TEXT_OVERLAP:
+        return 0
+    head = second[:MIN_TEXT_OVERLAP]
+    start = max(0, len(first) - len(second))
+    position = first.find(head, start)
+    while position != -1:
+        if second.startswith(first[position:]):
+            return len(first) - position
+        position = first.find(head, position + 1)
+    return 0
+
+
+class _Block:
+    """Consecutive text of one page, merged from one or more chunks."""
+
+    __slots__ = ("document", "text", "start", "end", "rank", "chunks")
+
+    def __init__(self, document: Document, rank: int):
+        self.document = document
+        self.text = document.page_content
+        self.start = (document.metadata or {}).get("start_index")
+        # Offset in the page text where the block ends. Adjacent chunks are
+        # joined with a newline, so it can differ from start + len(text).
+        self.end = (
+            self.start + len(self.text)
+            if isinstance(self.start, int)
+            else None
+        )
+        self.rank = rank
+        self.chunks = 1
+
+    def absorb(self, other: "_Block", text: str, start: Optional[int]) -> None:
+        self.text = text
+        self.start = start
+        if self.end is not None and other.end is not None:
+            self.end = max(self.end, other.end)
+        self.rank = min(self.rank, other.rank)
+        self.chunks += other.chunks
+
+
+def _merge_by_offset(blocks: List[_Block]) -> List[_Block]:
+    """Merge overlapping and adjacent chunks of a page by `start_index`."""
+    merged: List[_Block] = []
+    for block in sorted(blocks, key=lambda block: block.start):
+        last = merged[-1] if merged else None
+        if last is None or block.start > last.end + ADJACENT_GAP:
+            merged.append(block)
+        elif block.end <= last.end:
+            last.absorb(block, last.text, last.start)
+        elif block.start >= last.end:
+            last.absorb(block, f"{last.text}\n{block.text}", last.start)
+        else:
+            last.absorb(
+                block,
+                last.text + block.text[last.end - block.start :],
+                last.start,
+            )
+    return merged
+
+
+def _merge_text(kept: _Block, block: _Block) -> bool:
+    """Absorb `block` into `kept` if their texts overlap or contain each other."""
+    if block.text in kept.text:
+        kept.absorb(block, kept.text, kept.start)
+    elif kept.text in block.text:
+        kept.absorb(block, block.text, block.start)
+    elif overlap := _text_overlap(kept.text, block.text):
+        kept.absorb(block, kept.text + block.text[overlap:], kept.start)
+    elif overlap := _text_overlap(block.text, kept.text):
+        kept.absorb(block, block.text + kept.text[overlap:], block.start)
+    else:
+        return False
+    return True
+
+
+def _merge_by_text(blocks: List[_Block]) -> List[_Block]:
+    """Merge chunks of a page whose texts overlap or contain each other.
+
+    A merged block can overlap blocks it did not overlap before (the middle
+    chunk of three arriving last), so passes repeat until nothing merges.
+    """
+    changed = True
+    while changed:
+        changed = False
+        merged: List[_Block] = []
+        for block in blocks:
+            if any(_merge_text(kept, block) for kept in merged):
+                changed = True
+            else:
+                merged.append(block)
+        blocks = merged
+    return blocks
+
+
+def _shingles(text: str) -> frozenset:
+    words = text.lower().split()
+    if len(words) <= SHINGLE_SIZE:
+        return frozenset([" ".join(words)])
+    return frozenset(
+        " ".join(words[i : i + SHINGLE_SIZE])
+        for i in range(len(words) - SHINGLE_SIZE + 1)
+    )
+
+
+def _drop_near_duplicates(blocks: List[_Block]) -> List[_Block]:
+    """Keep the best ranked of blocks with (almost) the same text."""
+    kept: List[Tuple[_Block, frozenset]] = []
+    for block in blocks:
+        shingles = _shingles(block.text)
+        if not any(
+            len(shingles & other) / len(shingles | other)
+            >= NEAR_DUPLICATE_SIMILARITY
+            or " ".join(block.text.split())
+            in " ".join(kept_block.text.split())
+            for kept_block, other in kept
+        ):
+            kept.append((block, shingles))
+    return [block for block, _ in kept]
+
+
+def merge_chunks(documents: List[Document]) -> List[Document]:
+    """Merge overlapping chunks and drop near-duplicates.
+
+    Chunks of the same source and page are merged when they overlap or are
+    adjacent, using their `start_index` or, for chunks split without it,
+    their overlapping text. Blocks that repeat the text of a better ranked
+    block are dropped.
+
+    Args:
+        documents (List[Document]): Retrieved chunks, best first.
+
+    Returns:
+        List[Document]: The merged blocks, ordered by their best chunk. Each
+            keeps the metadata of its best chunk and the number of merged
+            chunks under `merged_chunks`.
+    """
+    pages: Dict[Hashable, List[_Block]] = {}
+    for rank, document in enumerate(documents):
+        pages.setdefault(_page_key(document), []).append(
+            _Block(document, rank)
+        )
+    blocks: List[_Block] = []
+    for page_blocks in pages.values():
+        if all(isinstance(block.start, int) for block in page_blocks):
+            blocks.extend(_merge_by_offset(page_blocks))
+        else:
+            blocks.extend(_merge_by_text(page_blocks))
+    blocks.sort(key=lambda block: block.rank)
+    merged = []
+    for block in _drop_near_duplicates(blocks):
+        metadata = dict(block.document.metadata or {})
+        if block.start is not None:
+            metadata["start_index"] = block.start
+        metadata["merged_chunks"] = block.chunks
+        merged.append(Document(page_content=block.text, metadata=metadata))
+    return merged
+
+
+def pack_context(
+    documents: List[Document],
+    format_document: Callable[[Document], str],
+    token_budget: int,
+    model: str,
+) -> Dict[str, Any]:
+    """Build the prompt context of retrieved chunks within a token budget.
+
+    Chunks are merged with `merge_chunks`, then formatted and added best
+    first while they fit in `token_budget`. The first block that does not
+    fit is truncated into the remaining budget if enough of it is left.
+
+    Args:
+        documents (List[Document]): Retrieved chunks, best first.
+        format_document (Callable[[Document], str]): Formats one block.
+        token_budget (int): Maximum tokens of the context. 0 disables the limit.
+        model (str): The OpenAI model, which selects the tokenizer.
+
+    Returns:
+        Dict[str, Any]: The context `text` and its `tokens`, the tokens of
+            the chunks formatted verbatim (`original_tokens`) and of the
+            merged blocks (`merged_tokens`), the tokens removed by merging
+            and deduplication (`tokens_saved`) and by the budget
+            (`tokens_truncated`), and the number of `chunks` and packed
+            `blocks`.
+    """
+    tokenizer = get_tokenizer(getattr(model, "value", model))
+    original_tokens = sum(
+        tokenizer.count(format_document(document)) for document in documents
+    )
+    formatted = []
+    for block in merge_chunks(documents):
+        text = format_document(block)
+        formatted.append((text, tokenizer.count(text)))
+    merged_tokens = sum(count for _, count in formatted)
+    parts: List[str] = []
+    tokens = 0
+    for text, count in formatted:
+        if token_budget and tokens + count > token_budget:
+            remaining = token_budget - tokens
+            if remaining >= MIN_TRUNCATED_TOKENS:
+                text = tokenizer.truncate(text, remaining)
+                parts.append(text)
+                tokens += tokenizer.count(text)
+            break
+        parts.append(text)
+        tokens += count
+    return {
+        "text": "\n".join(parts),
+        "tokens": tokens,
+        "original_tokens": original_tokens,
+        "merged_tokens": merged_tokens,
+        "tokens_saved": max(0, original_tokens - merged_tokens),
+        "tokens_truncated": max(0, merged_tokens - tokens),
+        "chunks": len(documents),
+        "blocks": len(parts),
+    }
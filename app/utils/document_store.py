@@ -0,0 +1,130 @@
+# app/utils/document_store.py
+import json
+import mmap
+import os
+from typing import Iterable, Iterator, List, Optional, Sequence
+
+import numpy as np
+from langchain_core.documents import Document
+
+DOCUMENTS_FILE = "documents.jsonl"
+OFFSETS_FILE = "documents_offsets.npy"
+
+
+def encode_document(document: Document) -> bytes:
+    """Serialize a document as a single JSON line."""
+    return (
+        json.dumps(
+            {
+                "page_content": document.page_content,
+                "metadata": document.metadata,
+            },
+            ensure_ascii=False,
+            default=str,
+        )
+        + "\n"
+    ).encode("utf-8")
+
+
+def decode_document(raw: bytes) -> Document:
+    """Deserialize a document written by `encode_document`."""
+    data = json.loads(raw)
+    return Document(
+        page_content=data["page_content"], metadata=data["metadata"]
+    )
+
+
+class DocumentStore(Sequence[Document]):
+    """Random-access sequence of documents backed by an offset-indexed file.
+
+    Documents are stored as JSON lines in `documents.jsonl`, with their byte
+    offsets in `documents_offsets.npy`. A loaded store memory-maps both files,
+    so opening it is constant time and documents are only decoded when
+    accessed. A store built in memory keeps plain `Document` objects until it
+    is written.
+    """
+
+    def __init__(
+        self,
+        documents: Optional[List[Document]] = None,
+        buffer: Optional[mmap.mmap] = None,
+        offsets: Optional[np.ndarray] = None,
+    ):
+        self._documents = documents
+        self._buffer = buffer
+        self._offsets = offsets
+
+    @classmethod
+    def from_documents(cls, documents: Iterable[Document]) -> "DocumentStore":
+        """Create an in-memory store.
+
+        Args:
+            documents (Iterable[Document]): The documents to store.
+
+        Returns:
+            DocumentStore: The in-memory store.
+        """
+        return cls(documents=list(documents))
+
+    @classmethod
+    def open(cls, path: str) -> "DocumentStore":
+        """Open a store previously written to `path` without reading it.
+
+        Args:
+            path (str): The folder containing the store files.
+
+        Returns:
+            DocumentStore: A memory-mapped store.
+        """
+        offsets = np.load(os.path.join(path, OFFSETS_FILE), mmap_mode="r")
+        if len(offsets) <= 1:
+            return cls(documents=[])
+        with open(os.path.join(path, DOCUMENTS_FILE), "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(buffer=buffer, offsets=offsets)
+
+    def write(self, path: str) -> None:
+        """Write the store to `path`.
+
+        Args:
+            path (str): The folder the store files are written to.
+        """
+        offsets = np.zeros(len(self) + 1, dtype=np.int64)
+        with open(os.path.join(path, DOCUMENTS_FILE), "wb") as f:
+            for i in range(len(self)):
+                f.write(self._raw(i))
+                offsets[i + 1] = f.tell()
+        np.save(os.path.join(path, OFFSETS_FILE), offsets)
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate resident size; memory-mapped data is not counted."""
+        if self._documents is None:
+            return 0
+        return sum(len(doc.page_content) + 200 for doc in self._documents)
+
+    def _raw(self, i: int) -> bytes:
+        if self._documents is not None:
+            return encode_document(self._documents[i])
+        return self._buffer[int(self._offsets[i]) : int(self._offsets[i + 1])]
+
+    def __len__(self) -> int:
+        if self._documents is not None:
+            return len(self._documents)
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if self._documents is not None:
+            return self._documents[i]
+        if not 0 <= i < len(self):
+            raise IndexError("document index out of range")
+        start, end = int(self._offsets[i]), int(self._offsets[i + 1])
+        return decode_document(self._buffer[start:end])
+
+    def __iter__(self) -> Iterator[Document]:
+        for i in range(len(self)):
+            yield self[i]
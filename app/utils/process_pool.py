@@ -0,0 +1,136 @@
+# app/utils/process_pool.py
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from starlette import status
+from starlette.concurrency import run_in_threadpool
+
+from app.utils.logger import logger
+
+load_dotenv(override=True)
+
+
+class _WorkerHTTPException(Exception):
+    """Picklable carrier for an `HTTPException` raised in a worker process."""
+
+    def __init__(self, status_code: int, detail: Any):
+        super().__init__(status_code, detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def _invoke(fn: Callable, args: tuple) -> Any:
+    try:
+        return fn(*args)
+    except HTTPException as e:
+        raise _WorkerHTTPException(e.status_code, e.detail) from None
+
+
+class ProcessPool:
+    """Application-managed process pool for CPU-bound work.
+
+    PDF parsing, splitting and index fitting run here so they don't block the
+    event loop. At most `max_workers` jobs run at once and at most `max_queue`
+    more wait for a worker; further submissions are rejected with a 503 so a
+    burst of uploads cannot pile up unbounded work. With `max_workers=0` jobs
+    run in the default thread pool instead.
+    """
+
+    def __init__(self, max_workers: int, max_queue: int):
+        """Initialize the pool. Worker processes start with `start`.
+
+        Args:
+            max_workers (int): Number of worker processes.
+            max_queue (int): Number of jobs allowed to wait for a worker.
+        """
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+
+    @property
+    def enabled(self) -> bool:
+        """Whether jobs run in worker processes rather than in threads."""
+        return self.max_workers > 0
+
+    def start(self) -> None:
+        """Start the worker processes if they are not running."""
+        with self._lock:
+            if self._executor is None and self.enabled:
+                # Spawned workers don't inherit the server's threads and locks.
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+                logger.info(
+                    f"Process pool started with {self.max_workers} workers"
+                )
+
+    def shutdown(self) -> None:
+        """Stop the worker processes, waiting for running jobs."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+            logger.info("Process pool stopped")
+
+    async def run(self, fn: Callable, *args: Any) -> Any:
+        """Run `fn(*args)` in a worker process and await its result.
+
+        `fn` and its arguments must be picklable, i.e. `fn` must be a module
+        level function.
+
+        Args:
+            fn (Callable): The function to run.
+            *args: Positional arguments for `fn`.
+
+        Returns:
+            Any: The return value of `fn`.
+
+        Raises:
+            HTTPException: If the queue is full, or re-raised from the worker.
+        """
+        with self._lock:
+            if self._in_flight >= self.max_workers + self.max_queue:
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Too many processing jobs in progress, retry later.",
+                )
+            self._in_flight += 1
+        try:
+            if not self.enabled:
+                return await run_in_threadpool(fn, *args)
+            self.start()
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._executor, _invoke, fn, args
+            )
+        except _WorkerHTTPException as e:
+            raise HTTPException(status_code=e.status_code, detail=e.detail)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def stats(self) -> Dict[str, int]:
+        """Return the pool size and the number of jobs in flight."""
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "in_flight": self._in_flight,
+            }
+
+
+process_pool = ProcessPool(
+    max_workers=int(
+        os.getenv("PROCESS_POOL_MAX_WORKERS", min(4, os.cpu_count() or 1))
+    ),
+    max_queue=int(os.getenv("PROCESS_POOL_MAX_QUEUE", 8)),
+)
@@ -0,0 +1,74 @@
+# app/utils/rank_fusion.py
+import hashlib
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+
+from langchain_core.documents import Document
+
+# Constant of reciprocal rank fusion; 60 is the value of the original paper.
+DEFAULT_RRF_K = 60
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.split())
+
+
+def chunk_key(document: Document) -> Hashable:
+    """Identify a chunk across retrievers.
+
+    TF-IDF and vector results are separate copies of the same chunks, so
+    they are matched on their source, page and normalized text.
+    """
+    metadata = document.metadata or {}
+    digest = hashlib.sha1(
+        _normalize(document.page_content).encode("utf-8")
+    ).hexdigest()
+    return (
+        metadata.get("source") or metadata.get("file_name"),
+        metadata.get("page"),
+        digest,
+    )
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[Sequence[Document]],
+    k: int,
+    rrf_k: int = DEFAULT_RRF_K,
+    weights: Optional[Sequence[float]] = None,
+) -> List[Tuple[Document, float]]:
+    """Merge ranked result lists with reciprocal rank fusion.
+
+    Every chunk scores `sum(weight / (rrf_k + rank))` over the lists it
+    appears in. Chunks found by several retrievers are merged, and a chunk
+    whose text is contained in a better ranked chunk of the same page is
+    dropped, since it adds no context.
+
+    Args:
+        rankings (Sequence[Sequence[Document]]): Result lists, best first.
+        k (int): Number of fused results.
+        rrf_k (int, optional): Rank smoothing constant.
+        weights (Optional[Sequence[float]], optional): Weight of every list.
+            Defaults to 1 for each.
+
+    Returns:
+        List[Tuple[Document, float]]: The top `k` chunks and their fused score.
+    """
+    weights = weights or [1.0] * len(rankings)
+    scores: Dict[Hashable, float] = {}
+    documents: Dict[Hashable, Document] = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, document in enumerate(ranking, start=1):
+            key = chunk_key(document)
+            scores[key] = scores.get(key, 0.0) + weight / (rrf_k + rank)
+            documents.setdefault(key, document)
+
+    fused: List[Tuple[Document, float]] = []
+    kept: Dict[Tuple, List[str]] = {}
+    for key in sorted(scores, key=lambda key: -scores[key]):
+        page, text = key[:2], _normalize(documents[key].page_content)
+        if any(text in other for other in kept.get(page, [])):
+            continue
+        kept.setdefault(page, []).append(text)
+        fused.append((documents[key], scores[key]))
+        if len(fused) == k:
+            break
+    return fused
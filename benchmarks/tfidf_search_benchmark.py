@@ -0,0 +1,154 @@
+# benchmarks/tfidf_search_benchmark.py
+"""Compare TFIDFRetriever's full cosine + argsort with TFIDFIndex's sparse top-k.
+
+Synthetic corpora are generated directly as sparse term-frequency matrices with
+a Zipfian vocabulary, so the 1M-chunk case does not need 1M PDF chunks.
+
+Usage:
+    python -m benchmarks.tfidf_search_benchmark --sizes 10000,100000,1000000
+"""
+
+import argparse
+import time
+
+import numpy as np
+from langchain_community.retrievers import TFIDFRetriever
+from langchain_core.documents import Document
+from scipy import sparse
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from app.services.tfidf_index import TFIDFIndex, _compute_idf, _row_norms
+
+
+def _zipf_terms(rng: np.random.Generator, size: int, vocabulary_size: int):
+    return (rng.zipf(1.2, size=size) - 1) % vocabulary_size
+
+
+def build_corpus(
+    n_chunks: int,
+    vocabulary_size: int,
+    terms_per_chunk: int,
+    seed: int = 0,
+    batch_size: int = 100_000,
+):
+    """Build the term-frequency matrix of a synthetic corpus."""
+    rng = np.random.default_rng(seed)
+    blocks = []
+    for start in range(0, n_chunks, batch_size):
+        rows_in_batch = min(batch_size, n_chunks - start)
+        rows = np.repeat(
+            np.arange(rows_in_batch, dtype=np.int32), terms_per_chunk
+        )
+        cols = _zipf_terms(
+            rng, rows_in_batch * terms_per_chunk, vocabulary_size
+        ).astype(np.int32)
+        data = np.ones(len(rows), dtype=np.float32)
+        blocks.append(
+            sparse.csr_matrix(
+                (data, (rows, cols)), shape=(rows_in_batch, vocabulary_size)
+            )
+        )
+    tf = sparse.vstack(blocks, format="csr")
+    tf.sum_duplicates()
+    tf.sort_indices()
+    return tf
+
+
+def build_indexes(tf: sparse.csr_matrix):
+    """Build both the legacy retriever and the native index over `tf`."""
+    n_chunks, vocabulary_size = tf.shape
+    vocabulary = {f"t{i}": i for i in range(vocabulary_size)}
+    idf = _compute_idf(
+        np.bincount(tf.indices, minlength=vocabulary_size), n_chunks
+    )
+    documents = [
+        Document(page_content=f"chunk {i}", metadata={"page": i})
+        for i in range(n_chunks)
+    ]
+
+    index = TFIDFIndex.from_term_frequencies(vocabulary, tf, documents)
+
+    vectorizer = TfidfVectorizer(vocabulary=vocabulary)
+    vectorizer.idf_ = idf.astype(np.float64)
+    tfidf = tf.multiply(idf.reshape(1, -1)).tocsr()
+    norms = _row_norms(tf, idf)
+    norms[norms == 0] = 1
+    tfidf = sparse.diags(1 / norms) @ tfidf
+    retriever = TFIDFRetriever(
+        vectorizer=vectorizer, docs=documents, tfidf_array=tfidf.tocsr()
+    )
+    return retriever, index
+
+
+def _percentiles(timings):
+    timings = np.asarray(timings) * 1000
+    return np.percentile(timings, 50), np.percentile(timings, 95)
+
+
+def run(
+    sizes,
+    vocabulary_size: int,
+    terms_per_chunk: int,
+    n_queries: int,
+    k: int,
+):
+    rng = np.random.default_rng(42)
+    print(
+        f"{'chunks':>10} | {'baseline p50':>12} | {'baseline p95':>12} | "
+        f"{'sparse p50':>10} | {'sparse p95':>10} | {'speedup':>7} | "
+        f"{'top-k overlap':>13}"
+    )
+    for n_chunks in sizes:
+        tf = build_corpus(n_chunks, vocabulary_size, terms_per_chunk)
+        retriever, index = build_indexes(tf)
+        retriever = retriever.model_copy(update={"k": k})
+        queries = [
+            " ".join(
+                f"t{t}"
+                for t in _zipf_terms(rng, rng.integers(2, 6), vocabulary_size)
+            )
+            for _ in range(n_queries)
+        ]
+
+        baseline, candidate, overlap = [], [], []
+        for query in queries:
+            start = time.perf_counter()
+            expected = retriever.invoke(query)
+            baseline.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            results = index.search(query, k)
+            candidate.append(time.perf_counter() - start)
+
+            expected_pages = {doc.metadata["page"] for doc in expected}
+            result_pages = {doc.metadata["page"] for doc in results}
+            overlap.append(len(expected_pages & result_pages) / k)
+
+        base_p50, base_p95 = _percentiles(baseline)
+        sparse_p50, sparse_p95 = _percentiles(candidate)
+        print(
+            f"{n_chunks:>10} | {base_p50:>10.2f}ms | {base_p95:>10.2f}ms | "
+            f"{sparse_p50:>8.2f}ms | {sparse_p95:>8.2f}ms | "
+            f"{base_p50 / sparse_p50:>6.1f}x | {np.mean(overlap):>13.3f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--vocabulary-size", type=int, default=50_000)
+    parser.add_argument("--terms-per-chunk", type=int, default=60)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+    run(
+        sizes=[int(size) for size in args.sizes.split(",")],
+        vocabulary_size=args.vocabulary_size,
+        terms_per_chunk=args.terms_per_chunk,
+        n_queries=args.queries,
+        k=args.k,
+    )
+
+
+if __name__ == "__main__":
+    main()